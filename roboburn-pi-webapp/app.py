@@ -1,17 +1,65 @@
+import atexit
+import bisect
+import functools
 import logging
+import math
 import os
 import threading
 import time
-from collections import deque
-import bisect
 
-from flask import Flask, jsonify, render_template, request
+from flask import (
+    Flask,
+    Response,
+    g,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+)
 from flask_assets import Bundle, Environment
 from simple_pid import PID
-from background_workers import temperature_worker, burner_control_worker
+from autotune import (
+    CONTROLLER_AUTOTUNE,
+    DEFAULT_RULE,
+    PHASE_DONE,
+    RelayAutotuner,
+    load_gains,
+    save_gains,
+)
+from background_workers import BurnerControlWorker, TemperatureWorker
+from channels import load_registry
+from controllers import (
+    CONTROLLER_PID,
+    CONTROLLER_PREDICTIVE,
+    PidHysteresisController,
+    PredictiveController,
+    applied_stage,
+)
+from decimation import DecimationAccumulator, HistoryDecimator
+from downsampling import ALGORITHMS, DEFAULT_ALGORITHM, downsample
+from eta import EtaPredictor
+from hardware import BACKEND_PI, open_backend
+from history_buffer import HistoryBuffer
+from logbuffer import LogBuffer, LogBufferHandler
+from metrics import Registry
+from notifier import TOPIC_LOGS, TOPIC_STATUS, TOPIC_TEMPERATURE, TOPICS, UpdateNotifier
+from programs import ProgramRunner
+from pyramid import HistoryPyramid
+from relays import RelayAccounting
+from scheduler import Scheduler
+from session_recorder import (
+    RECORD_STAGE,
+    RECORD_TARGET,
+    SESSION_SUFFIX,
+    SessionLog,
+    SessionRecorder,
+    list_sessions,
+)
+from snapshot import SnapshotCell
+from thermistor import ThermistorCalibration
+from watchdog import Watchdog
+from wire_format import FORMAT_BINARY, MIME_TYPE, compress, encode_history, negotiate
 
-KEY_OIL_TEMP = "oil_temp"
-KEY_TURKEY_TEMP = "turkey_temp"
 KEY_TIME = "time"
 KEY_RUNNING = "running"
 KEY_TARGET_TEMP = "target_temp"
@@ -25,16 +73,84 @@ KEY_BURNER_REQUEST_STAGE = "burner_request_stage"  # 0,1,2
 KEY_CONNECTED = "connected"
 KEY_LAST_TOGGLE_TIME_STAGE1 = "last_toggle_time_stage1"
 KEY_LAST_TOGGLE_TIME_STAGE2 = "last_toggle_time_stage2"
+KEY_CONTROLLER = "controller"  # active burner controller mode
 
 SECOND = 1
 MINUTE = 60
 HOUR = 60 * MINUTE
 FIVE_MINUTES_MS = 5 * MINUTE * 1000
 RAW_HISTORY_SECONDS = 60 * MINUTE  # 1 hour of 1s samples
-LOG_MAX_LEN = 100
+LOG_MAX_LEN = (
+    100  # routine lines kept; warnings and errors get their own ring of this size
+)
+LOG_COALESCE_S = 60  # an identical line within this long bumps a repeat count instead
+SAMPLE_PERIOD_S = 1.0
+# Control normally runs right after each fresh sample; if sampling stalls it
+# still runs on its own once this long has passed.
+CONTROL_FALLBACK_PERIOD_S = 2.0
+STREAM_KEEPALIVE_S = 15  # SSE comment interval so proxies keep the stream open
+LONG_POLL_TIMEOUT_S = 25
 DEFAULT_TARGET_TEMP = 176.7  # 350°F in Celsius
+# "pid" (simple_pid with hysteresis bands) or "predictive" (online FOPDT
+# model with look-ahead); switchable at runtime via /controller.
+DEFAULT_CONTROLLER = CONTROLLER_PID
+
+# On-disk session log: the current cook is appended to CURRENT_SESSION_FILE and
+# replayed on restart; a log idle for longer than the resume gap is archived.
+SESSION_DIR = os.environ.get(
+    "ROBOBURN_SESSION_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions"),
+)
+CURRENT_SESSION_FILE = "current" + SESSION_SUFFIX
+SESSION_RESUME_GAP_S = 30 * MINUTE
+SESSION_FLUSH_INTERVAL_S = 5
+
+# ADS1115 sampling: each 1 Hz tick reads every channel ADC_OVERSAMPLE times at
+# ADC_DATA_RATE samples/s and publishes the filtered value ("median" or "trimmed_mean").
+ADC_DATA_RATE = 860
+ADC_OVERSAMPLE = 8
+ADC_FILTER = "median"
+
+# "pi" drives the ADS1115s and relays; "sim" runs the simulated fryer in real
+# time, so the whole app works on a dev box (see hardware.py)
+HARDWARE_BACKEND = os.environ.get("ROBOBURN_HARDWARE", BACKEND_PI)
+
+# Timing histograms and counters for the hot paths, served on /metrics;
+# ROBOBURN_METRICS=0 turns every instrument into a no-op and /metrics into a 404
+METRICS_ENABLED = os.environ.get("ROBOBURN_METRICS", "1") != "0"
 
-# PID Configuration for 5gal oil & 250k BTU burner
+# Precomputed thermistor lookup tables, keyed by a hash of the calibration data
+CACHE_DIR = os.environ.get(
+    "ROBOBURN_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"),
+)
+
+# Gains found by the autotune are saved here and override the defaults below
+CONFIG_DIR = os.environ.get(
+    "ROBOBURN_CONFIG_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "config"),
+)
+PID_GAINS_FILE = os.path.join(CONFIG_DIR, "pid_gains.json")
+# Probes and burner zones (see channels.py); without this file the app runs
+# the turkey fryer: oil and turkey probes, one zone on oil
+CHANNELS_FILE = os.path.join(CONFIG_DIR, "channels.json")
+# Cook programs (ramp-and-soak profiles) and the progress of running ones
+PROGRAMS_FILE = os.path.join(CONFIG_DIR, "programs.json")
+# Lifetime relay counters (toggles, starts, on-hours) survive restarts here
+RELAY_STATS_FILE = os.path.join(CONFIG_DIR, "relays.json")
+# Burner start budget per stage relay: at most RELAY_MAX_STARTS starts per
+# rolling RELAY_WINDOW_S (None, the default, disables it). Each start is an
+# ignition cycle on the valve. With RELAY_PACED_STARTS the starts are also
+# kept RELAY_WINDOW_S / RELAY_MAX_STARTS apart, which stretches every
+# burner cycle to that spacing.
+RELAY_WINDOW_S = HOUR
+RELAY_MAX_STARTS = None
+RELAY_PACED_STARTS = False
+# Safety watchdog limits (see watchdog.py for the timeouts)
+WATCHDOG_MAX_TEMP_C = 218.0  # 425°F
+WATCHDOG_MAX_RISE_C_PER_MIN = 60.0
+
+# Default PID Configuration for 5gal oil & 250k BTU burner
 # Kp: Lowered to reduce aggressive overcorrection with the high-power burner.
 # Ki: Lowered to build the integral term slowly, preventing overshoot in a high thermal mass system.
 # Kd: Increased significantly to act as a strong brake, anticipating and damping rapid temperature changes.
@@ -44,28 +160,31 @@ PID_KD = 20.0
 PID_OUT_MIN, PID_OUT_MAX = 0, 100
 
 # --- Logging Setup ---
-log_messages = deque(maxlen=LOG_MAX_LEN)
-log_lock = threading.Lock()
-
+log_buffer = LogBuffer(
+    capacity=LOG_MAX_LEN, important_capacity=LOG_MAX_LEN, coalesce_s=LOG_COALESCE_S
+)
 
-class DequeHandler(logging.Handler):
-    def __init__(self, deque_instance):
-        super().__init__()
-        self.deque_instance = deque_instance
-        self.setFormatter(
-            logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        )
+# Wakes /stream and /poll clients when temperatures, status or logs change
+notifier = UpdateNotifier(TOPICS)
 
-    def emit(self, record):
-        log_entry = self.format(record)
-        with log_lock:
-            self.deque_instance.append(log_entry)
+metrics = Registry(enabled=METRICS_ENABLED)
 
 
 # --- Data Structures & PID Controller ---
-temperature_data = {KEY_OIL_TEMP: 21.1, KEY_TURKEY_TEMP: 21.1}  # 70°F in Celsius
-# Store raw temperature data with timestamps
-temperature_history = deque(maxlen=RAW_HISTORY_SECONDS)
+# Shared state that handlers read is published as immutable snapshots
+# (see snapshot.py): writers swap in a new snapshot, readers never lock.
+
+channel_registry = load_registry(CHANNELS_FILE)
+# Requests that do not name a zone act on the first one
+PRIMARY_ZONE = channel_registry.primary.name
+
+# Latest history entry, published by the temperature worker after each sample
+temperature_data = SnapshotCell()
+# Store raw temperature data with timestamps, one preallocated array per channel
+HISTORY_COLUMNS = channel_registry.history_columns(KEY_TIME)
+temperature_history = HistoryBuffer(
+    RAW_HISTORY_SECONDS, HISTORY_COLUMNS, time_column=KEY_TIME
+)
 
 # Store decimated data for different time windows (name, duration_s, interval_s)
 _DECIMATION_WINDOWS = [
@@ -75,46 +194,174 @@ _DECIMATION_WINDOWS = [
     ("8hr", 8 * HOUR, 40 * SECOND),
 ]
 _DECIMATED_RESPONSE_WINDOWS = [name for (name, _, _) in _DECIMATION_WINDOWS if name != "5min"]
+DECIMATED_COLUMNS = (KEY_TIME,) + channel_registry.temp_keys
+# Each window's averaged entries in a ring readers can copy without a lock
 decimated_history = {
-    name: {"data": deque(maxlen=max(1, duration // interval)), "interval": interval}
+    name: {
+        "data": HistoryBuffer(
+            max(1, duration // interval), DECIMATED_COLUMNS, time_column=KEY_TIME
+        ),
+        "interval": interval,
+    }
     for name, duration, interval in _DECIMATION_WINDOWS
 }
 
-# Track the last time we added to each decimated history
-decimated_last_update = {key: 0 for key in decimated_history}
+# Running per-window accumulators; each emits an averaged entry when its bucket closes
+decimation_accumulators = {
+    name: DecimationAccumulator(history["interval"], channel_registry.temp_keys)
+    for name, history in decimated_history.items()
+}
+# Min/mean/max of the temperatures at every power-of-two bucket width, for
+# ?start=&end= queries
+history_pyramid = HistoryPyramid(
+    temperature_history, channel_registry.temp_keys, time_key=KEY_TIME, metrics=metrics
+)
+# Serializes writers of the raw and decimated history; readers do not take it
 data_lock = threading.Lock()
 
-control_status = {
-    KEY_RUNNING: False,
-    KEY_TARGET_TEMP: DEFAULT_TARGET_TEMP,
-    KEY_BURNER_ON: False,
-    KEY_PID_OUTPUT: 0.0,
-    KEY_LAST_TOGGLE_TIME: 0,
-    # Two-stage burner state
-    KEY_STAGE1_ON: False,
-    KEY_STAGE2_ON: False,
-    KEY_BURNER_REQUEST_STAGE: 0,
-    KEY_CONNECTED: False,
-    KEY_LAST_TOGGLE_TIME_STAGE1: 0,
-    KEY_LAST_TOGGLE_TIME_STAGE2: 0,
+adc_settings = {
+    "data_rate": ADC_DATA_RATE,
+    "oversample": ADC_OVERSAMPLE,
+    "filter": ADC_FILTER,
 }
-control_lock = threading.Lock()
+# Per-channel noise statistics published by the temperature worker
+adc_stats = SnapshotCell()
+
+# Pre-serialized /temperature_history responses keyed by (count, algo), valid
+# for the _history_stamp() they were built from.
+history_cache = SnapshotCell({"stamp": None, "responses": {}})
+
+# Run state, target and burner state per zone
+zone_status = {
+    name: SnapshotCell({
+        KEY_RUNNING: False,
+        KEY_TARGET_TEMP: DEFAULT_TARGET_TEMP,
+        KEY_BURNER_ON: False,
+        KEY_PID_OUTPUT: 0.0,
+        KEY_LAST_TOGGLE_TIME: 0,
+        # Two-stage burner state
+        KEY_STAGE1_ON: False,
+        KEY_STAGE2_ON: False,
+        KEY_BURNER_REQUEST_STAGE: 0,
+        KEY_CONNECTED: False,
+        KEY_LAST_TOGGLE_TIME_STAGE1: 0,
+        KEY_LAST_TOGGLE_TIME_STAGE2: 0,
+        KEY_CONTROLLER: DEFAULT_CONTROLLER,
+    })
+    for name in channel_registry.zones
+}
+# The primary zone's status is what /status and the live stream report by default
+control_status = zone_status[PRIMARY_ZONE]
+
+# Every history column except time is recorded per sample
+SESSION_COLUMNS = tuple(c for c in HISTORY_COLUMNS if c != KEY_TIME)
+session_recorder = SessionRecorder(
+    os.path.join(SESSION_DIR, CURRENT_SESSION_FILE),
+    SESSION_COLUMNS,
+    flush_interval=SESSION_FLUSH_INTERVAL_S,
+)
+atexit.register(session_recorder.close)
+
+# Per-relay on-time, toggle counts and start budget, published for /relays
+relay_stats = SnapshotCell()
+relay_accounting = RelayAccounting(
+    [
+        relay
+        for zone in channel_registry.zones.values()
+        for relay in (zone.relay_stage1, zone.relay_stage2)
+    ],
+    window_s=RELAY_WINDOW_S,
+    max_starts=RELAY_MAX_STARTS,
+    paced=RELAY_PACED_STARTS,
+    path=RELAY_STATS_FILE,
+    snapshot=relay_stats,
+)
+atexit.register(relay_accounting.save)
+
+# Time-to-done estimates for every probe no zone controls on (the turkey),
+# republished by the "eta" task each time its fit advances
+eta_status = SnapshotCell()
+eta_predictor = EtaPredictor(
+    channel_registry, temperature_history, zone_status, eta_status, notifier
+)
 
 # Guard to ensure background threads start exactly once per process
 threads_started = False
 threads_lock = threading.Lock()
 
-pid = PID(
-    Kp=PID_KP,
-    Ki=PID_KI,
-    Kd=PID_KD,
-    setpoint=control_status[KEY_TARGET_TEMP],
-    output_limits=(PID_OUT_MIN, PID_OUT_MAX),
-)
 
+def _gains_file(zone):
+    """Where a zone's autotuned gains live; the primary zone keeps PID_GAINS_FILE."""
+    if zone.primary:
+        return PID_GAINS_FILE
+    return os.path.join(CONFIG_DIR, f"pid_gains_{zone.name}.json")
+
+
+# One PID per zone, with saved gains if the zone has been autotuned
+saved_pid_gains = {}
+zone_pids = {}
+for _zone in channel_registry.zones.values():
+    saved_pid_gains[_zone.name] = load_gains(_gains_file(_zone))
+    _kp, _ki, _kd = saved_pid_gains[_zone.name] or (PID_KP, PID_KI, PID_KD)
+    zone_pids[_zone.name] = PID(
+        Kp=_kp,
+        Ki=_ki,
+        Kd=_kd,
+        setpoint=zone_status[_zone.name].get()[KEY_TARGET_TEMP],
+        output_limits=(PID_OUT_MIN, PID_OUT_MAX),
+    )
+
+
+def _autotune_finished(zone_name, result):
+    """Apply and save the gains from a finished autotune.
+
+    Control then goes back to the previous mode.
+    """
+    # Runs on the scheduler thread, between PID updates
+    zone = channel_registry.zones[zone_name]
+    label = "" if zone.primary else f"{zone_name}: "
+    if result["phase"] == PHASE_DONE:
+        gains = (result["kp"], result["ki"], result["kd"])
+        zone_pids[zone_name].tunings = gains
+        try:
+            save_gains(
+                _gains_file(zone),
+                gains,
+                rule=result["rule"],
+                ultimate_gain=result["ultimate_gain"],
+                ultimate_period_s=result["ultimate_period_s"],
+            )
+        except OSError as e:
+            app.logger.error("%sCould not save PID gains: %s", label, e)
+        app.logger.info(
+            "%sAutotune done: Ku %.2f, Tu %.0fs -> Kp %.3f, Ki %.4f, Kd %.1f (%s)",
+            label,
+            result["ultimate_gain"],
+            result["ultimate_period_s"],
+            *gains,
+            result["rule"],
+        )
+    else:
+        app.logger.error("%sAutotune failed: %s", label, result.get("error"))
+    zone_status[zone_name].update({KEY_CONTROLLER: result["previous_mode"]})
+    notifier.notify(TOPIC_STATUS)
 
-# --- Worker Threads ---
 
+# Burner controllers by zone and mode; the predictive one falls back to PID
+# until its model is trusted, and the autotuner only runs when started
+# through /autotune
+zone_controllers = {
+    name: {
+        CONTROLLER_PID: PidHysteresisController(zone_pids[name]),
+        CONTROLLER_PREDICTIVE: PredictiveController(
+            PidHysteresisController(zone_pids[name]), sample_period=SAMPLE_PERIOD_S
+        ),
+        CONTROLLER_AUTOTUNE: RelayAutotuner(
+            on_finish=functools.partial(_autotune_finished, name)
+        ),
+    }
+    for name in channel_registry.zones
+}
 
 
 # --- Flask App ---
@@ -132,26 +379,157 @@ assets.url = app.static_url_path
 assets.append_path(os.path.join(app.root_path, "node_modules"))
 assets.append_path(os.path.join(app.root_path, "static"))
 
-with app.app_context():
-    # Create bundles
-    css_bundle = Bundle("bootstrap/dist/css/bootstrap.min.css", output="gen/packed.css")
-
-    js_bundle = Bundle(
-        "bootstrap/dist/js/bootstrap.bundle.min.js",
-        "chart.js/dist/chart.umd.min.js",
-        # Use the bundled adapter that includes date-fns to avoid missing dependency errors
-        "chartjs-adapter-date-fns/dist/chartjs-adapter-date-fns.bundle.min.js",
-        "chartjs-plugin-annotation/dist/chartjs-plugin-annotation.min.js",
-        output="gen/packed.js",
-    )
+# The bundles are built ahead of time (`flask --app app assets build`) and
+# served as plain files; only debug mode checks and rebuilds them on request
+assets.auto_build = app.debug
+
+# Create bundles
+css_bundle = Bundle("bootstrap/dist/css/bootstrap.min.css", output="gen/packed.css")
+
+js_bundle = Bundle(
+    "bootstrap/dist/js/bootstrap.bundle.min.js",
+    "chart.js/dist/chart.umd.min.js",
+    # Use the bundled adapter that includes date-fns to avoid missing dependency errors
+    "chartjs-adapter-date-fns/dist/chartjs-adapter-date-fns.bundle.min.js",
+    "chartjs-plugin-annotation/dist/chartjs-plugin-annotation.min.js",
+    output="gen/packed.js",
+)
 
-    assets.register("css_all", css_bundle)
-    assets.register("js_all", js_bundle)
+assets.register("css_all", css_bundle)
+assets.register("js_all", js_bundle)
 
-handler = DequeHandler(log_messages)
+handler = LogBufferHandler(log_buffer, notifier, TOPIC_LOGS)
 handler.setLevel(logging.INFO)
 app.logger.addHandler(handler)
 app.logger.setLevel(logging.INFO)
+# Failed session writes happen on the recorder's own thread; report them here
+session_recorder.logger = app.logger
+
+# Runs sampling, decimation and control as deadline-scheduled tasks on one thread
+scheduler = Scheduler(app.logger)
+
+# Cook programs drive each zone's target and run state from their own task;
+# a run that was active before a restart comes back paused
+program_runner = ProgramRunner(
+    channel_registry,
+    zone_status,
+    temperature_history,
+    notifier,
+    session_recorder,
+    path=PROGRAMS_FILE,
+    logger=app.logger,
+)
+
+# Checks temperatures, sample freshness and control heartbeats on its own
+# thread and can switch every relay off behind the control task's back
+watchdog = Watchdog(
+    channel_registry,
+    temperature_data,
+    zone_status,
+    notifier,
+    session_recorder,
+    app.logger,
+    max_temp_c=WATCHDOG_MAX_TEMP_C,
+    max_rise_c_per_min=WATCHDOG_MAX_RISE_C_PER_MIN,
+    time_key=KEY_TIME,
+    metrics=metrics,
+)
+
+
+def _samples_with_stage(times, temps, stage_events):
+    """Pair each sample with the burner stage in effect when it was taken."""
+    stage = 0
+    i = 0
+    for time_ms, temp in zip(times, temps):
+        while i < len(stage_events) and stage_events[i][0] <= time_ms:
+            stage = stage_events[i][1]
+            i += 1
+        yield time_ms, temp, stage
+
+
+def _replay_session(log):
+    """Rebuild raw and decimated history (and the target) from a session log."""
+    now_ms = time.time() * 1000
+    times = log.times
+    with data_lock:
+        first = bisect.bisect_left(times, now_ms - RAW_HISTORY_SECONDS * 1000)
+        columns = [log.values[name] for name in SESSION_COLUMNS]
+        for i in range(
+            max(first, len(times) - temperature_history.capacity), len(times)
+        ):
+            entry = {KEY_TIME: times[i]}
+            for name, column in zip(SESSION_COLUMNS, columns):
+                entry[name] = column[i]
+            temperature_history.append(entry)
+        if temperature_history:
+            temperature_data.publish(temperature_history[-1])
+
+        # Each window only needs the samples that can still fall inside it
+        for name, duration, _ in _DECIMATION_WINDOWS:
+            accumulator = decimation_accumulators[name]
+            first = bisect.bisect_left(times, now_ms - duration * 1000)
+            window_values = {key: log.values[key][first:] for key in accumulator.keys}
+            emitted = accumulator.replay(times[first:], window_values)
+            decimated_history[name]["data"].extend(
+                {
+                    column: [entry[column] for entry in emitted]
+                    for column in DECIMATED_COLUMNS
+                }
+            )
+        history_pyramid.replay(times, log.values)
+
+    # Warm-start each zone's predictive model from the last hour of the cook;
+    # older samples would be mostly forgotten by the fit anyway.
+    first = bisect.bisect_left(times, now_ms - RAW_HISTORY_SECONDS * 1000)
+    for zone in channel_registry.zones.values():
+        stage_events = [
+            (time_ms, applied_stage(values[1], values[2]))
+            for time_ms, values in log.zone_events(RECORD_STAGE, zone.index)
+        ]
+        zone_controllers[zone.name][CONTROLLER_PREDICTIVE].prime(
+            _samples_with_stage(
+                times[first:], log.values[zone.probe.temp_key][first:], stage_events
+            )
+        )
+
+        target = log.last_event(RECORD_TARGET, zone.index)
+        if target is not None:
+            zone_status[zone.name].update({KEY_TARGET_TEMP: target[1][0]})
+            zone_pids[zone.name].setpoint = target[1][0]
+
+
+def restore_session():
+    """Resume the current session log if it is recent, else archive it; then open it."""
+    path = session_recorder.path
+    if os.path.exists(path):
+        log = None
+        try:
+            log = SessionLog(path)
+        except (OSError, ValueError) as e:
+            app.logger.error("Unreadable session log, archiving it: %s", e)
+        end_time = log.end_time if log is not None else None
+        resumable = (
+            log is not None
+            and log.columns == SESSION_COLUMNS
+            and end_time is not None
+            and time.time() * 1000 - end_time <= SESSION_RESUME_GAP_S * 1000
+        )
+        if resumable:
+            started = time.perf_counter()
+            _replay_session(log)
+            app.logger.info(
+                "Resumed session with %d samples in %.2fs (burner left stopped).",
+                len(log),
+                time.perf_counter() - started,
+            )
+        else:
+            start = log.meta.get("start") if log is not None else None
+            archive_id = int(
+                start if start is not None else os.path.getmtime(path) * 1000
+            )
+            os.replace(path, os.path.join(SESSION_DIR, f"{archive_id}{SESSION_SUFFIX}"))
+            app.logger.info("Archived previous session %s.", archive_id)
+    session_recorder.open()
 
 
 def start_background_threads():
@@ -160,35 +538,100 @@ def start_background_threads():
     with threads_lock:
         if threads_started:
             return
-        temp_worker = threading.Thread(
-            target=temperature_worker,
-            args=(
-                app.logger,
-                temperature_data,
-                temperature_history,
-                decimated_history,
-                decimated_last_update,
-                data_lock,
-                control_status,
-                control_lock,
-            ),
+        restore_session()
+        # The 3 s window covers the last half hour of a resumed cook
+        eta_predictor.prime(decimated_history["30min"]["data"][:])
+        for zone in channel_registry.zones.values():
+            kp, ki, kd = zone_pids[zone.name].tunings
+            app.logger.info(
+                "%sPID gains Kp %s, Ki %s, Kd %s%s",
+                _zone_label(zone.name),
+                kp,
+                ki,
+                kd,
+                f" (from {_gains_file(zone)})" if saved_pid_gains[zone.name] else "",
+            )
+        calibration = ThermistorCalibration(cache_dir=CACHE_DIR)
+        sh_a, sh_b, sh_c = calibration.coefficients
+        app.logger.info(
+            "Thermistor coeffs A: %.9f, B: %.9f, C: %.9f; table max error %.6f C%s",
+            sh_a,
+            sh_b,
+            sh_c,
+            calibration.max_error,
+            " (cached)" if calibration.from_cache else "",
         )
-        temp_worker.daemon = True
-        temp_worker.start()
-
-        burner_worker = threading.Thread(
-            target=burner_control_worker,
-            args=(
+        hardware = open_backend(HARDWARE_BACKEND, channel_registry, calibration)
+        app.logger.info("Hardware backend: %s", hardware.name)
+        temp_worker = TemperatureWorker(
+            app.logger,
+            temperature_data,
+            temperature_history,
+            data_lock,
+            zone_status,
+            notifier,
+            session_recorder,
+            adc_settings,
+            adc_stats,
+            calibration,
+            channels=channel_registry,
+            open_adc=hardware.open_adc,
+            metrics=metrics,
+        )
+        burner_workers = {
+            zone.name: BurnerControlWorker(
                 app.logger,
                 temperature_history,
-                data_lock,
-                control_status,
-                control_lock,
-                pid,
-            ),
+                zone_status[zone.name],
+                zone_controllers[zone.name],
+                notifier,
+                session_recorder,
+                relay_accounting,
+                open_relay=hardware.open_relay,
+                metrics=metrics,
+                zone=zone,
+                heartbeat=watchdog.heartbeat(zone.name),
+                interlock=watchdog.guard,
+            )
+            for zone in channel_registry.zones.values()
+        }
+        decimator = HistoryDecimator(
+            temperature_history,
+            decimated_history,
+            decimation_accumulators,
+            data_lock,
+            KEY_TIME,
+            metrics=metrics,
         )
-        burner_worker.daemon = True
-        burner_worker.start()
+
+        # Control and decimation fire right after each fresh sample, so the PID
+        # never sees a stale or repeated reading. Each zone is its own task
+        # ("control" for the primary zone, "control_<zone>" for the others).
+        scheduler.add_task("sample", temp_worker.step, period=SAMPLE_PERIOD_S)
+        # Before control, so a program's new setpoint applies on the same sample
+        scheduler.add_task("program", program_runner.step, after="sample")
+        for name, burner_worker in burner_workers.items():
+            task = "control" if name == PRIMARY_ZONE else f"control_{name}"
+            scheduler.add_task(
+                task,
+                burner_worker.step,
+                period=CONTROL_FALLBACK_PERIOD_S,
+                after="sample",
+            )
+        scheduler.add_task("decimate", decimator.step, after="sample")
+        scheduler.add_task("pyramid", history_pyramid.step, after="sample")
+        scheduler.add_task("eta", eta_predictor.step, after="sample")
+
+        def run_scheduler():
+            temp_worker.setup()
+            for burner_worker in burner_workers.values():
+                burner_worker.setup()
+            scheduler.run_forever()
+
+        scheduler_thread = threading.Thread(target=run_scheduler, name="scheduler")
+        scheduler_thread.daemon = True
+        scheduler_thread.start()
+        watchdog.start()
 
         threads_started = True
         app.logger.info("Background threads started.")
@@ -200,6 +643,87 @@ def _ensure_threads_started():
     start_background_threads()
 
 
+# Request latency per route, looked up once per route rather than per request
+_request_histograms = {}
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _observe_request(response):
+    started = g.get("request_started")
+    if metrics.enabled and started is not None:
+        # Streaming responses (/stream) are timed up to their first byte
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        histogram = _request_histograms.get(route)
+        if histogram is None:
+            histogram = _request_histograms[route] = metrics.histogram(
+                "roboburn_http_request_seconds", "Request handling time", route=route
+            )
+        histogram.observe(time.perf_counter() - started)
+        metrics.counter(
+            "roboburn_http_responses_total", "Responses by route and status",
+            route=route, status=response.status_code,
+        ).inc()
+    return response
+
+
+@metrics.collector
+def _scheduler_metrics():
+    tasks = scheduler.stats().items()
+    yield "roboburn_task_runs_total", "counter", "Scheduled task runs", [
+        ({"task": name}, stats["runs"]) for name, stats in tasks
+    ]
+    yield (
+        "roboburn_task_overruns_total",
+        "counter",
+        "Deadlines a task missed entirely",
+        [({"task": name}, stats["overruns"]) for name, stats in tasks],
+    )
+    yield "roboburn_task_errors_total", "counter", "Task runs that raised", [
+        ({"task": name}, stats["errors"]) for name, stats in tasks
+    ]
+    yield (
+        "roboburn_task_jitter_seconds",
+        "gauge",
+        "Start delay past the deadline (EWMA)",
+        [({"task": name}, stats["mean_jitter_s"]) for name, stats in tasks],
+    )
+    yield "roboburn_task_max_duration_seconds", "gauge", "Longest task run so far", [
+        ({"task": name}, stats["max_duration_s"]) for name, stats in tasks
+    ]
+
+
+@metrics.collector
+def _relay_metrics():
+    relays = relay_stats.get().get("relays", {})
+    yield "roboburn_relay_on", "gauge", "Stage relay state", [
+        ({"relay": name}, int(stats["on"])) for name, stats in relays.items()
+    ]
+    yield (
+        "roboburn_relay_starts_total",
+        "counter",
+        "Stage starts over the relay's lifetime",
+        [
+            ({"relay": name}, stats["lifetime"]["starts"])
+            for name, stats in relays.items()
+        ],
+    )
+
+
+@app.route("/metrics")
+def get_metrics():
+    """Prometheus text-format metrics (404 when ROBOBURN_METRICS=0)."""
+    if not metrics.enabled:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.route("/")
 def index():
     app.logger.info("Main page loaded.")
@@ -208,95 +732,673 @@ def index():
 
 @app.route("/temperatures")
 def get_temperatures():
-    with data_lock:
-        if temperature_history:
-            return jsonify(temperature_history[-1])
-        return jsonify({})
+    return jsonify(dict(temperature_data.get()))
+
+
+def _json_payload(payload):
+    """Wrap an already-serialized JSON string in a response."""
+    return app.response_class(payload, mimetype="application/json")
+
+
+def _history_format():
+    """``(format, gzip)`` for a history request; ``ValueError`` for an unknown format.
+
+    JSON unless ``?format=binary`` or an ``Accept`` of the binary type asks
+    for wire_format.py's encoding, which is gzipped for clients that accept
+    it unless ``?gzip=0``.
+    """
+    history_format = negotiate(
+        request.args.get("format"), request.headers.get("Accept")
+    )
+    gzipped = (
+        history_format == FORMAT_BINARY
+        and "gzip" in request.headers.get("Accept-Encoding", "")
+        and request.args.get("gzip") != "0"
+    )
+    return history_format, gzipped
+
+
+def _serialize_history(entries, history_format, gzipped, columns=SESSION_COLUMNS):
+    if history_format != FORMAT_BINARY:
+        return app.json.dumps(entries)
+    payload = encode_history(entries, columns, KEY_TIME)
+    return compress(payload) if gzipped else payload
+
+
+def _history_payload(payload, history_format, gzipped):
+    """Wrap a :func:`_serialize_history` payload in a response."""
+    if history_format != FORMAT_BINARY:
+        return _json_payload(payload)
+    response = app.response_class(payload, mimetype=MIME_TYPE)
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.update(("Accept", "Accept-Encoding"))
+    return response
+
+
+def _history_stamp():
+    """Changes whenever a sample or a decimated bucket is added.
+
+    A new stamp invalidates cached responses.
+    """
+    return temperature_history.stamp() + tuple(
+        decimated_history[name]["data"].stamp() for name in _DECIMATED_RESPONSE_WINDOWS
+    )
+
+
+def _build_history(req_count, algo=DEFAULT_ALGORITHM):
+    """Merge recent raw samples with the decimated windows, optionally downsampled."""
+    current_time = time.time()
+    five_min_ago_ms = current_time * 1000 - FIVE_MINUTES_MS
+
+    # Get recent high-resolution data
+    recent_data = temperature_history.between(five_min_ago_ms)
+
+    # Get decimated historical data
+    historical_data = []
+    for key in _DECIMATED_RESPONSE_WINDOWS:
+        historical_data.extend(decimated_history[key]["data"][:])
+
+    # Combine and sort all data
+    all_data = recent_data + historical_data
+    all_data.sort(key=lambda x: x[KEY_TIME])
+
+    return _downsample_history(all_data, req_count, algo)
+
+
+def _downsample_history(entries, req_count, algo):
+    """Optional downsampling of time-sorted entries to the requested point budget."""
+    if req_count and req_count > 0 and len(entries) > req_count:
+        return downsample(
+            entries,
+            req_count,
+            algo,
+            time_key=KEY_TIME,
+            value_keys=channel_registry.temp_keys,
+        )
+    return entries
+
+
+def _unknown_algo_response(algo):
+    return jsonify(
+        {"error": f"Unknown algo '{algo}'", "algos": sorted(ALGORITHMS)}
+    ), 400
 
 
 @app.route("/temperature_history")
 def get_temperature_history():
-    with data_lock:
-        current_time = time.time()
-        five_min_ago_ms = current_time * 1000 - FIVE_MINUTES_MS
-
-        # Get recent high-resolution data
-        recent_data = [entry for entry in temperature_history if entry[KEY_TIME] >= five_min_ago_ms]
-
-        # Get decimated historical data
-        historical_data = []
-        for key in _DECIMATED_RESPONSE_WINDOWS:
-            historical_data.extend(decimated_history[key]["data"])
-
-        # Combine and sort all data
-        all_data = recent_data + historical_data
-        all_data.sort(key=lambda x: x[KEY_TIME])
-
-        # Optional downsampling by requested count, evenly distributed across timeline
-        req_count = request.args.get("count", type=int)
-        if req_count and req_count > 0 and len(all_data) > req_count:
-            times = [x[KEY_TIME] for x in all_data]
-            t_min = times[0]
-            t_max = times[-1]
-            if t_max == t_min:
-                sampled = [all_data[-1]]
-            else:
-                step = (t_max - t_min) / max(1, (req_count - 1))
-                chosen_indices = []
-                last_idx = -1
-                for i in range(req_count):
-                    target_t = t_min + i * step
-                    idx = bisect.bisect_left(times, target_t)
-                    if idx >= len(times):
-                        idx = len(times) - 1
-                    if idx > 0:
-                        # choose closer between idx-1 and idx
-                        if abs(times[idx] - target_t) >= abs(target_t - times[idx - 1]):
-                            idx = idx - 1
-                    if idx != last_idx:
-                        chosen_indices.append(idx)
-                        last_idx = idx
-                sampled = [all_data[i] for i in chosen_indices]
-            return jsonify(sampled)
-
-        return jsonify(all_data)
+    """Recent raw samples merged with the decimated windows, as JSON or binary.
+
+    The binary encoding is wire_format.py's. With ``start`` and/or ``end``
+    (ms), the range comes from the pyramid instead: min/mean/max buckets at
+    the finest width that fits ``count``.
+    """
+    try:
+        history_format, gzipped = _history_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    since = request.args.get("since", type=float)
+    if since is not None:
+        # Incremental query: only raw samples newer than the client's last point
+        new_data = temperature_history.since(since)
+        return _history_payload(
+            _serialize_history(new_data, history_format, gzipped),
+            history_format,
+            gzipped,
+        )
+
+    req_count = request.args.get("count", type=int)
+    algo = request.args.get("algo", DEFAULT_ALGORITHM)
+    if algo not in ALGORITHMS:
+        return _unknown_algo_response(algo)
+    start = request.args.get("start", type=float)
+    end = request.args.get("end", type=float)
+    if start is not None or end is not None:
+        _, entries = history_pyramid.query(start, end, req_count)
+        # Only thinned out if even the coarsest level is over the budget
+        entries = _downsample_history(entries, req_count, algo)
+        return _history_payload(
+            _serialize_history(
+                entries, history_format, gzipped, history_pyramid.columns[1:]
+            ),
+            history_format,
+            gzipped,
+        )
+    cache_key = (req_count, algo, history_format, gzipped)
+    stamp = _history_stamp()
+    cache = history_cache.get()
+    if cache["stamp"] == stamp and cache_key in cache["responses"]:
+        return _history_payload(cache["responses"][cache_key], history_format, gzipped)
+
+    payload = _serialize_history(
+        _build_history(req_count, algo), history_format, gzipped
+    )
+    with history_cache.edit() as cache:
+        # Only cache if nothing new arrived while we were building
+        if stamp == _history_stamp():
+            responses = cache["responses"] if cache["stamp"] == stamp else {}
+            cache["stamp"] = stamp
+            cache["responses"] = {**responses, cache_key: payload}
+    return _history_payload(payload, history_format, gzipped)
+
+
+def _session_path(session_id):
+    """Path of an archived or current session, or None for malformed ids."""
+    if session_id != "current" and not session_id.isdigit():
+        return None
+    return os.path.join(SESSION_DIR, f"{session_id}{SESSION_SUFFIX}")
+
+
+@app.route("/sessions")
+def get_sessions():
+    """List recorded cooks (archived logs plus the current one), oldest first."""
+    return jsonify(list_sessions(SESSION_DIR))
+
+
+@app.route("/sessions/<session_id>/history")
+def get_session_history(session_id):
+    """Samples of one session between ``start`` and ``end`` (ms).
+
+    They are downsampled and encoded like /temperature_history.
+    """
+    path = _session_path(session_id)
+    if path is None or not os.path.exists(path):
+        return jsonify({"error": f"Unknown session '{session_id}'"}), 404
+    try:
+        history_format, gzipped = _history_format()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    start = request.args.get("start", type=float)
+    end = request.args.get("end", type=float)
+    req_count = request.args.get("count", type=int)
+    algo = request.args.get("algo", DEFAULT_ALGORITHM)
+    if algo not in ALGORITHMS:
+        return _unknown_algo_response(algo)
+
+    try:
+        log = SessionLog(path, start_time=start, end_time=end)
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Unreadable session '{session_id}': {e}"}), 422
+    columns = [(name, log.values[name]) for name in log.columns]
+    entries = []
+    for i, timestamp in enumerate(log.times):
+        entry = {KEY_TIME: timestamp}
+        for name, column in columns:
+            value = column[i]
+            entry[name] = None if math.isnan(value) else value
+        entries.append(entry)
+    entries = _downsample_history(entries, req_count, algo)
+    return _history_payload(
+        _serialize_history(entries, history_format, gzipped, log.columns),
+        history_format,
+        gzipped,
+    )
+
+
+@app.route("/adc")
+def get_adc_stats():
+    """Sampler configuration and per-channel noise statistics."""
+    return jsonify({**adc_settings, "channels": dict(adc_stats.get())})
+
+
+@app.route("/channels")
+def get_channels():
+    """The probe and zone layout, each probe's latest reading and each zone's status."""
+    latest = temperature_data.get() or {}
+    return jsonify(
+        {
+            "primary_zone": PRIMARY_ZONE,
+            "probes": [
+                {
+                    **probe.as_dict(),
+                    "temp": latest.get(probe.temp_key),
+                    "voltage": latest.get(probe.voltage_key),
+                    "resistance": latest.get(probe.resistance_key),
+                }
+                for probe in channel_registry.probes
+            ],
+            "zones": [
+                {**zone.as_dict(), "status": dict(zone_status[zone.name].get())}
+                for zone in channel_registry.zones.values()
+            ],
+        }
+    )
+
+
+def _request_zone():
+    """Zone a request acts on: ``zone`` from the query or JSON body, else the primary.
+
+    Returns ``(name, None)``, or ``(None, error response)`` for an unknown zone.
+    """
+    name = request.args.get("zone")
+    if name is None and request.is_json:
+        name = (request.get_json(silent=True) or {}).get("zone")
+    if name is None:
+        return PRIMARY_ZONE, None
+    if name not in zone_status:
+        return None, (
+            jsonify(
+                {
+                    "success": False,
+                    "error": f"Unknown zone '{name}'",
+                    "zones": list(zone_status),
+                }
+            ),
+            404,
+        )
+    return name, None
+
+
+@app.route("/scheduler")
+def get_scheduler_stats():
+    """Per-task run counts, jitter and overrun statistics."""
+    return jsonify(scheduler.stats())
+
+
+@app.route("/relays")
+def get_relay_stats():
+    """Per-stage relay on-time, duty cycle, toggle rate, start budget and lifetime."""
+    return jsonify(dict(relay_stats.get()))
+
+
+@app.route("/controller", methods=["GET", "POST"])
+def controller_mode():
+    """Active burner controller, the available modes and each controller's state.
+
+    POST ``{"mode": "pid" | "predictive"}`` switches mode; the burner worker
+    picks it up on its next step. ``zone`` (query or body) picks the zone.
+    """
+    zone, error = _request_zone()
+    if error is not None:
+        return error
+    control_status = zone_status[zone]
+    controllers = zone_controllers[zone]
+    if request.method == "POST":
+        mode = (request.json or {}).get("mode")
+        if mode == CONTROLLER_AUTOTUNE:
+            return jsonify(
+                {"success": False, "error": "Start the autotune through /autotune"}
+            ), 400
+        if mode not in controllers:
+            return jsonify(
+                {"success": False, "error": f"Unknown controller '{mode}'"}
+            ), 400
+        control_status.update({KEY_CONTROLLER: mode})
+        notifier.notify(TOPIC_STATUS)
+        app.logger.info("%sController mode set to: %s", _zone_label(zone), mode)
+    return jsonify(
+        {
+            "zone": zone,
+            "mode": control_status.get()[KEY_CONTROLLER],
+            "modes": sorted(controllers),
+            "controllers": {
+                name: controller.state() for name, controller in controllers.items()
+            },
+        }
+    )
+
+
+@app.route("/autotune", methods=["GET", "POST"])
+def autotune():
+    """Relay-feedback PID autotune: progress, the last result and the live gains.
+
+    POST ``{"action": "start", "rule": ...}`` takes over the burner with the
+    relay experiment around the current target (it only drives the burner
+    while the system is running); ``{"action": "cancel"}`` abandons it. On
+    success the gains are applied and saved (``PID_GAINS_FILE`` for the
+    primary zone), and the previous controller takes back over either way.
+    ``zone`` (query or body) picks the zone.
+    """
+    zone, error = _request_zone()
+    if error is not None:
+        return error
+    control_status = zone_status[zone]
+    tuner = zone_controllers[zone][CONTROLLER_AUTOTUNE]
+    if request.method == "POST":
+        payload = request.json or {}
+        action = payload.get("action")
+        if action == "start":
+            with control_status.edit() as status:
+                previous_mode = status[KEY_CONTROLLER]
+                if previous_mode == CONTROLLER_AUTOTUNE:
+                    return jsonify(
+                        {"success": False, "error": "Autotune is already running"}
+                    ), 409
+                try:
+                    tuner.start(previous_mode, payload.get("rule", DEFAULT_RULE))
+                except ValueError as e:
+                    return jsonify({"success": False, "error": str(e)}), 400
+                status[KEY_CONTROLLER] = CONTROLLER_AUTOTUNE
+            app.logger.info(
+                "%sAutotune started (%s) around the current target.",
+                _zone_label(zone),
+                tuner.rule,
+            )
+        elif action == "cancel":
+            if not tuner.cancel():
+                return jsonify(
+                    {"success": False, "error": "Autotune is not running"}
+                ), 409
+            control_status.update({KEY_CONTROLLER: tuner.previous_mode})
+            app.logger.info("%sAutotune cancelled.", _zone_label(zone))
+        else:
+            return jsonify(
+                {"success": False, "error": f"Unknown action '{action}'"}
+            ), 400
+        notifier.notify(TOPIC_STATUS)
+    kp, ki, kd = zone_pids[zone].tunings
+    return jsonify(
+        {
+            "success": True,
+            "zone": zone,
+            "autotune": tuner.state(),
+            "gains": {"kp": kp, "ki": ki, "kd": kd},
+        }
+    )
+
+
+@app.route("/program", methods=["GET", "POST"])
+def program_runs():
+    """Saved cook programs and each zone's run.
+
+    POST ``{"action": "start", "program": name}`` starts a program (and its
+    zone) on ``zone``, else the zone the program names, else the primary
+    zone; ``"pause"`` stops the zone and holds the program where it is,
+    ``"resume"`` continues it and ``"stop"`` abandons it, leaving the
+    burner as it is. ``zone`` (query or body) picks the zone.
+    """
+    zone, error = _request_zone()
+    if error is not None:
+        return error
+    if request.method == "POST":
+        payload = request.json or {}
+        action = payload.get("action")
+        if action in ("start", "resume") and watchdog.tripped is not None:
+            return _tripped_response()
+        if action == "start":
+            name = payload.get("program")
+            explicit_zone = request.args.get("zone") or payload.get("zone")
+            try:
+                zone = program_runner.start(name, explicit_zone)
+            except KeyError:
+                return jsonify(
+                    {"success": False, "error": f"Unknown program '{name}'"}
+                ), 404
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 409
+        elif action == "stop":
+            if not program_runner.stop(zone):
+                return jsonify(
+                    {"success": False, "error": "No program is running"}
+                ), 409
+        elif action == "pause":
+            if not program_runner.pause(zone):
+                return jsonify(
+                    {"success": False, "error": "No program is running"}
+                ), 409
+        elif action == "resume":
+            if not program_runner.resume(zone):
+                return jsonify({"success": False, "error": "No program is paused"}), 409
+        else:
+            return jsonify(
+                {"success": False, "error": f"Unknown action '{action}'"}
+            ), 400
+    return jsonify({"success": True, "zone": zone, **program_runner.state()})
+
+
+@app.route("/program/<name>", methods=["GET", "PUT", "DELETE"])
+def program_definition(name):
+    """One saved program: GET it, PUT it to create or replace it, DELETE it.
+
+    A PUT body is ``{"steps": [...], ...}``; see programs.py for the step
+    format. A program a zone is running cannot be deleted; replacing it does
+    not change the run already in progress.
+    """
+    if request.method == "PUT":
+        try:
+            program = program_runner.put(name, request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        app.logger.info("Program '%s' saved (%d steps).", name, len(program["steps"]))
+        return jsonify({"success": True, "name": name, "program": program})
+    if request.method == "DELETE":
+        try:
+            deleted = program_runner.delete(name)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 409
+        if deleted:
+            app.logger.info("Program '%s' deleted.", name)
+            return jsonify({"success": True})
+    program = program_runner.state()["programs"].get(name)
+    if program is None:
+        return jsonify({"success": False, "error": f"Unknown program '{name}'"}), 404
+    return jsonify({"success": True, "name": name, "program": program})
 
 
 @app.route("/status")
 def get_status():
-    with control_lock:
-        return jsonify(control_status)
+    """A zone's run state, target and burner state, plus ``eta`` for every food probe.
+
+    ``eta`` is the estimate the "eta" task last published (see eta.py):
+    ``eta_s`` with an ``eta_low_s``/``eta_high_s`` band and ``done_at``
+    once ``status`` is ``estimating``. ``watchdog`` is the safety trip, or
+    null.
+    """
+    zone, error = _request_zone()
+    if error is not None:
+        return error
+    return jsonify(
+        {
+            **zone_status[zone].get(),
+            "eta": dict(eta_status.get()),
+            "watchdog": watchdog.tripped,
+        }
+    )
+
+
+@app.route("/eta", methods=["GET", "POST"])
+def eta():
+    """Cook-completion estimates.
+
+    POST ``{"probe": name, "done_temp": C}`` changes a done temperature.
+    """
+    if request.method == "POST":
+        payload = request.json or {}
+        name = payload.get("probe")
+        try:
+            done_temp = float(payload.get("done_temp"))
+            if not math.isfinite(done_temp):
+                raise ValueError(done_temp)
+            eta_predictor.set_done_temp(name, done_temp)
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Invalid done temperature"}), 400
+        except KeyError:
+            return jsonify(
+                {"success": False, "error": f"'{name}' is not a food probe"}
+            ), 404
+        notifier.notify(TOPIC_STATUS)
+        app.logger.info(
+            "%s done temperature set to %.1f°F", name, done_temp * 9.0 / 5.0 + 32.0
+        )
+    return jsonify(dict(eta_status.get()))
 
 
 @app.route("/logs")
 def get_logs():
-    with log_lock:
-        return jsonify(list(log_messages))
+    """Structured log entries, oldest first.
+
+    ``after=<seq>`` returns only entries added or repeated since that
+    sequence id (a repeat keeps its ``id`` and gets a new ``seq``), and
+    ``level=`` (e.g. ``warning``) drops anything less severe.
+    """
+    after = request.args.get("after", type=int)
+    level = request.args.get("level")
+    min_level = logging.NOTSET
+    if level:
+        min_level = logging.getLevelName(level.upper())
+        if not isinstance(min_level, int):
+            return jsonify({"error": f"Unknown level '{level}'"}), 400
+    return jsonify(log_buffer.entries(after=after, min_level=min_level))
+
+
+def _build_update(versions, seen, last_time, last_log_seq=None):
+    """Combined push payload with only the topics that moved past ``seen``.
+
+    Temperature updates carry every raw sample newer than ``last_time`` so a
+    client that missed a wakeup still receives a gap-free series; log
+    updates likewise carry the entries after ``last_log_seq``.
+    """
+    update = {"versions": versions}
+    if versions[TOPIC_TEMPERATURE] != seen.get(TOPIC_TEMPERATURE):
+        if last_time is None:
+            latest = temperature_data.get()
+            samples = [dict(latest)] if latest else []
+        else:
+            samples = temperature_history.since(last_time)
+        update[TOPIC_TEMPERATURE] = samples
+    if versions[TOPIC_STATUS] != seen.get(TOPIC_STATUS):
+        update[TOPIC_STATUS] = {
+            **control_status.get(),
+            "eta": dict(eta_status.get()),
+            "watchdog": watchdog.tripped,
+        }
+        if len(zone_status) > 1:
+            update["zones"] = {
+                name: dict(cell.get()) for name, cell in zone_status.items()
+            }
+    if versions[TOPIC_LOGS] != seen.get(TOPIC_LOGS):
+        update[TOPIC_LOGS] = log_buffer.entries(after=last_log_seq)
+    return update
+
+
+@app.route("/stream")
+def stream():
+    """Server-Sent Events feed pushing temperature, status and log changes."""
+    last_time = request.args.get("since", type=float)
+    last_log_seq = request.args.get("logs_after", type=int)
+
+    def generate():
+        nonlocal last_time, last_log_seq
+        seen = {}
+        while True:
+            versions = notifier.wait(seen, timeout=STREAM_KEEPALIVE_S)
+            if versions == seen:
+                yield ": keepalive\n\n"
+                continue
+            update = _build_update(versions, seen, last_time, last_log_seq)
+            samples = update.get(TOPIC_TEMPERATURE)
+            if samples:
+                last_time = samples[-1][KEY_TIME]
+            logs = update.get(TOPIC_LOGS)
+            if logs:
+                last_log_seq = logs[-1]["seq"]
+            seen = versions
+            yield f"data: {app.json.dumps(update)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/poll")
+def long_poll():
+    """Long-poll fallback for /stream.
+
+    Clients pass back the ``versions`` from the previous response as query
+    arguments (plus ``since`` for the last sample time and ``logs_after`` for
+    the last log ``seq``); the request blocks until something changes or the
+    timeout passes.
+    """
+    seen = {topic: request.args.get(topic, type=int) for topic in TOPICS}
+    last_time = request.args.get("since", type=float)
+    last_log_seq = request.args.get("logs_after", type=int)
+    versions = notifier.wait(seen, timeout=LONG_POLL_TIMEOUT_S)
+    return jsonify(_build_update(versions, seen, last_time, last_log_seq))
+
+
+def _zone_label(zone):
+    """Log prefix naming a non-primary zone."""
+    return "" if zone == PRIMARY_ZONE else f"{zone}: "
 
 
 @app.route("/set_target_temp", methods=["POST"])
 def set_target_temp():
+    zone, error = _request_zone()
+    if error is not None:
+        return error
     temp = request.json.get("temp")
     if temp is not None:
-        with control_lock:
-            control_status[KEY_TARGET_TEMP] = float(temp)
+        zone_status[zone].update({KEY_TARGET_TEMP: float(temp)})
+        session_recorder.record_target(
+            time.time() * 1000, float(temp), channel_registry.zones[zone].index
+        )
+        notifier.notify(TOPIC_STATUS)
         # Convert to F for logging to match user expectation
         temp_f = (float(temp) * 9.0 / 5.0) + 32.0
-        app.logger.info(f"Target temperature set to: {temp_f:.1f}°F")
+        app.logger.info(
+            "%sTarget temperature set to: %.1f°F", _zone_label(zone), temp_f
+        )
         return jsonify({"success": True})
     return jsonify({"success": False, "error": "Invalid temperature"})
 
 
+def _tripped_response():
+    trip = watchdog.tripped
+    return jsonify(
+        {
+            "success": False,
+            "error": f"Safety watchdog tripped ({trip['check']}): {trip['detail']}."
+            " Reset it first.",
+        }
+    ), 409
+
+
+@app.route("/watchdog", methods=["GET", "POST"])
+def watchdog_state():
+    """The safety watchdog's trip, limits and live checks.
+
+    POST ``{"action": "reset"}`` clears a trip. A reset is refused (409)
+    while any check still fails for any zone.
+    """
+    if request.method == "POST":
+        action = (request.json or {}).get("action")
+        if action != "reset":
+            return jsonify(
+                {"success": False, "error": f"Unknown action '{action}'"}
+            ), 400
+        try:
+            if not watchdog.reset():
+                return jsonify(
+                    {"success": False, "error": "The watchdog is not tripped"}
+                ), 409
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify({"success": True, **watchdog.state()})
+
+
 @app.route("/toggle_run_state", methods=["POST"])
 def toggle_run_state():
-    with control_lock:
-        control_status[KEY_RUNNING] = not control_status[KEY_RUNNING]
-        new_state = "RUNNING" if control_status[KEY_RUNNING] else "STOPPED"
-    app.logger.info(f"System state changed to: {new_state}")
-    return jsonify({"success": True, "running": control_status[KEY_RUNNING]})
+    zone, error = _request_zone()
+    if error is not None:
+        return error
+    if watchdog.tripped is not None and not zone_status[zone].get()[KEY_RUNNING]:
+        return _tripped_response()
+    with zone_status[zone].edit() as status:
+        status[KEY_RUNNING] = not status[KEY_RUNNING]
+        running = status[KEY_RUNNING]
+    new_state = "RUNNING" if running else "STOPPED"
+    session_recorder.record_running(
+        time.time() * 1000, running, channel_registry.zones[zone].index
+    )
+    notifier.notify(TOPIC_STATUS)
+    app.logger.info("%sSystem state changed to: %s", _zone_label(zone), new_state)
+    return jsonify({"success": True, "running": running})
 
 
 if __name__ == "__main__":
     # When running directly, start threads immediately.
     start_background_threads()
+    assets.auto_build = True
     app.run(debug=True, host="0.0.0.0", use_reloader=False)
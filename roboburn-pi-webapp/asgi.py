@@ -0,0 +1,525 @@
+"""ASGI serving mode: the app's routes on one asyncio event loop.
+
+    pip install '.[asgi]'
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+The Flask dev server spends a thread per connected dashboard, and each of
+those threads wakes on every change, builds its own copy of the update and
+serializes it. Here ``/stream`` and ``/poll`` are served natively instead:
+a single producer thread waits on the notifier, builds and serializes each
+update once, and the event loop writes the same bytes to every client that
+is in step with the feed. A client that is not (it just connected, passed
+its own ``since``/``logs_after`` or fell behind) gets one catch-up update
+built for it, then rejoins the shared feed. Every other route runs the
+Flask app through a small thread pool, so the handlers are unchanged. The
+sampling and control tasks keep their own scheduler thread either way.
+
+This module only needs the standard library; uvicorn (or any ASGI server)
+serves it. ``python asgi.py`` compares both with 50 simulated clients.
+"""
+
+import asyncio
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app as webapp
+
+# Threads running Flask handlers (and catch-up updates); the scheduler
+# thread is separate, so this bounds what HTTP can take from control
+HANDLER_THREADS = 4
+# Shared updates a client may have queued before it is treated as lagging
+# and caught up with one update of its own instead
+CLIENT_QUEUE_SIZE = 8
+
+_STREAM_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+]
+_JSON_HEADERS = [(b"content-type", b"application/json")]
+# Queued instead of an update for a client that fell too far behind
+_LAGGED = object()
+# Queued to every client when nothing changed for a keepalive interval
+_KEEPALIVE = object()
+
+
+class SharedUpdate:
+    """One serialized update and the feed position it moves clients from and to."""
+
+    __slots__ = ("before", "after", "body", "event")
+
+    def __init__(self, before, after, body):
+        self.before = before  # (versions, last sample time, last log seq)
+        self.after = after
+        self.body = body  # the JSON document
+        self.event = b"data: " + body + b"\n\n"
+
+
+class UpdateHub:
+    """Fans the producer's updates out to every connected client's queue.
+
+    :meth:`publish` runs on the event loop; the producer thread hands
+    updates over with ``call_soon_threadsafe``. A client whose queue is full
+    gets a single lag marker instead of more updates. Keepalives go out
+    through the same queues, so a waiting client costs nothing but its
+    queue until something is published.
+    """
+
+    def __init__(self, notifier, build_update, dumps, keepalive_s):
+        self.notifier = notifier
+        self.build_update = build_update
+        self.dumps = dumps
+        self.keepalive_s = keepalive_s
+        self.subscribers = set()
+        self.published = 0
+        self._loop = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, loop):
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._thread = threading.Thread(
+            target=self._produce, name="update-producer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self):
+        queue = asyncio.Queue(CLIENT_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, update):
+        if update is not _KEEPALIVE:
+            self.published += 1
+        for queue in self.subscribers:
+            if queue.full():
+                continue  # already lagging; its catch-up covers this update too
+            if queue.qsize() == CLIENT_QUEUE_SIZE - 1:
+                queue.put_nowait(_LAGGED)
+            else:
+                queue.put_nowait(update)
+
+    def _produce(self):
+        position = (self.notifier.versions(), None, None)
+        while not self._stop.is_set():
+            seen, last_time, last_log_seq = position
+            versions = self.notifier.wait(seen, timeout=self.keepalive_s)
+            if not self.subscribers:
+                # Nobody to send to: just keep up with the feed
+                position = (versions, _last_sample_time(), webapp.log_buffer.last_seq)
+                continue
+            if versions == seen:
+                self._loop.call_soon_threadsafe(self.publish, _KEEPALIVE)
+                continue
+            update = self.build_update(versions, seen, last_time, last_log_seq)
+            after = _advance(position, versions, update)
+            shared = SharedUpdate(position, after, self.dumps(update).encode())
+            position = after
+            self._loop.call_soon_threadsafe(self.publish, shared)
+
+
+def _last_sample_time():
+    latest = webapp.temperature_data.get()
+    return latest.get(webapp.KEY_TIME) if latest else None
+
+
+def _advance(position, versions, update):
+    """Feed position after ``update``.
+
+    That is its versions and the last sample time and log seq it carried.
+    """
+    _, last_time, last_log_seq = position
+    samples = update.get(webapp.TOPIC_TEMPERATURE)
+    if samples:
+        last_time = samples[-1][webapp.KEY_TIME]
+    logs = update.get(webapp.TOPIC_LOGS)
+    if logs:
+        last_log_seq = logs[-1]["seq"]
+    return versions, last_time, last_log_seq
+
+
+class Application:
+    """The ASGI application: native ``/stream`` and ``/poll``, Flask for the rest."""
+
+    def __init__(self, flask_app, hub, threads=HANDLER_THREADS):
+        self.flask_app = flask_app
+        self.hub = hub
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="http")
+        self.started = False
+
+    def _startup(self):
+        if self.started:
+            return
+        self.started = True
+        webapp.start_background_threads()
+        self.hub.start(asyncio.get_running_loop())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        self._startup()
+        if scope["method"] == "GET" and scope["path"] == "/stream":
+            await self._stream(scope, receive, send)
+        elif scope["method"] == "GET" and scope["path"] == "/poll":
+            await self._poll(scope, receive, send)
+        else:
+            await self._wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.hub.stop()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _catch_up(self, seen, last_time, last_log_seq):
+        """An update built for one client, and its feed position after it."""
+        def build():
+            versions = self.hub.notifier.versions()
+            update = self.hub.build_update(versions, seen, last_time, last_log_seq)
+            return update, _advance((seen, last_time, last_log_seq), versions, update)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, build)
+
+    async def _stream(self, scope, receive, send):
+        query = _query(scope)
+        position = ({}, _float(query.get("since")), _int(query.get("logs_after")))
+        queue = self.hub.subscribe()
+        # A disconnect cancels the stream wherever it is waiting
+        stream = asyncio.current_task()
+        disconnected = asyncio.ensure_future(_disconnect(receive))
+        disconnected.add_done_callback(lambda _: stream.cancel())
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": _STREAM_HEADERS,
+                }
+            )
+            update, position = await self._catch_up(*position)
+            await send(
+                _body(b"data: " + self.hub.dumps(update).encode() + b"\n\n", more=True)
+            )
+            while True:
+                shared = await queue.get()
+                if shared is _KEEPALIVE:
+                    await send(_body(b": keepalive\n\n", more=True))
+                elif shared is not _LAGGED and shared.before == position:
+                    await send(_body(shared.event, more=True))
+                    position = shared.after
+                elif shared is _LAGGED or shared.after[0] != position[0]:
+                    _drain(queue)
+                    update, position = await self._catch_up(*position)
+                    await send(
+                        _body(
+                            b"data: " + self.hub.dumps(update).encode() + b"\n\n",
+                            more=True,
+                        )
+                    )
+                # else: the catch-up already covered it
+        except (asyncio.CancelledError, OSError):
+            pass  # the client went away
+        finally:
+            disconnected.cancel()
+            self.hub.unsubscribe(queue)
+
+    async def _poll(self, scope, receive, send):
+        query = _query(scope)
+        seen = {topic: _int(query.get(topic)) for topic in webapp.TOPICS}
+        position = (seen, _float(query.get("since")), _int(query.get("logs_after")))
+        body = None
+        if self.hub.notifier.versions() == seen:
+            # Nothing new yet: wait for the next shared update
+            queue = self.hub.subscribe()
+            try:
+                body = await asyncio.wait_for(
+                    _next_update(queue, position), webapp.LONG_POLL_TIMEOUT_S
+                )
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.hub.unsubscribe(queue)
+        if body is None:
+            update, _ = await self._catch_up(*position)
+            body = self.hub.dumps(update).encode()
+        await send(
+            {"type": "http.response.start", "status": 200, "headers": _JSON_HEADERS}
+        )
+        await send(_body(body))
+
+    async def _wsgi(self, scope, receive, send):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        environ = _environ(scope, b"".join(chunks))
+        status, headers, body = await asyncio.get_running_loop().run_in_executor(
+            self.executor, _call_wsgi, self.flask_app, environ
+        )
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send(_body(body))
+
+
+def _call_wsgi(wsgi_app, environ):
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ]
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], body
+
+
+def _environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client")
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0] if client else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", ()):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def _body(data, more=False):
+    return {"type": "http.response.body", "body": data, "more_body": more}
+
+
+async def _disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _next_update(queue, position):
+    """Body of the next shared update if it follows on from ``position``, else None."""
+    shared = _KEEPALIVE
+    while shared is _KEEPALIVE:
+        shared = await queue.get()
+    if shared is not _LAGGED and shared.before == position:
+        return shared.body
+    return None
+
+
+def _drain(queue):
+    while not queue.empty():
+        queue.get_nowait()
+
+
+def _query(scope):
+    return {
+        k: v[-1]
+        for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()
+    }
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+hub = UpdateHub(
+    webapp.notifier,
+    webapp._build_update,
+    webapp.app.json.dumps,
+    webapp.STREAM_KEEPALIVE_S,
+)
+application = Application(webapp.app, hub)
+
+
+def _benchmark(clients=50, updates=300, rate_hz=20.0):
+    """Serve ``clients`` /stream readers through Flask's threads and through the hub.
+
+    A feeder thread publishes synthetic samples at ``rate_hz`` (status
+    every tenth); each client records when every event reaches it. Reports
+    the CPU time per update across all clients and the delivery latency
+    from notify to the client. No sockets are involved, so this measures
+    what the server side does per update, not the network.
+    """
+    import json
+    import statistics
+
+    notified = {}
+
+    def feed(stop):
+        period = 1.0 / rate_hz
+        for i in range(updates):
+            now_ms = time.time() * 1000
+            entry = {webapp.KEY_TIME: now_ms}
+            for key in webapp.channel_registry.temp_keys:
+                entry[key] = 150.0 + i * 0.01
+            with webapp.data_lock:
+                webapp.temperature_history.append(entry)
+            webapp.temperature_data.publish(entry)
+            notified[now_ms] = time.perf_counter()
+            webapp.notifier.notify(webapp.TOPIC_TEMPERATURE)
+            if i % 10 == 0:
+                webapp.notifier.notify(webapp.TOPIC_STATUS)
+            time.sleep(period)
+        stop.set()
+
+    def latencies(received):
+        out = []
+        for arrived, data in received:
+            samples = json.loads(data[len(b"data: "):]).get(webapp.TOPIC_TEMPERATURE)
+            if samples and samples[-1][webapp.KEY_TIME] in notified:
+                out.append(arrived - notified[samples[-1][webapp.KEY_TIME]])
+        return out
+
+    def report(name, cpu, received):
+        lat = sorted(latencies(received))
+        median, p99 = statistics.median(lat), lat[int(len(lat) * 0.99)]
+        print(
+            f"{name:<16}{cpu / updates * 1e3:>9.2f}ms{len(received):>8}"
+            f"{median * 1e3:>9.2f}ms{p99 * 1e3:>9.2f}ms{lat[-1] * 1e3:>9.2f}ms"
+        )
+
+    def threaded():
+        """Today's path: one thread per client running the Flask /stream generator."""
+        stop = threading.Event()
+        received = []
+        lock = threading.Lock()
+
+        def client():
+            with webapp.app.test_request_context("/stream"):
+                body = webapp.stream().response
+                for chunk in body:
+                    chunk = chunk.encode() if isinstance(chunk, str) else chunk
+                    if chunk.startswith(b"data:"):
+                        with lock:
+                            received.append((time.perf_counter(), chunk))
+                    if stop.is_set():
+                        break
+                body.close()
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        cpu = time.process_time()
+        feed(stop)
+        cpu = time.process_time() - cpu
+        webapp.notifier.notify(webapp.TOPIC_LOGS)  # wake them to see the stop
+        for thread in threads:
+            thread.join(5)
+        return cpu, received
+
+    def hubbed():
+        """One event loop: the producer thread plus ``clients`` coroutines."""
+        received = []
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            stop = threading.Event()
+            done = asyncio.Event()
+            bench_hub = UpdateHub(
+                webapp.notifier, webapp._build_update, webapp.app.json.dumps, 15.0
+            )
+            bench_app = Application(webapp.app, bench_hub)
+            bench_app.started = True
+            bench_hub.start(loop)
+
+            async def receive():
+                await done.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                data = message.get("body")
+                if data and data.startswith(b"data:"):
+                    received.append((time.perf_counter(), data))
+
+            scope = {
+                "type": "http",
+                "method": "GET",
+                "path": "/stream",
+                "query_string": b"",
+            }
+            tasks = [
+                asyncio.ensure_future(bench_app._stream(scope, receive, send))
+                for _ in range(clients)
+            ]
+            await asyncio.sleep(0.5)
+            cpu = time.process_time()
+            await loop.run_in_executor(None, feed, stop)
+            await asyncio.sleep(0.2)
+            cpu = time.process_time() - cpu
+            done.set()
+            await asyncio.gather(*tasks)
+            bench_hub.stop()
+            return cpu
+
+        return asyncio.run(main()), received
+
+    print(f"{clients} clients, {updates} updates at {rate_hz:.0f} Hz")
+    print(f"{'mode':<16}{'cpu/update':>11}{'events':>8}{'p50':>11}{'p99':>11}{'max':>11}")
+    cpu, received = threaded()
+    report("flask threads", cpu, received)
+    notified.clear()
+    cpu, received = hubbed()
+    report("asgi hub", cpu, received)
+
+
+if __name__ == "__main__":
+    _benchmark()
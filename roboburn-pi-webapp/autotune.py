@@ -0,0 +1,278 @@
+"""Relay-feedback (Astrom-Hagglund) PID auto-tuning and persisted PID gains.
+
+The tuner is a burner controller like the ones in ``controllers.py``: while it
+is the active mode it bang-bangs the burner between two stages around the
+target. The oil settles into a limit cycle whose amplitude ``a`` and period
+``Tu`` give the ultimate gain ``Ku = 4d / (pi * sqrt(a^2 - h^2))`` (``d`` is
+half the relay swing in PID output units, ``h`` the relay hysteresis), and a
+tuning rule turns ``(Ku, Tu)`` into PID gains.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+from controllers import STAGE_POWER
+
+CONTROLLER_AUTOTUNE = "autotune"
+
+# (Kp / Ku, Ti / Tu, Td / Tu) per tuning rule; Ki = Kp / Ti and Kd = Kp * Td.
+# Ziegler-Nichols is the classic quarter-decay rule and did best on the
+# simulated fryer; Tyreus-Luyben and the "no overshoot" variant are slower
+# and gentler for rigs where it rings.
+TUNING_RULES = {
+    "ziegler_nichols": (0.6, 0.5, 0.125),
+    "tyreus_luyben": (1 / 2.2, 2.2, 1 / 6.3),
+    "no_overshoot": (0.2, 0.5, 1 / 3),
+}
+DEFAULT_RULE = "ziegler_nichols"
+
+PHASE_IDLE = "idle"
+PHASE_RUNNING = "running"
+PHASE_DONE = "done"
+PHASE_FAILED = "failed"
+
+
+def gains_for(ultimate_gain, ultimate_period, rule=DEFAULT_RULE):
+    """``(kp, ki, kd)`` for the ultimate gain and period (seconds) under ``rule``."""
+    kp_ratio, ti_ratio, td_ratio = TUNING_RULES[rule]
+    kp = kp_ratio * ultimate_gain
+    return kp, kp / (ti_ratio * ultimate_period), kp * td_ratio * ultimate_period
+
+
+def load_gains(path):
+    """Persisted ``(kp, ki, kd)`` from ``path``, or None if there is no usable file."""
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+        return float(saved["kp"]), float(saved["ki"]), float(saved["kd"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_gains(path, gains, **details):
+    """Write ``gains`` (plus any ``details``) to ``path`` atomically."""
+    kp, ki, kd = gains
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {"kp": kp, "ki": ki, "kd": kd, "saved_at": time.time(), **details},
+            f,
+            indent=2,
+        )
+    os.replace(tmp_path, path)
+
+
+class RelayAutotuner:
+    """Burner controller that runs one relay-feedback experiment.
+
+    :meth:`start` arms an experiment; every :meth:`decide` then requests
+    ``high_stage`` below ``target - hysteresis_c`` and ``low_stage`` above
+    ``target + hysteresis_c``. Each rising switch closes a cycle, measured
+    from the temperature extremes between switches. The first
+    ``settle_cycles`` are discarded (they carry the heat-up), and once the
+    last ``cycles`` periods and amplitudes agree within ``tolerance`` the
+    gains are computed and ``on_finish(result)`` is called. The experiment
+    fails (also reported through ``on_finish``) if it runs past
+    ``max_duration_s``, overshoots the target by ``max_overshoot_c`` or the
+    oil reading is lost.
+
+    :meth:`reset` (called when the burner stops or the tuner takes over)
+    only discards the measured cycles, so a stopped experiment starts over
+    when the burner runs again. ``start``/``cancel`` come from HTTP handlers
+    and ``decide`` from the control task, so phase changes take a lock.
+    """
+
+    name = CONTROLLER_AUTOTUNE
+
+    def __init__(
+        self,
+        on_finish=None,
+        high_stage=2,
+        low_stage=0,
+        hysteresis_c=0.5,
+        cycles=3,
+        settle_cycles=1,
+        tolerance=0.2,
+        max_duration_s=3 * 3600,
+        max_overshoot_c=25.0,
+        clock=time.time,
+    ):
+        self.on_finish = on_finish
+        self.high_stage = high_stage
+        self.low_stage = low_stage
+        self.hysteresis_c = hysteresis_c
+        self.cycles = cycles
+        self.settle_cycles = settle_cycles
+        self.tolerance = tolerance
+        self.max_duration_s = max_duration_s
+        self.max_overshoot_c = max_overshoot_c
+        self.clock = clock
+        self.rule = DEFAULT_RULE
+        self.phase = PHASE_IDLE
+        self.started_at = None
+        self.result = None
+        self.previous_mode = None
+        self._lock = threading.Lock()
+        self.last_time = None
+        self.reset()
+
+    def start(self, previous_mode, rule=DEFAULT_RULE):
+        """Arm a new experiment; ``previous_mode`` is handed back in the result."""
+        if rule not in TUNING_RULES:
+            raise ValueError(f"Unknown tuning rule '{rule}'")
+        with self._lock:
+            self.rule = rule
+            self.previous_mode = previous_mode
+            self.phase = PHASE_RUNNING
+            self.started_at = self.clock()
+            self.result = None
+            self.reset()
+
+    def cancel(self):
+        """Abandon a running experiment; returns False if none was running."""
+        with self._lock:
+            if self.phase != PHASE_RUNNING:
+                return False
+            self._finish(PHASE_FAILED, {"error": "Cancelled"}, notify=False)
+            return True
+
+    def reset(self):
+        self.relay_high = None
+        self.last_rise = None  # time of the last low -> high switch
+        # Temperature extremes since then; the trough follows the rise and
+        # the crest the fall, both delayed by the burner's dead time
+        self.cycle_max = None
+        self.cycle_min = None
+        self.measured = []  # (period_s, amplitude_c) per cycle
+        self.seen_cycles = 0
+
+    def observe(self, time_ms, temp, stage):
+        self.last_time = time_ms
+
+    def _finish(self, phase, result, notify=True):
+        self.phase = phase
+        self.result = {
+            **result,
+            "phase": phase,
+            "rule": self.rule,
+            "previous_mode": self.previous_mode,
+            "duration_s": self.clock() - self.started_at,
+        }
+        if notify and self.on_finish is not None:
+            self.on_finish(self.result)
+
+    def _relay_amplitude(self):
+        # Half the relay swing, in the PID's 0..100 output units
+        return 50.0 * (STAGE_POWER[self.high_stage] - STAGE_POWER[self.low_stage])
+
+    def _close_cycle(self, now, temp):
+        if self.last_rise is not None:
+            self.seen_cycles += 1
+            if self.seen_cycles > self.settle_cycles:
+                self.measured.append(
+                    (now - self.last_rise, (self.cycle_max - self.cycle_min) / 2.0)
+                )
+                self.measured = self.measured[-self.cycles:]
+        self.last_rise = now
+        self.cycle_max = self.cycle_min = temp
+
+    def _converged(self):
+        if len(self.measured) < self.cycles:
+            return None
+        periods = [p for p, _ in self.measured]
+        amplitudes = [a for _, a in self.measured]
+        period = sum(periods) / len(periods)
+        amplitude = sum(amplitudes) / len(amplitudes)
+        spread = max(
+            (max(periods) - min(periods)) / period,
+            (max(amplitudes) - min(amplitudes)) / amplitude,
+        )
+        if spread > self.tolerance:
+            return None
+        return period, amplitude
+
+    def _tune(self, period, amplitude):
+        h = self.hysteresis_c
+        effective = math.sqrt(max(amplitude * amplitude - h * h, 1e-9))
+        ultimate_gain = 4.0 * self._relay_amplitude() / (math.pi * effective)
+        kp, ki, kd = gains_for(ultimate_gain, period, self.rule)
+        return {
+            "ultimate_gain": ultimate_gain,
+            "ultimate_period_s": period,
+            "amplitude_c": amplitude,
+            "kp": kp,
+            "ki": ki,
+            "kd": kd,
+        }
+
+    def decide(self, temp, target, s1_on, s2_on):
+        with self._lock:
+            if self.phase != PHASE_RUNNING:
+                return self.low_stage, 0.0
+            now = (
+                self.last_time / 1000.0 if self.last_time is not None else self.clock()
+            )
+            if temp is None or math.isnan(temp):
+                self._finish(
+                    PHASE_FAILED, {"error": "Lost the oil temperature reading"}
+                )
+            elif temp > target + self.max_overshoot_c:
+                error = (
+                    f"Oil {temp:.1f} C overshot the target by more than "
+                    f"{self.max_overshoot_c} C"
+                )
+                self._finish(PHASE_FAILED, {"error": error})
+            elif self.clock() - self.started_at > self.max_duration_s:
+                self._finish(
+                    PHASE_FAILED,
+                    {"error": "No steady oscillation before the time limit"},
+                )
+            if self.phase != PHASE_RUNNING:
+                return self.low_stage, 0.0
+
+            if self.last_rise is not None:
+                self.cycle_max = max(self.cycle_max, temp)
+                self.cycle_min = min(self.cycle_min, temp)
+            if self.relay_high is None:
+                self.relay_high = temp < target
+            elif self.relay_high:
+                if temp > target + self.hysteresis_c:
+                    self.relay_high = False
+            elif temp < target - self.hysteresis_c:
+                self.relay_high = True
+                self._close_cycle(now, temp)
+
+            converged = self._converged()
+            if converged is not None:
+                self._finish(PHASE_DONE, self._tune(*converged))
+                return self.low_stage, 0.0
+
+            stage = self.high_stage if self.relay_high else self.low_stage
+            return stage, 100.0 * STAGE_POWER[stage]
+
+    def state(self):
+        return {
+            "phase": self.phase,
+            "rule": self.rule,
+            "rules": sorted(TUNING_RULES),
+            "high_stage": self.high_stage,
+            "low_stage": self.low_stage,
+            "hysteresis_c": self.hysteresis_c,
+            "cycles_seen": self.seen_cycles,
+            "measured": [
+                {"period_s": period, "amplitude_c": amplitude}
+                for period, amplitude in self.measured
+            ],
+            "elapsed_s": (
+                None
+                if self.started_at is None or self.phase != PHASE_RUNNING
+                else self.clock() - self.started_at
+            ),
+            "result": self.result,
+        }
@@ -1,397 +1,506 @@
-from dataclasses import dataclass
 import time
 import threading
-import board
-import busio
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
-import math
-from gpiozero import OutputDevice
-from typing import Optional
-
-
-@dataclass
-class TemperatureReading:
-    """A class to hold temperature and resistance readings from a thermistor."""
-    temperature_celsius: Optional[float]
-    resistance_ohms: Optional[float]
-    
-    @property
-    def is_valid(self) -> bool:
-        """Check if the reading is valid (both temperature and resistance are not None)."""
-        return self.temperature_celsius is not None and self.resistance_ohms is not None
-
-# measured points from weber igrill ambient probe (these are cheap and plentiful)
-# resistance in ohms, temp in F
-CALIBRATION_DATA = [
-    (303950, 32.9),
-    (324700, 33.1),
-    (89000, 67.5),
-    (27810, 134.2),
-    (13260, 170.6),
-]
-
-def derive_coefficients(data):
-    """
-    Fits Steinhart-Hart A, B, C coefficients to N data points using
-    Least Squares Regression. (Pure Python, no numpy).
 
-    Model: 1/T = A + B*ln(R) + C*(ln(R)^3)
-    """
-    N = len(data)
-    if N < 3:
-        raise ValueError("Need at least 3 data points for Steinhart-Hart regression.")
-
-    # 1. Prepare the Sums for the Normal Equation Matrix (X.T * X)
-    # We are solving Ax = b where x is [A, B, C]
-    sum_1 = N
-    sum_L = 0.0    # Sum of ln(R)
-    sum_L2 = 0.0   # Sum of ln(R)^2
-    sum_L3 = 0.0   # Sum of ln(R)^3
-    sum_L4 = 0.0
-    sum_L6 = 0.0
-
-    sum_Y = 0.0    # Sum of 1/T
-    sum_YL = 0.0   # Sum of (1/T) * ln(R)
-    sum_YL3 = 0.0  # Sum of (1/T) * ln(R)^3
-
-    for r, t_f in data:
-        # Convert T to Kelvin
-        t_k = (t_f - 32.0) * 5.0 / 9.0 + 273.15
-        y = 1.0 / t_k
-        L = math.log(r)
-
-        # Accumulate powers of L
-        L2 = L * L
-        L3 = L2 * L
-        L4 = L2 * L2
-        L6 = L3 * L3
-
-        sum_L += L
-        sum_L2 += L2
-        sum_L3 += L3
-        sum_L4 += L4
-        sum_L6 += L6
-
-        # Accumulate cross terms with Y
-        sum_Y += y
-        sum_YL += y * L
-        sum_YL3 += y * L3
-
-    # 2. Construct the Matrix (Symmetric) and Vector
-    # Matrix M = [[sum_1, sum_L, sum_L3],
-    #             [sum_L, sum_L2, sum_L4],
-    #             [sum_L3, sum_L4, sum_L6]]
-    M = [
-        [sum_1, sum_L,  sum_L3],
-        [sum_L, sum_L2, sum_L4],
-        [sum_L3, sum_L4, sum_L6]
-    ]
-
-    # Vector V = [sum_Y, sum_YL, sum_YL3]
-    V = [sum_Y, sum_YL, sum_YL3]
-
-    # 3. Solve M * [A,B,C] = V using Gaussian Elimination (Standard Linear Algebra)
-    # We pivot to solve for unknowns.
-
-    n_vars = 3
-    # Forward Elimination
-    for i in range(n_vars):
-        # Pivot
-        pivot = M[i][i]
-        for j in range(i + 1, n_vars):
-            factor = M[j][i] / pivot
-            V[j] -= factor * V[i]
-            for k in range(i, n_vars):
-                M[j][k] -= factor * M[i][k]
-
-    # Back Substitution
-    solution = [0.0] * n_vars
-    for i in range(n_vars - 1, -1, -1):
-        sum_ax = sum(M[i][j] * solution[j] for j in range(i + 1, n_vars))
-        solution[i] = (V[i] - sum_ax) / M[i][i]
-
-    # Unpack coefficients
-    A, B, C = solution
-    return A, B, C
-
-# Calculate defaults based on probe
-try:
-    DEF_A, DEF_B, DEF_C = derive_coefficients(CALIBRATION_DATA)
-    print(f"New Coeffs -> A: {DEF_A:.9f}, B: {DEF_B:.9f}, C: {DEF_C:.9f}")
-except Exception as e:
-    print(f"Calibration failed: {e}")
-
-def get_temp_celsius(voltage: float, r_fixed: float = 10000, system_voltage: float = 3.3,
-                     sh_a: float = DEF_A, sh_b: float = DEF_B, sh_c: float = DEF_C) -> TemperatureReading:
+from channels import default_registry
+from controllers import CONTROLLER_PID, applied_stage
+# The Pi backend is the default (and used to live in this module)
+from hardware import open_ads1115, open_relay
+from metrics import NULL_REGISTRY, timed_acquire
+from notifier import TOPIC_STATUS, TOPIC_TEMPERATURE
+from relays import RelayAccounting
+from sampling import AdcSampler
+# Re-exported; the thermistor math used to live in this module
+from thermistor import (  # noqa: F401
+    CALIBRATION_DATA,
+    DEF_A,
+    DEF_B,
+    DEF_C,
+    TemperatureReading,
+    ThermistorCalibration,
+    derive_coefficients,
+    get_temp_celsius,
+)
+
+
+class TemperatureWorker:
+    """Samples the temperature probes and records one history entry per step.
+
+    The probes come from ``channels`` (a :class:`channels.ChannelRegistry`,
+    the oil/turkey fryer by default); every step reads and converts each of
+    them once, so its cost grows linearly with the probe count. An invalid
+    reading on a zone's (critical) probe fails the sample; other probes hold
+    their last valid reading.
+
+    ``adc_settings`` holds the sampler configuration (``data_rate``,
+    ``oversample``, ``filter``); per-channel noise statistics are published
+    into ``adc_stats``. Voltages are converted through ``calibration``, a
+    :class:`thermistor.ThermistorCalibration` lookup table.
+    Decimation of the recorded entries runs as a separate scheduled task.
+
+    ``temperature_data``, ``adc_stats`` and the per-zone ``zone_status``
+    cells (zone name -> status) are :class:`snapshot.SnapshotCell` objects:
+    each step publishes fresh snapshots into them rather than mutating
+    shared dicts under a lock. ``data_lock`` only serializes writers of the
+    history buffers.
+
+    ``open_adc`` (default :func:`hardware.open_ads1115`) and ``clock`` (wall
+    time in seconds) are injectable so the worker can run against a
+    simulated plant (see ``hardware.py``).
+    ADC read, conversion and ``data_lock`` wait times go to ``metrics`` (a
+    :class:`metrics.Registry`).
     """
-    Converts measured Voltage to Celsius using Steinhart-Hart equation.
 
-    Args:
-        voltage: The actual voltage measured at the pin (e.g., 2.15).
-        r_fixed: The fixed resistor value in Ohms (default 10k).
-        system_voltage: The voltage powering the divider (default 3.3V).
-        sh_a, sh_b, sh_c: Thermistor Steinhart-Hart coefficients.
+    def __init__(
+        self,
+        logger,
+        temperature_data,
+        temperature_history,
+        data_lock,
+        zone_status,
+        notifier,
+        recorder,
+        adc_settings,
+        adc_stats,
+        calibration,
+        channels=None,
+        open_adc=open_ads1115,
+        clock=time.time,
+        metrics=NULL_REGISTRY,
+    ):
+        self.logger = logger
+        self.temperature_data = temperature_data
+        self.temperature_history = temperature_history
+        self.data_lock = data_lock
+        self.zone_status = zone_status
+        self.notifier = notifier
+        self.recorder = recorder
+        self.adc_settings = adc_settings
+        self.adc_stats = adc_stats
+        self.calibration = calibration
+        self.channels = channels if channels is not None else default_registry()
+        self.probes = self.channels.probes
+        self.critical_probes = tuple(probe for probe in self.probes if probe.critical)
+        self.open_adc = open_adc
+        self.clock = clock
+        self.sampler = None
+        self.failure_start_time = None
+        self.adc_read_time = metrics.histogram(
+            "roboburn_adc_read_seconds", "Oversampled read of every ADS1115 channel"
+        )
+        self.convert_time = metrics.histogram(
+            "roboburn_thermistor_convert_seconds",
+            "Voltage to temperature conversion of every channel",
+        )
+        self.lock_wait = metrics.histogram(
+            "roboburn_lock_wait_seconds",
+            "Time spent waiting for a lock",
+            lock="data",
+            site="sample",
+        )
+        self.read_errors = metrics.counter(
+            "roboburn_adc_read_errors_total", "Failed ADC reads"
+        )
+
+        # (voltage, temperature, resistance) per probe, held through failed
+        # reads. Zone probes start at safe defaults so control has a value
+        # before the first good read; the others start unknown.
+        self.readings = {
+            probe.name: (0.0, 21.1, 10000.0) if probe.critical else (None, None, None)
+            for probe in self.probes
+        }
+
+    def setup(self):
+        self.logger.info("Temperature worker started.")
+        boards, channels = self.open_adc(self.probes)
+        self.sampler = AdcSampler(
+            boards,
+            channels,
+            oversample=self.adc_settings.get("oversample", 1),
+            filter_name=self.adc_settings.get("filter", "median"),
+            data_rate=self.adc_settings.get("data_rate"),
+        )
+
+        self.logger.info(
+            "ADS open, current reading %s",
+            ", ".join(
+                f"{name} {channel.voltage}v" for name, channel in channels.items()
+            ),
+        )
+
+    def _read(self):
+        # Oversampled, filtered voltages for every channel
+        with self.adc_read_time.time():
+            voltages = self.sampler.sample()
+
+        # One table-lookup pass over every channel
+        with self.convert_time.time():
+            readings = dict(zip(voltages, self.calibration.readings(voltages.values())))
+
+        # Check the critical (zone) sensors before keeping anything
+        for probe in self.critical_probes:
+            if readings[probe.name][0] is None:
+                raise ValueError(
+                    f"Invalid {probe.name} sensor reading (v={voltages[probe.name]})"
+                )
+
+        # Update the others only if valid, otherwise keep last known
+        held = self.readings
+        for name, (temp, resistance) in readings.items():
+            if temp is not None:
+                held[name] = (voltages[name], temp, resistance)
+
+    def _set_connected(self, connected, stop):
+        """Mark every zone (dis)connected, stopping running zones if ``stop``."""
+        changed = False
+        stopped = []
+        for name, cell in self.zone_status.items():
+            status = cell.get()
+            if status["connected"] == connected and not (stop and status["running"]):
+                continue
+            with cell.edit() as status:
+                was_connected = status["connected"]
+                was_running = status["running"]
+                status["connected"] = connected
+                if stop and status["running"]:
+                    status["running"] = False
+                    stopped.append(name)
+                changed = (
+                    changed
+                    or was_connected != connected
+                    or was_running != status["running"]
+                )
+        if stopped:
+            self.logger.error(
+                "ADC read failed for > 60s. Stopping %s.", ", ".join(stopped)
+            )
+        if changed:
+            self.notifier.notify(TOPIC_STATUS)
 
-    Returns:
-        TemperatureReading: An object containing temperature in Celsius and resistance in ohms.
-    """
-    # Safety check: voltage cannot be 0 (infinite resistance)
-    # or equal to system_voltage (0 resistance/short).
-    if voltage <= 0 or voltage >= system_voltage:
-        return TemperatureReading(temperature_celsius=None, resistance_ohms=None)
-
-    # Calculate Resistance of Thermistor
-    # Formula derived from V_out = V_in * (R_therm / (R_fixed + R_therm))
-    # Becomes: R_therm = R_fixed * (V_out / (V_in - V_out))
-    r_thermistor = r_fixed * (voltage / (system_voltage - voltage))
-
-    # Apply Steinhart-Hart Equation
-    try:
-        ln_r = math.log(r_thermistor)
-        inv_temp_kelvin = sh_a + (sh_b * ln_r) + (sh_c * (ln_r ** 3))
-        temp_celsius = (1.0 / inv_temp_kelvin) - 273.15
-    except (ValueError, ZeroDivisionError):
-        return TemperatureReading(temperature_celsius=None, resistance_ohms=None)
-
-    return TemperatureReading(temperature_celsius=temp_celsius, resistance_ohms=r_thermistor)
-
-def temperature_worker(
-    logger,
-    temperature_data,
-    temperature_history,
-    decimated_history,
-    decimated_last_update,
-    data_lock,
-    control_status,
-    control_lock,
-):
-    """Worker thread to simulate temperature sensor readings and record history."""
-    logger.info("Temperature worker thread started.")
-    i2c = busio.I2C(board.SCL, board.SDA)
-
-    # Create the ADS object and specify the gain
-    ads = ADS.ADS1115(i2c)
-    ads.gain = 1
-    adc_chan_oil = AnalogIn(ads, ADS.P0)
-    adc_chan_turkey = AnalogIn(ads, ADS.P1)
-
-    logger.info(f"ADS open, current reading oil {adc_chan_oil.voltage}v, turkey {adc_chan_turkey.voltage}")
-    
-    failure_start_time = None
-    
-    # Initialize with safe defaults to prevent crash on first loop failure and to hold values during failure
-    oil_voltage = 0.0
-    turkey_voltage = 0.0
-    oil_reading = TemperatureReading(21.1, 10000.0)
-    turkey_reading = TemperatureReading(21.1, 10000.0)
-
-    while True:
+    def step(self):
+        """Read the ADC once and publish a new history entry."""
         try:
-            # Try reading voltages from ADC
-            curr_oil_voltage = adc_chan_oil.voltage
-            curr_turkey_voltage = adc_chan_turkey.voltage
-            
-            curr_oil_reading = get_temp_celsius(curr_oil_voltage)
-            curr_turkey_reading = get_temp_celsius(curr_turkey_voltage)
-            
-            # Check validity of critical sensor (oil)
-            if not curr_oil_reading.is_valid:
-                raise ValueError(f"Invalid oil sensor reading (v={curr_oil_voltage})")
-            
-            # Update state with successful readings
-            oil_voltage = curr_oil_voltage
-            oil_reading = curr_oil_reading
-            
-            # Update turkey only if valid, otherwise keep last known
-            if curr_turkey_reading.is_valid:
-                turkey_voltage = curr_turkey_voltage
-                turkey_reading = curr_turkey_reading
-            
-            failure_start_time = None
-
-            with control_lock:
-                control_status["connected"] = True
+            self._read()
+            self.failure_start_time = None
+            self._set_connected(True, stop=False)
         except Exception as e:
-            logger.error(f"ADC read error: {e}")
-            
-            if failure_start_time is None:
-                failure_start_time = time.time()
-
-            with control_lock:
-                control_status["connected"] = False
-                if time.time() - failure_start_time > 60:
-                    if control_status["running"]:
-                        logger.error("ADC read failed for > 60s. Stopping system.")
-                        control_status["running"] = False
+            self.logger.error("ADC read error: %s", e)
+            self.read_errors.inc()
+
+            if self.failure_start_time is None:
+                self.failure_start_time = self.clock()
+            self._set_connected(False, stop=self.clock() - self.failure_start_time > 60)
 
             # We do NOT reset values to None here. We keep the last known good values
             # to tolerate temporary failures without crashing the consumer threads.
 
-        with data_lock:
-            # Get temperature and resistance for both probes
-            temperature_data["oil_temp"] = oil_reading.temperature_celsius
-            temperature_data["turkey_temp"] = turkey_reading.temperature_celsius
-            temperature_data["oil_voltage"] = oil_voltage
-            temperature_data["turkey_voltage"] = turkey_voltage
-            temperature_data["oil_resistance"] = oil_reading.resistance_ohms
-            temperature_data["turkey_resistance"] = turkey_reading.resistance_ohms
-
-            current_time = time.time()
-            timestamp = current_time * 1000  # ms for frontend
-            history_entry = {"time": timestamp, **temperature_data}
+        # Get temperature, voltage and resistance for every probe
+        history_entry = {"time": self.clock() * 1000}  # ms for frontend
+        readings = self.readings
+        for probe in self.probes:
+            voltage, temp, resistance = readings[probe.name]
+            history_entry[probe.temp_key] = temp
+            history_entry[probe.voltage_key] = voltage
+            history_entry[probe.resistance_key] = resistance
 
+        with timed_acquire(self.data_lock, self.lock_wait):
             # Add to full resolution history
-            temperature_history.append(history_entry)
-
-            # Update decimated histories if needed
-            for key, history in decimated_history.items():
-                if current_time - decimated_last_update[key] >= history["interval"]:
-                    # Average all points since last update for this history
-                    recent_points = [
-                        (entry["time"], entry["oil_temp"], entry["turkey_temp"])
-                        for entry in temperature_history
-                        if entry["time"] / 1000 > decimated_last_update[key]
-                    ]
-
-                    if recent_points:
-                        times, oil_temps, turkey_temps = zip(*recent_points)
-                        avg_entry = {
-                            "time": sum(times) / len(times),
-                            "oil_temp": sum(oil_temps) / len(oil_temps),
-                            "turkey_temp": sum(turkey_temps) / len(turkey_temps),
-                        }
-                        history["data"].append(avg_entry)
-                        decimated_last_update[key] = current_time
-
-        time.sleep(1)
-
-
-def burner_control_worker(
-    logger,
-    temperature_history,
-    data_lock,
-    control_status,
-    control_lock,
-    pid,
-):
-    """Worker thread for controlling a two-stage burner with cooldowns and hysteresis."""
-    logger.info("Burner control worker started.")
+            self.temperature_history.append(history_entry)
+        self.temperature_data.publish(history_entry)
+        self.adc_stats.publish(self.sampler.stats())
+
+        # Batched to disk outside data_lock; fsync happens at most once per flush
+        # interval
+        self.recorder.record_sample(history_entry)
+        self.notifier.notify(TOPIC_TEMPERATURE)
+
+
+def _switch_on(relay):
+    """Switch ``relay`` on; False if it refused (e.g. a tripped watchdog)."""
+    relay.on()
+    return getattr(relay, "is_on", True)
+
+
+class BurnerControlWorker:
+    """Controls one zone's two-stage burner with cooldowns, a controller step a call.
+
+    ``zone`` (a :class:`channels.Zone`, the fryer by default) names the
+    probe the burner is controlled on and its relay pins; a rig with several
+    zones runs one worker, with its own controllers and ``control_status``,
+    per zone. ``controllers`` maps a mode name to a controller from
+    ``controllers.py``; the mode in ``control_status["controller"]`` picks
+    the one that decides the requested stage, while every controller
+    observes each new sample. Reads the latest sample and the
+    ``control_status`` snapshot without locking, so a slow HTTP client can
+    never delay a stage change. ``open_relay`` and ``clock`` are injectable
+    like in :class:`TemperatureWorker`.
+
+    Both relays are switched through ``relay_accounting`` (a
+    :class:`relays.RelayAccounting` over the zone's ``relay_stage1``/
+    ``relay_stage2``), which records on-time and toggles and may refuse a
+    stage start once its start budget is spent; the stage then stays off
+    until the window frees up. ``interlock``, if given, wraps each accounted
+    relay (``interlock(relay, pin)``, see :meth:`watchdog.Watchdog.guard`),
+    so whatever it refuses or forces off is accounted as it happened.
+    Controller observe/decide times go to ``metrics``. ``heartbeat``, if
+    given, is called at the start of every step (see
+    :meth:`watchdog.Watchdog.heartbeat`).
+    """
+
     COOLDOWN_S1 = 3  # seconds
     COOLDOWN_S2 = 3  # seconds
-    PIN_STAGE1 = 21
-    PIN_STAGE2 = 20
-
-    # Initialize the stage relays (active high)
-    stage1 = OutputDevice(PIN_STAGE1, active_high=True, initial_value=False)
-    stage2 = OutputDevice(PIN_STAGE2, active_high=True, initial_value=False)
-    logger.info(f"Initialized burner stage1 on GPIO {PIN_STAGE1}, stage2 on GPIO {PIN_STAGE2}")
-
-    # PID thresholds (output 0..100)
-    # Stage 0 -> < 30, Stage 1 -> 30..70, Stage 2 -> > 70 with hysteresis
-    S1_ON = 35
-    S1_OFF = 25
-    S2_ON = 75
-    S2_OFF = 65
-
-    last_s1_toggle = 0.0
-    last_s2_toggle = 0.0
-    PID_LOG_INTERVAL = 10.0
-    last_pid_log = 0.0
 
-    while True:
-        with control_lock:
-            is_running = control_status["running"]
-            target = control_status["target_temp"]
-            pid.setpoint = target
-            s1_on = control_status.get("burner_stage1_on", False)
-            s2_on = control_status.get("burner_stage2_on", False)
+    PID_LOG_INTERVAL = 10.0
+    BUDGET_LOG_INTERVAL = 600.0
+
+    def __init__(
+        self,
+        logger,
+        temperature_history,
+        control_status,
+        controllers,
+        notifier,
+        recorder,
+        relay_accounting=None,
+        open_relay=open_relay,
+        clock=time.time,
+        metrics=NULL_REGISTRY,
+        zone=None,
+        heartbeat=None,
+        interlock=None,
+    ):
+        self.zone = zone if zone is not None else default_registry().primary
+        self.temp_key = self.zone.probe.temp_key
+        # Log lines of the primary zone read as they always have
+        self.label = "" if self.zone.primary else f"{self.zone.name}: "
+        if relay_accounting is None:
+            relay_accounting = RelayAccounting(
+                (self.zone.relay_stage1, self.zone.relay_stage2), clock=clock
+            )
+        self.relay_accounting = relay_accounting
+        self.last_budget_log = None
+        self.logger = logger
+        self.temperature_history = temperature_history
+        self.control_status = control_status
+        self.controllers = controllers
+        self.active_mode = None
+        self.notifier = notifier
+        self.recorder = recorder
+        self.open_relay = open_relay
+        self.clock = clock
+        self.stage1 = None
+        self.stage2 = None
+        self.last_s1_toggle = 0.0
+        self.last_s2_toggle = 0.0
+        self.last_pid_log = 0.0
+        self.metrics = metrics
+        self.observe_time = metrics.histogram(
+            "roboburn_controller_observe_seconds",
+            "Every controller observing one sample",
+            zone=self.zone.name,
+        )
+        self.decide_times = {}
+        self.heartbeat = heartbeat
+        self.interlock = interlock
+
+    def setup(self):
+        zone = self.zone
+        self.logger.info("%sBurner control worker started.", self.label)
+        # Initialize the stage relays (active high)
+        self.stage1 = self._open_stage(zone.relay_stage1, zone.stage1_pin)
+        self.stage2 = self._open_stage(zone.relay_stage2, zone.stage2_pin)
+        self.logger.info(
+            "%sInitialized burner stage1 on GPIO %s, stage2 on GPIO %s"
+            " (controlled on %s)",
+            self.label,
+            zone.stage1_pin,
+            zone.stage2_pin,
+            zone.probe.name,
+        )
+
+    def _open_stage(self, name, pin):
+        relay = self.relay_accounting.wrap(name, self.open_relay(pin))
+        return relay if self.interlock is None else self.interlock(relay, pin)
+
+    def _stop(self, s1_on, s2_on):
+        control_status = self.control_status
+        if s1_on or s2_on:
+            self.stage2.off()
+            self.stage1.off()
+            control_status.update({
+                "burner_stage2_on": False,
+                "burner_stage1_on": False,
+                "burner_on": False,
+                "burner_request_stage": 0,
+            })
+            for controller in self.controllers.values():
+                controller.reset()
+            self.recorder.record_stage(
+                self.clock() * 1000, 0, False, False, self.zone.index
+            )
+            self.notifier.notify(TOPIC_STATUS)
+        else:
+            if control_status.get()["burner_request_stage"] != 0:
+                control_status.update({"burner_request_stage": 0})
+                self.recorder.record_stage(
+                    self.clock() * 1000, 0, False, False, self.zone.index
+                )
+                self.notifier.notify(TOPIC_STATUS)
+
+    def _may_start(self, relay_name, now):
+        """Ask the start budget.
+
+        Deferred starts are logged at most every BUDGET_LOG_INTERVAL.
+        """
+        accounting = self.relay_accounting
+        if accounting.allow_on(relay_name, now):
+            return True
+        if (
+            self.last_budget_log is None
+            or now - self.last_budget_log >= self.BUDGET_LOG_INTERVAL
+        ):
+            self.logger.info(
+                "%s%s start deferred by the %s starts per %.0fs budget",
+                self.label,
+                relay_name,
+                accounting.max_starts,
+                accounting.window_s,
+            )
+            self.last_budget_log = now
+        return False
+
+    def step(self):
+        if self.heartbeat is not None:
+            self.heartbeat()
+        control_status = self.control_status
+        stage1 = self.stage1
+        stage2 = self.stage2
+        logger = self.logger
+
+        # One consistent snapshot; nothing here can block on an HTTP handler
+        status = control_status.get()
+        is_running = status["running"]
+        s1_on = status.get("burner_stage1_on", False)
+        s2_on = status.get("burner_stage2_on", False)
+
+        current_temp = self.temperature_history.latest(self.temp_key, 70.0)
+        sample_time = self.temperature_history.latest("time")
+        if sample_time is not None:
+            # Models learn from every sample, including while stopped or inactive
+            stage = applied_stage(s1_on, s2_on)
+            with self.observe_time.time():
+                for controller in self.controllers.values():
+                    controller.observe(sample_time, current_temp, stage)
 
         if not is_running:
-            if s1_on or s2_on:
-                stage2.off()
-                stage1.off()
-                with control_lock:
-                    control_status["burner_stage2_on"] = False
-                    control_status["burner_stage1_on"] = False
-                    control_status["burner_on"] = False
-                    control_status["burner_request_stage"] = 0
-                pid.reset()
-            else:
-                with control_lock:
-                    control_status["burner_request_stage"] = 0
-            time.sleep(1)
-            continue
-
-        with data_lock:
-            current_oil_temp = (
-                temperature_history[-1]["oil_temp"] if temperature_history else 70.0
+            self._stop(s1_on, s2_on)
+            self.relay_accounting.publish(self.clock())
+            return
+
+        mode = status.get("controller", CONTROLLER_PID)
+        controller = self.controllers.get(mode) or self.controllers[CONTROLLER_PID]
+        if controller.name != self.active_mode:
+            # Start the incoming controller clean (e.g. no stale PID integral)
+            controller.reset()
+            self.active_mode = controller.name
+            logger.info("%sBurner controller: %s", self.label, controller.name)
+        decide_time = self.decide_times.get(controller.name)
+        if decide_time is None:
+            decide_time = self.decide_times[controller.name] = self.metrics.histogram(
+                "roboburn_controller_decide_seconds", "One control decision",
+                controller=controller.name, zone=self.zone.name,
             )
+        with decide_time.time():
+            requested_stage, pid_output = controller.decide(
+                current_temp, status["target_temp"], s1_on, s2_on
+            )
+        label = self.label
 
-        pid_output = pid(current_oil_temp)
-
-        # Determine requested stage with hysteresis
-        requested_stage = 0
-        if s2_on:
-            requested_stage = 2 if pid_output >= S2_OFF else 1 if pid_output >= S1_OFF else 0
-        elif s1_on:
-            requested_stage = 2 if pid_output >= S2_ON else 1 if pid_output >= S1_OFF else 0
-        else:
-            requested_stage = 2 if pid_output >= S2_ON else 1 if pid_output >= S1_ON else 0
-
-        now = time.time()
+        now = self.clock()
 
         # Enforce sequencing: stage2 only when stage1 is on
         # Apply stage transitions with cooldowns
         # Handle Stage 2
         if requested_stage == 2:
             # Ensure stage1 is on
-            if not s1_on and (now - last_s1_toggle) > COOLDOWN_S1:
-                stage1.on()
-                s1_on = True
-                last_s1_toggle = now
-                logger.info("Stage 1 ON for Stage 2 request")
+            if (
+                not s1_on
+                and (now - self.last_s1_toggle) > self.COOLDOWN_S1
+                and self._may_start(self.zone.relay_stage1, now)
+            ):
+                s1_on = _switch_on(stage1)
+                if s1_on:
+                    self.last_s1_toggle = now
+                    logger.info("%sStage 1 ON for Stage 2 request", label)
             # Then handle stage2
-            if s1_on and not s2_on and (now - last_s2_toggle) > COOLDOWN_S2:
-                stage2.on()
-                s2_on = True
-                last_s2_toggle = now
-                logger.info("Stage 2 ON")
+            if (
+                s1_on
+                and not s2_on
+                and (now - self.last_s2_toggle) > self.COOLDOWN_S2
+                and self._may_start(self.zone.relay_stage2, now)
+            ):
+                s2_on = _switch_on(stage2)
+                if s2_on:
+                    self.last_s2_toggle = now
+                    logger.info("%sStage 2 ON", label)
         elif requested_stage == 1:
             # Turn off stage2 if on
-            if s2_on and (now - last_s2_toggle) > COOLDOWN_S2:
+            if s2_on and (now - self.last_s2_toggle) > self.COOLDOWN_S2:
                 stage2.off()
                 s2_on = False
-                last_s2_toggle = now
-                logger.info("Stage 2 OFF (request stage 1)")
+                self.last_s2_toggle = now
+                logger.info("%sStage 2 OFF (request stage 1)", label)
             # Ensure stage1 is on
-            if not s1_on and (now - last_s1_toggle) > COOLDOWN_S1:
-                stage1.on()
-                s1_on = True
-                last_s1_toggle = now
-                logger.info("Stage 1 ON")
+            if (
+                not s1_on
+                and (now - self.last_s1_toggle) > self.COOLDOWN_S1
+                and self._may_start(self.zone.relay_stage1, now)
+            ):
+                s1_on = _switch_on(stage1)
+                if s1_on:
+                    self.last_s1_toggle = now
+                    logger.info("%sStage 1 ON", label)
         else:  # requested_stage == 0
             # Turn off both stages respecting cooldowns
-            if s2_on and (now - last_s2_toggle) > COOLDOWN_S2:
+            if s2_on and (now - self.last_s2_toggle) > self.COOLDOWN_S2:
                 stage2.off()
                 s2_on = False
-                last_s2_toggle = now
-                logger.info("Stage 2 OFF")
-            if s1_on and (now - last_s1_toggle) > COOLDOWN_S1:
+                self.last_s2_toggle = now
+                logger.info("%sStage 2 OFF", label)
+            if s1_on and (now - self.last_s1_toggle) > self.COOLDOWN_S1:
                 stage1.off()
                 s1_on = False
-                last_s1_toggle = now
-                logger.info("Stage 1 OFF")
-
-        with control_lock:
-            control_status["burner_stage1_on"] = s1_on
-            control_status["burner_stage2_on"] = s2_on
-            control_status["burner_on"] = s1_on or s2_on
-            control_status["burner_request_stage"] = requested_stage
-            control_status["pid_output"] = pid_output
-
-        if is_running and (now - last_pid_log) >= PID_LOG_INTERVAL:
-            logger.info(f"PID {pid_output:.1f} | stage_req {requested_stage} | s1 {'ON' if s1_on else 'off'} | s2 {'ON' if s2_on else 'off'}")
-            last_pid_log = now
-
-        time.sleep(1)
+                self.last_s1_toggle = now
+                logger.info("%sStage 1 OFF", label)
+
+        # edit() starts from the latest snapshot, so a target or run-state
+        # change published since the read above is kept.
+        with control_status.edit() as status:
+            stage_changed = (
+                status["burner_stage1_on"] != s1_on
+                or status["burner_stage2_on"] != s2_on
+                or status["burner_request_stage"] != requested_stage
+            )
+            status["burner_stage1_on"] = s1_on
+            status["burner_stage2_on"] = s2_on
+            status["burner_on"] = s1_on or s2_on
+            status["burner_request_stage"] = requested_stage
+            status["pid_output"] = pid_output
+        if stage_changed:
+            self.recorder.record_stage(
+                now * 1000, requested_stage, s1_on, s2_on, self.zone.index
+            )
+            self.notifier.notify(TOPIC_STATUS)
+
+        self.relay_accounting.publish(now)
+
+        if (now - self.last_pid_log) >= self.PID_LOG_INTERVAL:
+            logger.info(
+                "%s%s %.1f | stage_req %s | s1 %s | s2 %s",
+                label,
+                controller.name.upper(),
+                pid_output,
+                requested_stage,
+                "ON" if s1_on else "off",
+                "ON" if s2_on else "off",
+            )
+            self.last_pid_log = now
@@ -0,0 +1,205 @@
+"""Configurable temperature probes and burner zones.
+
+A probe is one thermistor on an ADS1115 input and adds ``<name>_temp``,
+``<name>_voltage`` and ``<name>_resistance`` columns to the history. A zone is
+a two-stage burner (a pair of relay pins) controlled on one probe, with its
+own controllers, target and run state. The default layout is the turkey
+fryer (oil on A0, turkey on A1, one ``fryer`` zone on oil and GPIO 21/20),
+so the history columns, relay names and session logs match the fixed
+two-channel setup this replaced. Other rigs, e.g. a smoker chamber plus a
+water pan or an HLT and a mash tun, are described in a JSON file::
+
+    {"probes": [{"name": "hlt", "input": 0}, {"name": "mash", "input": 1},
+                {"name": "wort", "address": 73, "input": 0}],
+     "zones": [{"name": "hlt", "probe": "hlt", "stage1_pin": 21, "stage2_pin": 20},
+               {"name": "mash", "probe": "mash", "stage1_pin": 16, "stage2_pin": 12}]}
+"""
+
+import json
+import re
+
+# The four addresses an ADS1115 can be strapped to, four inputs each
+ADS1115_ADDRESSES = (0x48, 0x49, 0x4A, 0x4B)
+ADS1115_INPUTS = 4
+
+_NAME = re.compile(r"^[a-z][a-z0-9]*$")
+
+
+class Probe:
+    """One thermistor input.
+
+    A probe that a zone controls on is ``critical``: an invalid reading
+    fails the whole sample (and eventually stops the burners) instead of
+    holding the last value like the other probes do.
+    """
+
+    def __init__(self, name, input, address=ADS1115_ADDRESSES[0], critical=False):
+        self.name = name
+        self.input = input
+        self.address = address
+        self.critical = critical
+        self.temp_key = f"{name}_temp"
+        self.voltage_key = f"{name}_voltage"
+        self.resistance_key = f"{name}_resistance"
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "address": self.address,
+            "input": self.input,
+            "critical": self.critical,
+        }
+
+
+class Zone:
+    """A two-stage burner controlled on ``probe``.
+
+    ``index`` is the zone's position in its registry, which tags its stage,
+    target and run events in the session log. The first zone (index 0) is
+    the ``primary`` one: its relays keep the plain ``stage1``/``stage2``
+    accounting names, its session events are written untagged like before
+    and it is what requests without a ``zone`` act on.
+    """
+
+    def __init__(self, name, probe, stage1_pin, stage2_pin, index=0):
+        self.name = name
+        self.probe = probe
+        self.stage1_pin = stage1_pin
+        self.stage2_pin = stage2_pin
+        self.index = index
+        self.primary = index == 0
+        prefix = "" if self.primary else f"{name}_"
+        self.relay_stage1 = f"{prefix}stage1"
+        self.relay_stage2 = f"{prefix}stage2"
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "probe": self.probe.name,
+            "stage1_pin": self.stage1_pin,
+            "stage2_pin": self.stage2_pin,
+            "primary": self.primary,
+        }
+
+
+class ChannelRegistry:
+    """Validated, ordered set of probes and the zones controlled on them.
+
+    ``zones`` are ``(name, probe_name, stage1_pin, stage2_pin)`` tuples.
+    Raises ``ValueError`` for anything that could drive the wrong relay or
+    read the wrong input: duplicate names, inputs or pins, unknown probes, or
+    two zones on the same probe.
+    """
+
+    def __init__(self, probes, zones):
+        self.probes = tuple(probes)
+        self.by_name = {}
+        inputs = set()
+        for probe in self.probes:
+            if not _NAME.match(probe.name):
+                raise ValueError(
+                    f"Probe name {probe.name!r} must be lowercase letters and digits"
+                )
+            if probe.name in self.by_name:
+                raise ValueError(f"Duplicate probe {probe.name!r}")
+            if (
+                probe.address not in ADS1115_ADDRESSES
+                or not 0 <= probe.input < ADS1115_INPUTS
+            ):
+                raise ValueError(f"Probe {probe.name!r} is not on an ADS1115 input")
+            if (probe.address, probe.input) in inputs:
+                raise ValueError(f"Probe {probe.name!r} shares its ADS1115 input")
+            inputs.add((probe.address, probe.input))
+            self.by_name[probe.name] = probe
+        if not zones:
+            raise ValueError("At least one zone is required")
+
+        self.zones = {}
+        pins = set()
+        controlled = set()
+        for i, (name, probe_name, stage1_pin, stage2_pin) in enumerate(zones):
+            if not _NAME.match(name):
+                raise ValueError(
+                    f"Zone name {name!r} must be lowercase letters and digits"
+                )
+            if name in self.zones:
+                raise ValueError(f"Duplicate zone {name!r}")
+            probe = self.by_name.get(probe_name)
+            if probe is None:
+                raise ValueError(f"Zone {name!r} uses unknown probe {probe_name!r}")
+            if probe_name in controlled:
+                raise ValueError(f"Probe {probe_name!r} already controls another zone")
+            if stage1_pin == stage2_pin or {stage1_pin, stage2_pin} & pins:
+                raise ValueError(f"Zone {name!r} reuses a relay pin")
+            controlled.add(probe_name)
+            pins.update((stage1_pin, stage2_pin))
+            probe.critical = True
+            self.zones[name] = Zone(name, probe, stage1_pin, stage2_pin, index=i)
+        self.primary = next(iter(self.zones.values()))
+
+    @property
+    def temp_keys(self):
+        return tuple(probe.temp_key for probe in self.probes)
+
+    def history_columns(self, time_key="time"):
+        """Time, then every probe's temperature, voltage and resistance, by kind."""
+        return (
+            (time_key,)
+            + self.temp_keys
+            + tuple(probe.voltage_key for probe in self.probes)
+            + tuple(probe.resistance_key for probe in self.probes)
+        )
+
+    def as_dict(self):
+        return {
+            "probes": [probe.as_dict() for probe in self.probes],
+            "zones": [zone.as_dict() for zone in self.zones.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, config):
+        try:
+            probes = [
+                Probe(
+                    str(p["name"]),
+                    int(p["input"]),
+                    int(p.get("address", ADS1115_ADDRESSES[0])),
+                )
+                for p in config["probes"]
+            ]
+            zones = [
+                (
+                    str(z["name"]),
+                    str(z["probe"]),
+                    int(z["stage1_pin"]),
+                    int(z["stage2_pin"]),
+                )
+                for z in config["zones"]
+            ]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed channel config: {e!r}") from e
+        return cls(probes, zones)
+
+
+def default_registry():
+    """The turkey fryer: oil and turkey probes, one zone on oil."""
+    return ChannelRegistry(
+        [Probe("oil", 0), Probe("turkey", 1)],
+        [("fryer", "oil", 21, 20)],
+    )
+
+
+def load_registry(path):
+    """Registry from the JSON file at ``path``, or the default layout if there is none.
+
+    A file that exists but does not parse or validate raises ``ValueError``:
+    guessing at a relay map is worse than refusing to start.
+    """
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return default_registry()
+    except OSError as e:
+        raise ValueError(f"Unreadable channel config {path}: {e}") from e
+    return ChannelRegistry.from_dict(config)
@@ -0,0 +1,470 @@
+"""Burner controllers: map oil temperature and target to a stage (0, 1 or 2).
+
+Every controller exposes the same small interface so the burner worker can
+switch between them at runtime:
+
+* ``observe(time_ms, temp, stage)`` is called for every fresh sample with the
+  stage that was applied since the previous one, whether or not the
+  controller is in charge, so models keep learning in the background.
+* ``decide(temp, target, s1_on, s2_on)`` returns ``(requested_stage, output)``
+  where ``output`` is a 0..100 figure for display.
+* ``reset()`` clears internal state (called on stop and when a controller
+  takes over), and ``state()`` returns a JSON-friendly summary.
+"""
+
+import math
+from collections import deque
+
+CONTROLLER_PID = "pid"
+CONTROLLER_PREDICTIVE = "predictive"
+
+# Fraction of full burner power delivered by each stage
+STAGE_POWER = (0.0, 0.5, 1.0)
+# Plan tail that cycles at the model's steady holding power
+HOLD = "hold"
+# A model must beat the active one's error by this factor to replace it
+MODEL_SWITCH_RATIO = 0.8
+# Confidence in the FOPDT prior for (a, b): a moves in 1e-4 steps, b in 0.1s
+PRIOR_COVARIANCE = (1e-7, 1e-2)
+# Physical range the fitted pole and input gain are projected into
+MIN_POLE = 0.9
+MAX_POLE = 1.0 - 1e-6
+MIN_INPUT_GAIN = 1e-4
+
+
+def applied_stage(s1_on, s2_on):
+    return 2 if s2_on else 1 if s1_on else 0
+
+
+class PidHysteresisController:
+    """``simple_pid`` output mapped to stages through fixed hysteresis bands.
+
+    Stage 0 -> < 30, Stage 1 -> 30..70, Stage 2 -> > 70, with the on/off
+    thresholds split around those points so the relays do not chatter.
+    """
+
+    name = CONTROLLER_PID
+
+    def __init__(self, pid, s1_on=35, s1_off=25, s2_on=75, s2_off=65):
+        self.pid = pid
+        self.s1_on = s1_on
+        self.s1_off = s1_off
+        self.s2_on = s2_on
+        self.s2_off = s2_off
+
+    def observe(self, time_ms, temp, stage):
+        pass
+
+    def decide(self, temp, target, s1_on, s2_on):
+        self.pid.setpoint = target
+        output = self.pid(temp)
+        # Determine requested stage with hysteresis
+        if s2_on:
+            stage = 2 if output >= self.s2_off else 1 if output >= self.s1_off else 0
+        elif s1_on:
+            stage = 2 if output >= self.s2_on else 1 if output >= self.s1_off else 0
+        else:
+            stage = 2 if output >= self.s2_on else 1 if output >= self.s1_on else 0
+        return stage, output
+
+    def reset(self):
+        self.pid.reset()
+
+    def state(self):
+        kp, ki, kd = self.pid.tunings
+        return {
+            "kp": kp,
+            "ki": ki,
+            "kd": kd,
+            "thresholds": {
+                "s1_on": self.s1_on,
+                "s1_off": self.s1_off,
+                "s2_on": self.s2_on,
+                "s2_off": self.s2_off,
+            },
+        }
+
+
+class RecursiveLeastSquares:
+    """Exponentially weighted recursive least squares for ``y = theta . x``.
+
+    ``forgetting`` < 1 discounts old samples so the fit tracks slow changes
+    in the plant (oil level, a turkey going in). When the input stops
+    exciting the model (a long steady hold) the covariance is not inflated
+    past ``max_trace``, which prevents the usual RLS wind-up. The fit starts
+    from ``initial_theta`` with a diagonal covariance of
+    ``initial_covariance`` (one value, or one per parameter), which acts as
+    a prior of that confidence.
+    """
+
+    def __init__(self, n, forgetting=0.995, initial_covariance=1000.0, max_trace=1e6,
+                 initial_theta=None):
+        self.n = n
+        self.forgetting = forgetting
+        if isinstance(initial_covariance, (int, float)):
+            initial_covariance = [initial_covariance] * n
+        self.initial_covariance = list(initial_covariance)
+        self.initial_theta = (
+            list(initial_theta) if initial_theta is not None else [0.0] * n
+        )
+        self.max_trace = max_trace
+        self.reset()
+
+    def reset(self):
+        n = self.n
+        self.theta = list(self.initial_theta)
+        self.P = [
+            [self.initial_covariance[i] if i == j else 0.0 for j in range(n)]
+            for i in range(n)
+        ]
+
+    def update(self, x, y):
+        """Fold in one observation; returns the a-priori prediction error."""
+        n = self.n
+        P = self.P
+        Px = [sum(P[i][j] * x[j] for j in range(n)) for i in range(n)]
+        error = y - sum(t * xi for t, xi in zip(self.theta, x))
+        trace = sum(P[i][i] for i in range(n))
+        lam = self.forgetting if trace < self.max_trace else 1.0
+        denom = lam + sum(xi * pxi for xi, pxi in zip(x, Px))
+        gain = [pxi / denom for pxi in Px]
+        self.theta = [t + g * error for t, g in zip(self.theta, gain)]
+        self.P = [
+            [(P[i][j] - gain[i] * Px[j]) / lam for j in range(n)] for i in range(n)
+        ]
+        return error
+
+
+class FopdtModel:
+    """First-order-plus-dead-time oil model fitted online.
+
+    Discretized at the sample period and taken relative to the ambient
+    temperature, ``T[k+1] - Ta = a*(T[k] - Ta) + b*u[k-d]`` where ``u`` is
+    the burner power fraction and ``d`` the dead time in samples. Ambient is
+    supplied rather than fitted: with a free offset term the fit collapses
+    into a local model around the setpoint while the loop holds it, and
+    then mispredicts the next heat-up. The physical parameters follow from
+    the fit: time constant ``tau = -dt / ln(a)`` and steady-state gain
+    ``K = b / (1 - a)`` (degrees above ambient per unit power).
+
+    The fit starts from ``prior_tau_s`` / ``prior_gain``. A heat-up at
+    constant full power cannot separate ``a`` from ``b`` on its own, and the
+    prior keeps the model usable until the first stage change does.
+    """
+
+    def __init__(
+        self,
+        dead_time_steps,
+        sample_period=1.0,
+        ambient_temp=21.0,
+        forgetting=0.995,
+        error_alpha=0.02,
+        prior_tau_s=1800.0,
+        prior_gain=800.0,
+    ):
+        self.dead_time_steps = dead_time_steps
+        self.sample_period = sample_period
+        self.ambient_temp = ambient_temp
+        self.error_alpha = error_alpha
+        prior_a = math.exp(-sample_period / prior_tau_s)
+        self.rls = RecursiveLeastSquares(
+            2,
+            forgetting=forgetting,
+            initial_covariance=PRIOR_COVARIANCE,
+            initial_theta=(prior_a, prior_gain * (1.0 - prior_a)),
+        )
+        self.reset()
+
+    def reset(self):
+        self.rls.reset()
+        # Applied power over the last d + 1 sample intervals, oldest first
+        self.inputs = deque(maxlen=self.dead_time_steps + 1)
+        self.last_temp = None
+        self.samples = 0
+        self.mse = None
+
+    def observe(self, temp, power):
+        """Add one sample and the power applied over the interval that led to it."""
+        self.inputs.append(power)
+        ambient = self.ambient_temp
+        if self.last_temp is not None and len(self.inputs) == self.inputs.maxlen:
+            error = self.rls.update(
+                (self.last_temp - ambient, self.inputs[0]), temp - ambient
+            )
+            self._project()
+            self.samples += 1
+            squared = error * error
+            if self.mse is None:
+                self.mse = squared
+            else:
+                self.mse += self.error_alpha * (squared - self.mse)
+        self.last_temp = temp
+
+    def _project(self):
+        # The convex start of a heat-up (probe lag, dead time) fits a > 1;
+        # clamp back into the stable, heating region instead of dropping the model
+        theta = self.rls.theta
+        theta[0] = min(max(theta[0], MIN_POLE), MAX_POLE)
+        theta[1] = max(theta[1], MIN_INPUT_GAIN)
+
+    @property
+    def coefficients(self):
+        return tuple(self.rls.theta)
+
+    def is_valid(self, min_samples):
+        a, b = self.rls.theta
+        return self.samples >= min_samples and 0.0 < a < 1.0 and b > 0.0
+
+    def pending_inputs(self):
+        """Power already committed to the next ``d`` steps because of the dead time."""
+        d = self.dead_time_steps
+        if not d:
+            return []
+        return list(self.inputs)[-d:]
+
+    def holding_power(self, target):
+        """Constant power that holds ``target`` in steady state, clamped to 0..1."""
+        a, b = self.rls.theta
+        return min(1.0, max(0.0, (target - self.ambient_temp) * (1.0 - a) / b))
+
+    def after_pending(self, temp):
+        """Predicted temperature once the power committed by the dead time has acted."""
+        a, b = self.rls.theta
+        rise = temp - self.ambient_temp
+        for power in self.pending_inputs():
+            rise = a * rise + b * power
+        return self.ambient_temp + rise
+
+    def steady_state(self, power):
+        """Temperature the model settles at if ``power`` is held forever."""
+        a, b = self.rls.theta
+        return self.ambient_temp + b * power / (1.0 - a)
+
+    def parameters(self):
+        a, b = self.rls.theta
+        params = {
+            "dead_time_s": self.dead_time_steps * self.sample_period,
+            "samples": self.samples,
+            "mse": self.mse,
+            "tau_s": None,
+            "gain": None,
+            "ambient": self.ambient_temp,
+        }
+        if 0.0 < a < 1.0:
+            params["tau_s"] = -self.sample_period / math.log(a)
+            params["gain"] = b / (1.0 - a)
+        return params
+
+
+class PredictiveController:
+    """Look-ahead stage selection over an online FOPDT model of the oil.
+
+    A bank of models with different dead times is fitted in parallel and the
+    one with the lowest recent prediction error is used. Each decision
+    predicts short plans (one stage for ``block_s`` times one of
+    ``switch_blocks``, then either a fixed stage or the model's steady
+    holding power for the rest of ``horizon_s``) and picks the first stage
+    of the cheapest plan. The
+    power already committed by the dead time is applied once per decision;
+    after that each constant-power segment has a closed-form geometric
+    response, so plans are scored on a ``cost_step_s`` grid without
+    stepping the model sample by sample. The
+    holding tail stands in for cycling around the target later, so a plan
+    is not penalized for an overshoot that holding full power forever would
+    cause. Overshoot above the target costs ``overshoot_weight`` times more
+    than the same undershoot, and every relay change in a plan costs
+    ``toggle_cost``, so the burner is backed off before the oil overshoots
+    and is not switched for marginal gains. Until a model is trusted the
+    ``fallback`` controller decides.
+    """
+
+    name = CONTROLLER_PREDICTIVE
+
+    def __init__(
+        self,
+        fallback,
+        sample_period=1.0,
+        dead_times_s=(0, 5, 10, 20, 40),
+        ambient_temp=21.0,
+        prior_tau_s=1800.0,
+        prior_gain=800.0,
+        horizon_s=180,
+        block_s=15,
+        switch_blocks=(1, 2, 4, 8),
+        cost_step_s=5,
+        overshoot_weight=10.0,
+        toggle_cost=1000.0,
+        min_samples=120,
+        forgetting=0.999,
+    ):
+        self.fallback = fallback
+        self.sample_period = sample_period
+        self.models = [
+            FopdtModel(
+                int(round(d / sample_period)),
+                sample_period,
+                ambient_temp,
+                forgetting,
+                prior_tau_s=prior_tau_s,
+                prior_gain=prior_gain,
+            )
+            for d in dead_times_s
+        ]
+        self.active_model = None
+        self.horizon_steps = max(1, int(round(horizon_s / sample_period)))
+        self.block_steps = max(
+            1, min(self.horizon_steps, int(round(block_s / sample_period)))
+        )
+        # Every plan switches at least once inside the horizon, and at least one
+        # plan exists
+        self.switch_steps = sorted(
+            {min(self.horizon_steps, n * self.block_steps) for n in switch_blocks}
+        ) or [self.block_steps]
+        self.cost_steps = max(1, int(round(cost_step_s / sample_period)))
+        self.overshoot_weight = overshoot_weight
+        self.toggle_cost = toggle_cost
+        self.min_samples = min_samples
+        self.last_time = None
+        self.last_plan = None
+
+    def observe(self, time_ms, temp, stage):
+        if time_ms == self.last_time or temp is None:
+            return  # same sample as last step
+        self.last_time = time_ms
+        power = STAGE_POWER[stage]
+        for model in self.models:
+            model.observe(temp, power)
+
+    def prime(self, samples):
+        """Fit the models from recorded ``(time_ms, temp, stage)``, oldest first."""
+        for time_ms, temp, stage in samples:
+            if temp is not None and not math.isnan(temp):
+                self.observe(time_ms, temp, stage)
+
+    def best_model(self):
+        """Trusted model with the lowest recent error.
+
+        Switches ``active_model`` only for a clear improvement. Only
+        :meth:`decide` calls this, so the model changes on the control
+        thread alone.
+        """
+        valid = [m for m in self.models if m.is_valid(self.min_samples)]
+        if not valid:
+            self.active_model = None
+            return None
+        best = min(valid, key=lambda m: m.mse)
+        current = self.active_model
+        if (
+            current is None
+            or current not in valid
+            or best.mse < MODEL_SWITCH_RATIO * current.mse
+        ):
+            self.active_model = best
+        return self.active_model
+
+    def _grid(self, a, steps):
+        """``(weight, a**k)`` at every ``cost_steps`` up to ``steps``.
+
+        The weight is the number of steps covered.
+        """
+        points = list(range(self.cost_steps, steps, self.cost_steps)) + [steps]
+        grid = []
+        previous = 0
+        for k in points:
+            grid.append((k - previous, a ** k))
+            previous = k
+        return grid
+
+    def _segment_cost(self, start, settle, grid, target):
+        """Weighted squared error of a geometric approach, ``start`` to ``settle``."""
+        overshoot_weight = self.overshoot_weight
+        offset = start - settle
+        cost = 0.0
+        for weight, decay in grid:
+            error = settle + offset * decay - target
+            cost += weight * (
+                overshoot_weight * error * error if error > 0 else error * error
+            )
+        return cost
+
+    def _plan_cost(self, model, start, target, current_stage, first, rest, grids):
+        """Predicted cost of holding ``first`` for a while, then ``rest``.
+
+        ``rest`` is a stage or HOLD.
+
+        ``grids`` is ``(first_grid, rest_grid, first_decay)`` for the switch time.
+        """
+        if rest == HOLD:
+            rest_power = model.holding_power(target)
+            toggles = (first != current_stage) + 1
+        else:
+            rest_power = STAGE_POWER[rest]
+            toggles = (first != current_stage) + (rest != first)
+        first_grid, rest_grid, first_decay = grids
+        settle = model.steady_state(STAGE_POWER[first])
+        cost = self.toggle_cost * toggles
+        cost += self._segment_cost(start, settle, first_grid, target)
+        if rest_grid:
+            switch_temp = settle + (start - settle) * first_decay
+            cost += self._segment_cost(
+                switch_temp, model.steady_state(rest_power), rest_grid, target
+            )
+        return cost
+
+    def decide(self, temp, target, s1_on, s2_on):
+        model = self.best_model()
+        if model is None:
+            self.last_plan = None
+            return self.fallback.decide(temp, target, s1_on, s2_on)
+        current_stage = applied_stage(s1_on, s2_on)
+        # Every plan starts from the same point: after the committed dead-time inputs
+        start = model.after_pending(temp)
+        a = model.coefficients[0]
+        grids = {}
+        for steps in self.switch_steps:
+            rest_steps = self.horizon_steps - steps
+            grids[steps] = (
+                self._grid(a, steps),
+                self._grid(a, rest_steps) if rest_steps > 0 else [],
+                a ** steps,
+            )
+        # Staying on one stage is the same plan at every switch time, so score it once
+        plans = [
+            (first, rest, steps)
+            for first in range(3)
+            for rest in (0, 1, 2, HOLD)
+            for steps in (self.switch_steps if rest != first else self.switch_steps[:1])
+        ]
+        costs = [
+            self._plan_cost(
+                model, start, target, current_stage, first, rest, grids[steps]
+            )
+            for first, rest, steps in plans
+        ]
+        best = min(range(len(plans)), key=costs.__getitem__)
+        first, rest, steps = plans[best]
+        self.last_plan = {
+            "first": first,
+            "rest": rest,
+            "switch_s": steps * self.sample_period,
+            "cost": costs[best],
+        }
+        return first, STAGE_POWER[first] * 100
+
+    def reset(self):
+        # The fitted models describe the plant, not the loop, so they survive a stop
+        self.fallback.reset()
+        self.last_plan = None
+
+    def state(self):
+        # Read-only: served from HTTP threads while the control thread decides
+        active = self.active_model
+        return {
+            "active_model": None if active is None else active.parameters(),
+            "models": [model.parameters() for model in self.models],
+            "horizon_s": self.horizon_steps * self.sample_period,
+            "block_s": self.block_steps * self.sample_period,
+            "overshoot_weight": self.overshoot_weight,
+            "toggle_cost": self.toggle_cost,
+            "last_plan": self.last_plan,
+        }
@@ -0,0 +1,135 @@
+"""Load test of the dashboard's update paths: timer polling against push.
+
+Before /stream, every open dashboard ran four ``setInterval`` timers:
+/temperatures and /status every second, /logs every two seconds, and a
+stale-data check every second that only looks at the page's own clock.
+This opens ``--clients`` such dashboards against the real app and workers,
+then the same number of /poll long-pollers and of /stream subscribers, one
+connection each, and prints the request rate, the updates delivered and
+the process CPU of each mode::
+
+    python dashboard_load.py --clients 20 --seconds 10
+
+Updates come from the sampling and control workers at 1 Hz on the
+simulated fryer, unless ``ROBOBURN_HARDWARE`` picks another backend.
+Requests go through Flask's test client, so this is the server's cost
+without the network.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+# (path, period in seconds) of the old page's timers; None makes no request
+POLLING_TIMERS = (
+    ("/temperatures", 1.0),
+    ("/status", 1.0),
+    ("/logs", 2.0),
+    (None, 1.0),  # checkStaleData
+)
+
+
+def polling(webapp, stop, counts):
+    """One dashboard as the page was before /stream: four timers."""
+    client = webapp.app.test_client()
+    due = [0.0] * len(POLLING_TIMERS)
+    while not stop.is_set():
+        now = time.monotonic()
+        for i, (path, period) in enumerate(POLLING_TIMERS):
+            if now < due[i]:
+                continue
+            due[i] = now + period
+            if path is not None:
+                client.get(path).close()
+                counts["requests"] += 1
+                counts["updates"] += 1
+        stop.wait(max(0.0, min(due) - time.monotonic()))
+
+
+def poll(webapp, stop, counts):
+    """One dashboard following /poll, resuming from each reply's position."""
+    client = webapp.app.test_client()
+    query = {}
+    while not stop.is_set():
+        response = client.get("/poll", query_string=query)
+        update = json.loads(response.data)
+        response.close()
+        counts["requests"] += 1
+        counts["updates"] += 1
+        query = dict(update["versions"])
+        samples = update.get(webapp.TOPIC_TEMPERATURE)
+        if samples:
+            query["since"] = samples[-1][webapp.KEY_TIME]
+        logs = update.get(webapp.TOPIC_LOGS)
+        if logs:
+            query["logs_after"] = logs[-1]["seq"]
+
+
+def stream(webapp, stop, counts):
+    """One dashboard holding a /stream connection."""
+    with webapp.app.test_request_context("/stream"):
+        body = webapp.stream().response
+        counts["requests"] += 1
+        for chunk in body:
+            chunk = chunk.encode() if isinstance(chunk, str) else chunk
+            if chunk.startswith(b"data:"):
+                counts["updates"] += 1
+            if stop.is_set():
+                break
+        body.close()
+
+
+MODES = {"polling": polling, "poll": poll, "stream": stream}
+
+
+def run(webapp, mode, clients, seconds):
+    """``(requests/s, updates/s, CPU fraction)`` of ``clients`` dashboards."""
+    stop = threading.Event()
+    counts = [{"requests": 0, "updates": 0} for _ in range(clients)]
+    threads = [
+        threading.Thread(target=MODES[mode], args=(webapp, stop, count), daemon=True)
+        for count in counts
+    ]
+    started = time.monotonic()
+    cpu = time.process_time()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    cpu = time.process_time() - cpu
+    elapsed = time.monotonic() - started
+    # Wake the blocked ones to see the stop
+    webapp.notifier.notify(webapp.TOPIC_LOGS)
+    for thread in threads:
+        thread.join(webapp.LONG_POLL_TIMEOUT_S)
+    requests = sum(count["requests"] for count in counts) / elapsed
+    updates = sum(count["updates"] for count in counts) / elapsed
+    return requests, updates, cpu / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument(
+        "--mode", choices=tuple(MODES), action="append", help="default: all"
+    )
+    args = parser.parse_args()
+
+    os.environ.setdefault("ROBOBURN_HARDWARE", "sim")
+    import app as webapp
+
+    webapp.start_background_threads()
+    time.sleep(1.5)  # let the first samples arrive
+
+    print(f"{args.clients} clients for {args.seconds:.0f}s each")
+    print(f"{'mode':<10}{'requests/s':>12}{'updates/s':>11}{'cpu':>8}")
+    for mode in args.mode or MODES:
+        requests, updates, cpu = run(webapp, mode, args.clients, args.seconds)
+        print(f"{mode:<10}{requests:>12.1f}{updates:>11.1f}{cpu:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Streaming decimation of the 1 Hz temperature history into coarser windows."""
+
+from metrics import NULL_REGISTRY, timed_acquire
+
+DECIMATED_KEYS = ("oil_temp", "turkey_temp")
+
+
+class DecimationAccumulator:
+    """Running sum/count (and optionally min/max) for one decimation window.
+
+    Every sample is folded in as it arrives; when the window's interval has
+    elapsed since the last emission the bucket is closed and its average is
+    returned. This replaces rescanning the raw history on every tick, so the
+    cost per sample is constant regardless of how much history is kept (and
+    linear in the number of ``keys``). Missing values (a probe with no valid
+    reading yet) are left out, and a key with none in a bucket averages to
+    None. The per-key extremes are only tracked with ``extremes``, as the
+    averaged windows have no use for them.
+    """
+
+    def __init__(self, interval, keys=DECIMATED_KEYS, extremes=False):
+        self.interval = interval
+        self.keys = tuple(keys)
+        self.extremes = extremes
+        # Wall-clock time (seconds) of the last emitted bucket
+        self.last_update = 0
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.time_sum = 0.0
+        self.counts = {key: 0 for key in self.keys}
+        self.sums = {key: 0.0 for key in self.keys}
+        self.mins = {key: None for key in self.keys}
+        self.maxs = {key: None for key in self.keys}
+
+    def add(self, entry):
+        """Fold one history entry (``{"time": ms, key: value}``) into the bucket."""
+        self.count += 1
+        self.time_sum += entry["time"]
+        for key in self.keys:
+            value = entry[key]
+            if value is None:
+                continue
+            self.counts[key] += 1
+            self.sums[key] += value
+            if not self.extremes:
+                continue
+            if self.mins[key] is None or value < self.mins[key]:
+                self.mins[key] = value
+            if self.maxs[key] is None or value > self.maxs[key]:
+                self.maxs[key] = value
+
+    def is_due(self, current_time):
+        return current_time - self.last_update >= self.interval
+
+    def emit(self, current_time):
+        """Close the bucket and return its averaged entry, or None if it is empty."""
+        if not self.count:
+            return None
+        avg_entry = {"time": self.time_sum / self.count}
+        for key in self.keys:
+            count = self.counts[key]
+            avg_entry[key] = self.sums[key] / count if count else None
+        self.last_update = current_time
+        self._reset()
+        return avg_entry
+
+    def replay(self, times, values):
+        """Bulk equivalent of calling :meth:`update` once per recorded sample.
+
+        ``times`` are sample timestamps in ms and ``values`` maps each key to a
+        list aligned with ``times``. Only the bucket boundaries are found in a
+        Python loop; the sums and extremes of each bucket are taken over list
+        slices, which keeps replaying hours of history fast at startup.
+        Returns the averaged entries that would have been emitted.
+        """
+        emitted = []
+        start = 0
+        interval = self.interval
+        last_update = self.last_update
+        for i, time_ms in enumerate(times):
+            current_time = time_ms / 1000
+            if current_time - last_update < interval:
+                continue
+            self._fold(times, values, start, i + 1)
+            emitted.append(self.emit(current_time))
+            last_update = current_time
+            start = i + 1
+        self._fold(times, values, start, len(times))
+        return emitted
+
+    def _fold(self, times, values, start, stop):
+        if stop <= start:
+            return
+        self.count += stop - start
+        self.time_sum += sum(times[start:stop])
+        for key in self.keys:
+            chunk = values[key][start:stop]
+            total = sum(chunk)
+            if total != total:
+                # NaN: the log holds gaps where this probe had no reading
+                chunk = [value for value in chunk if value == value]
+                if not chunk:
+                    continue
+                total = sum(chunk)
+            self.counts[key] += len(chunk)
+            self.sums[key] += total
+            if not self.extremes:
+                continue
+            low, high = min(chunk), max(chunk)
+            if self.mins[key] is None or low < self.mins[key]:
+                self.mins[key] = low
+            if self.maxs[key] is None or high > self.maxs[key]:
+                self.maxs[key] = high
+
+    def update(self, entry, current_time):
+        """Add ``entry``; returns the averaged bucket if the window closed this tick."""
+        self.add(entry)
+        if self.is_due(current_time):
+            return self.emit(current_time)
+        return None
+
+
+class HistoryDecimator:
+    """Scheduled step folding the newest raw sample into every decimation window.
+
+    A window's ``data`` only needs ``append``. With a
+    :class:`history_buffer.HistoryBuffer` there, readers copy a window
+    without taking ``data_lock`` and an emission costs one append, however
+    long the window. Pass and lock wait times go to ``metrics`` (a
+    :class:`metrics.Registry`).
+    """
+
+    def __init__(self, temperature_history, decimated_history, accumulators, data_lock,
+                 time_key="time", metrics=NULL_REGISTRY):
+        self.temperature_history = temperature_history
+        self.decimated_history = decimated_history
+        self.accumulators = accumulators
+        self.data_lock = data_lock
+        self.time_key = time_key
+        self.pass_time = metrics.histogram(
+            "roboburn_decimation_seconds",
+            "Folding one sample into every decimation window",
+        )
+        self.lock_wait = metrics.histogram(
+            "roboburn_lock_wait_seconds",
+            "Time spent waiting for a lock",
+            lock="data",
+            site="decimate",
+        )
+        # Samples already in the buffer (e.g. replayed from a session log) are
+        # assumed to be folded in already.
+        self._last_time = temperature_history.latest(time_key)
+
+    def step(self):
+        """Returns True if any window emitted a new averaged entry."""
+        with self.pass_time.time():
+            return self._step()
+
+    def _step(self):
+        emitted = False
+        with timed_acquire(self.data_lock, self.lock_wait):
+            if not self.temperature_history:
+                return False
+            entry = self.temperature_history[-1]
+            timestamp = entry[self.time_key]
+            if timestamp == self._last_time:
+                return False  # already folded in
+            self._last_time = timestamp
+            # Each window keeps running sums of the samples since its last
+            # bucket, so this is O(windows) per sample.
+            for key, history in self.decimated_history.items():
+                avg_entry = self.accumulators[key].update(entry, timestamp / 1000)
+                if avg_entry is not None:
+                    history["data"].append(avg_entry)
+                    emitted = True
+        return emitted
@@ -0,0 +1,251 @@
+"""Downsampling of time-ordered history entries to a requested point budget.
+
+Every algorithm takes a list of entry dicts sorted by time and returns a
+subset of those same entries (never synthesized points), in a single linear
+pass over the input.
+"""
+
+DEFAULT_ALGORITHM = "nearest"
+DEFAULT_VALUE_KEYS = ("oil_temp", "turkey_temp")
+
+
+def nearest(entries, count, time_key="time", value_keys=DEFAULT_VALUE_KEYS):
+    """Pick the sample nearest to each of ``count`` evenly spaced target times.
+
+    Duplicate picks are dropped, so fewer than ``count`` entries may come back
+    when the input is sparse in places.
+    """
+    if count <= 0 or len(entries) <= count:
+        return list(entries)
+    t_min = entries[0][time_key]
+    t_max = entries[-1][time_key]
+    if t_max == t_min:
+        return [entries[-1]]
+
+    step = (t_max - t_min) / max(1, (count - 1))
+    last = len(entries) - 1
+    sampled = []
+    idx = 0
+    last_idx = -1
+    for i in range(count):
+        target_t = t_min + i * step
+        # Targets only move forward, so the cursor never has to rewind
+        while idx < last and entries[idx][time_key] < target_t:
+            idx += 1
+        chosen = idx
+        if chosen > 0:
+            # choose closer between chosen-1 and chosen
+            if abs(entries[chosen][time_key] - target_t) >= abs(
+                target_t - entries[chosen - 1][time_key]
+            ):
+                chosen -= 1
+        if chosen != last_idx:
+            sampled.append(entries[chosen])
+            last_idx = chosen
+    return sampled
+
+
+def lttb(entries, count, time_key="time", value_keys=DEFAULT_VALUE_KEYS):
+    """Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last samples and, from each interior bucket, the
+    sample forming the largest triangle with the previously kept sample and
+    the average of the next bucket. Areas are summed over ``value_keys`` so a
+    spike on any channel is preserved. Missing values are skipped rather than
+    scored: each key is averaged over the samples that have it and anchored
+    on the last kept sample that had it, so a gap in one probe's readings
+    does not pull the picks toward zero.
+    """
+    n = len(entries)
+    if count <= 0 or n <= count:
+        return list(entries)
+    if count < 3:
+        return [entries[0], entries[-1]][:count]
+
+    n_keys = len(value_keys)
+    bucket_size = (n - 2) / (count - 2)
+    sampled = [entries[0]]
+    # (time, value) of the last kept sample with a value, per key
+    anchors = [None] * n_keys
+    for k, key in enumerate(value_keys):
+        value = entries[0].get(key)
+        if value is not None:
+            anchors[k] = (entries[0][time_key], value)
+    for i in range(count - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the following bucket (or the last point for the final bucket)
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        sums_t = [0.0] * n_keys
+        sums_v = [0.0] * n_keys
+        counts = [0] * n_keys
+        for entry in entries[next_start:next_end]:
+            t = entry[time_key]
+            for k, key in enumerate(value_keys):
+                value = entry.get(key)
+                if value is not None:
+                    sums_t[k] += t
+                    sums_v[k] += value
+                    counts[k] += 1
+
+        # (key, anchor time, anchor value, average time, average value) of
+        # every key that can form a triangle in this bucket
+        triangles = [
+            (key, *anchors[k], sums_t[k] / counts[k], sums_v[k] / counts[k])
+            for k, key in enumerate(value_keys)
+            if counts[k] and anchors[k] is not None
+        ]
+        best = None
+        best_area = -1.0
+        for entry in entries[start:end]:
+            t = entry[time_key]
+            area = 0.0
+            for key, a_t, a_v, avg_t, avg_v in triangles:
+                value = entry.get(key)
+                if value is not None:
+                    area += abs(
+                        (a_t - avg_t) * (value - a_v) - (t - a_t) * (a_v - avg_v)
+                    )
+            if area > best_area:
+                best_area = area
+                best = entry
+        if best is not None:
+            sampled.append(best)
+            for k, key in enumerate(value_keys):
+                value = best.get(key)
+                if value is not None:
+                    anchors[k] = (best[time_key], value)
+    sampled.append(entries[-1])
+    return sampled
+
+
+def m4(entries, count, time_key="time", value_keys=DEFAULT_VALUE_KEYS):
+    """M4 aggregation: first, last, min and max sample per time bucket.
+
+    Each bucket can contribute ``2 + 2 * len(value_keys)`` samples, so the
+    bucket count is chosen to keep the result within ``count``. Extremes are
+    kept exactly, which is what makes overshoots and probe dropouts visible.
+    Budgets too small for even one bucket fall back to :func:`lttb`.
+    """
+    n = len(entries)
+    if count <= 0 or n <= count:
+        return list(entries)
+    per_bucket = 2 + 2 * len(value_keys)
+    if count < per_bucket:
+        return lttb(entries, count, time_key, value_keys)
+    t_min = entries[0][time_key]
+    t_max = entries[-1][time_key]
+    if t_max == t_min:
+        return [entries[-1]]
+
+    n_buckets = count // per_bucket
+    width = (t_max - t_min) / n_buckets
+    sampled = []
+    bucket = None
+    picks = set()
+    mins = maxs = None
+
+    def flush():
+        for k in range(len(value_keys)):
+            if mins[k] is not None:
+                picks.add(mins[k][1])
+                picks.add(maxs[k][1])
+        sampled.extend(entries[j] for j in sorted(picks))
+
+    for i, entry in enumerate(entries):
+        b = min(int((entry[time_key] - t_min) / width), n_buckets - 1)
+        if b != bucket:
+            if bucket is not None:
+                picks.add(i - 1)  # last sample of the previous bucket
+                flush()
+            bucket = b
+            picks = {i}
+            mins = [None] * len(value_keys)
+            maxs = [None] * len(value_keys)
+        for k, key in enumerate(value_keys):
+            value = entry.get(key)
+            if value is None:
+                continue
+            if mins[k] is None or value < mins[k][0]:
+                mins[k] = (value, i)
+            if maxs[k] is None or value > maxs[k][0]:
+                maxs[k] = (value, i)
+    picks.add(n - 1)
+    flush()
+    return sampled
+
+
+ALGORITHMS = {
+    "nearest": nearest,
+    "lttb": lttb,
+    "m4": m4,
+}
+
+
+def downsample(entries, count, algo=DEFAULT_ALGORITHM, **kwargs):
+    """Reduce ``entries`` to about ``count`` points with the named algorithm."""
+    try:
+        func = ALGORITHMS[algo]
+    except KeyError:
+        raise ValueError(f"Unknown downsampling algorithm: {algo}") from None
+    return func(entries, count, **kwargs)
+
+
+def _benchmark(count=800, repeats=5):
+    """Time and peak retention of each algorithm across history sizes.
+
+    A 30 s, 12 C oil overshoot and a 10 minute turkey probe dropout are put
+    into a noisy cook; ``peak`` says whether the overshoot's top sample
+    survived. ``json`` is the serialized size and time of the result, as
+    the history route sends it.
+    """
+    import json
+    import random
+    import time
+
+    print(f"count={count}")
+    print(f"{'samples':>8}  {'algo':<8}{'downsample':>11}{'points':>8}{'peak':>6}"
+          f"{'json':>10}{'dumps':>9}")
+    for n in (3600, 28800, 86400):
+        rng = random.Random(0)
+        entries = [
+            {
+                "time": 1e12 + i * 1000.0,
+                "oil_temp": 176 + rng.gauss(0, 0.3),
+                "turkey_temp": 4 + 70 * i / n + rng.gauss(0, 0.1),
+            }
+            for i in range(n)
+        ]
+        spike = n // 3
+        for i in range(30):
+            entries[spike + i]["oil_temp"] += 12 * (1 - abs(i - 15) / 15)
+        peak = entries[spike + 15]
+        for entry in entries[n // 2:n // 2 + 600]:
+            entry["turkey_temp"] = None
+        for algo in ("none",) + tuple(ALGORITHMS):
+            best = 0.0
+            sampled = entries
+            if algo != "none":
+                best = None
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    sampled = downsample(entries, count, algo)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+            dumps = None
+            for _ in range(repeats):
+                started = time.perf_counter()
+                body = json.dumps(sampled)
+                elapsed = time.perf_counter() - started
+                dumps = elapsed if dumps is None else min(dumps, elapsed)
+            print(f"{n:>8}  {algo:<8}{best * 1e3:>9.2f}ms{len(sampled):>8}"
+                  f"{'yes' if any(e is peak for e in sampled) else 'no':>6}"
+                  f"{len(body) / 1024:>7.0f}KiB{dumps * 1e3:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    _benchmark()
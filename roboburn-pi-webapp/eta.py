@@ -0,0 +1,282 @@
+"""Cook-completion estimates for the food probes.
+
+Every probe that no zone controls on is treated as food sitting in the
+primary zone's medium (the turkey in the oil) and heating by Newton's law,
+``dT/dt = k (T_env - T)``. The rate constant ``k`` is fitted online by
+exponentially weighted least squares on ``FIT_INTERVAL_S`` averages, so each
+tick costs a few additions whatever the length of the cook, and the fit
+follows the bird as its surface browns and the core takes over. The time to
+reach a probe's done temperature is then the closed-form solution of that
+curve, with a band from the uncertainty of ``k``.
+"""
+
+import math
+import threading
+import time
+
+from notifier import TOPIC_STATUS
+
+# Raw samples are averaged over this long before they are fitted: a turkey
+# rises a few hundredths of a degree per second, well under the ADC noise
+FIT_INTERVAL_S = 30.0
+# Weight kept per fit interval; 0.97 remembers roughly the last 15 minutes
+FORGETTING = 0.97
+# Estimates are only given once this many intervals have been fitted
+MIN_FITS = 6
+# Intervals where the medium is less than this much hotter than the food say
+# nothing about k (and a probe lying on the bench would fit noise)
+MIN_DRIVE_C = 5.0
+# A fall this large between intervals is a new piece of food (or a probe
+# pulled out): the fit starts over
+RESET_DROP_C = 5.0
+# Half-width of the band in standard errors of k (about 95%)
+CONFIDENCE_Z = 2.0
+# 165 F, the USDA minimum for poultry
+DEFAULT_DONE_TEMP_C = 73.9
+
+STATUS_NO_READING = "no_reading"
+STATUS_FITTING = "fitting"
+STATUS_ESTIMATING = "estimating"
+STATUS_DONE = "done"
+STATUS_UNREACHABLE = "unreachable"
+
+
+class NewtonFit:
+    """Weighted least squares for ``k`` in ``y = k x`` with exponential forgetting.
+
+    Only the running sums are kept, so an update and an estimate are O(1).
+    """
+
+    def __init__(self, forgetting=FORGETTING):
+        self.forgetting = forgetting
+        self.reset()
+
+    def reset(self):
+        self.sxx = 0.0
+        self.sxy = 0.0
+        self.syy = 0.0
+        self.weight = 0.0
+        self.fits = 0
+
+    def update(self, x, y):
+        decay = self.forgetting
+        self.sxx = self.sxx * decay + x * x
+        self.sxy = self.sxy * decay + x * y
+        self.syy = self.syy * decay + y * y
+        self.weight = self.weight * decay + 1.0
+        self.fits += 1
+
+    @property
+    def k(self):
+        return self.sxy / self.sxx if self.sxx > 0 else None
+
+    @property
+    def k_stderr(self):
+        if self.sxx <= 0 or self.weight <= 1.0:
+            return None
+        residual = max(self.syy - self.sxy * self.sxy / self.sxx, 0.0)
+        return math.sqrt(residual / (self.weight - 1.0) / self.sxx)
+
+
+def time_to_reach(temp, env, done_temp, k):
+    """Seconds for ``temp`` to reach ``done_temp`` under ``dT/dt = k (env - T)``.
+
+    None if it never does.
+    """
+    if k is None or k <= 0 or env <= done_temp:
+        return None
+    return math.log((env - temp) / (env - done_temp)) / k
+
+
+class _Bucket:
+    """Running sums of one fit interval."""
+
+    __slots__ = ("start", "count", "time_sum", "sums", "counts")
+
+    def __init__(self, start, keys):
+        self.start = start
+        self.count = 0
+        self.time_sum = 0.0
+        self.sums = dict.fromkeys(keys, 0.0)
+        self.counts = dict.fromkeys(keys, 0)
+
+    def add(self, t, entry):
+        self.count += 1
+        self.time_sum += t
+        for key in self.sums:
+            value = entry.get(key)
+            if value is not None and not math.isnan(value):
+                self.sums[key] += value
+                self.counts[key] += 1
+
+    def mean(self, key):
+        count = self.counts[key]
+        return self.sums[key] / count if count else None
+
+
+class EtaPredictor:
+    """Fits every food probe and publishes its estimate to ``snapshot``.
+
+    :meth:`step` runs after each sample and folds the newest history entry
+    into the current interval; only when an interval closes are the fits
+    updated and the estimates republished (and status listeners woken), so
+    ``/status`` serves them as they are. :meth:`prime` replays decimated
+    history after a restart so the estimate does not start from scratch.
+    The predicted end assumes the medium settles at the primary zone's
+    target while it is running and stays where it is otherwise.
+    """
+
+    def __init__(
+        self,
+        channels,
+        temperature_history,
+        zone_status,
+        snapshot,
+        notifier=None,
+        interval_s=FIT_INTERVAL_S,
+        forgetting=FORGETTING,
+        done_temp=DEFAULT_DONE_TEMP_C,
+        clock=time.time,
+    ):
+        self.temperature_history = temperature_history
+        self.zone_status = zone_status[channels.primary.name]
+        self.snapshot = snapshot
+        self.notifier = notifier
+        self.interval_s = interval_s
+        self.clock = clock
+        self.env_key = channels.primary.probe.temp_key
+        self.food = {
+            probe.name: probe.temp_key
+            for probe in channels.probes
+            if not probe.critical
+        }
+        self.done_temps = dict.fromkeys(self.food, done_temp)
+        self.fits = {name: NewtonFit(forgetting) for name in self.food}
+        self.keys = (self.env_key,) + tuple(self.food.values())
+        self._bucket = None
+        self._previous = None  # (time, {key: mean}) of the last closed interval
+        self._last_time = None
+        self._lock = threading.Lock()
+        self._publish()
+
+    def step(self):
+        """Fold in the newest sample; refit and republish when an interval closes."""
+        if not self.food or not len(self.temperature_history):
+            return
+        entry = self.temperature_history[-1]
+        with self._lock:
+            if self._add(entry):
+                self._publish()
+                if self.notifier is not None:
+                    self.notifier.notify(TOPIC_STATUS)
+
+    def prime(self, entries):
+        """Warm the fits from older (e.g. decimated) history entries, oldest first."""
+        with self._lock:
+            for entry in entries:
+                self._add(entry)
+            self._publish()
+
+    def set_done_temp(self, name, temp):
+        """Change a food probe's done temperature; ``KeyError`` for other probes."""
+        with self._lock:
+            if name not in self.food:
+                raise KeyError(name)
+            self.done_temps[name] = float(temp)
+            self._publish()
+
+    def _add(self, entry):
+        """Add one entry; returns True if it closed an interval."""
+        t = entry["time"] / 1000.0
+        if self._last_time is not None and t <= self._last_time:
+            return False
+        self._last_time = t
+        closed = False
+        bucket = self._bucket
+        if bucket is not None and t - bucket.start >= self.interval_s:
+            self._close(bucket)
+            bucket = None
+            closed = True
+        if bucket is None:
+            bucket = self._bucket = _Bucket(t, self.keys)
+        bucket.add(t, entry)
+        return closed
+
+    def _close(self, bucket):
+        means = {key: bucket.mean(key) for key in self.keys}
+        current = (bucket.time_sum / bucket.count, means)
+        previous, self._previous = self._previous, current
+        if previous is None:
+            return
+        dt = current[0] - previous[0]
+        env = _average(previous[1][self.env_key], means[self.env_key])
+        for name, key in self.food.items():
+            before, after = previous[1][key], means[key]
+            if before is None or after is None:
+                continue
+            if before - after > RESET_DROP_C:
+                self.fits[name].reset()
+                continue
+            if env is None or dt <= 0:
+                continue
+            drive = env - (before + after) / 2
+            if drive >= MIN_DRIVE_C:
+                self.fits[name].update(drive, (after - before) / dt)
+
+    def _publish(self):
+        now = self.clock()
+        status = self.zone_status.get()
+        env = self.temperature_history.latest(self.env_key)
+        if status.get("running"):
+            env = status.get("target_temp")
+        self.snapshot.publish({
+            name: self._estimate(name, key, env, now) for name, key in self.food.items()
+        })
+
+    def _estimate(self, name, key, env, now):
+        fit = self.fits[name]
+        temp = self.temperature_history.latest(key)
+        done_temp = self.done_temps[name]
+        estimate = {
+            "done_temp": done_temp,
+            "temp": temp,
+            "environment_temp": env,
+            "fits": fit.fits,
+            "k_per_min": None if fit.k is None else fit.k * 60.0,
+            "eta_s": None,
+            "eta_low_s": None,
+            "eta_high_s": None,
+            "done_at": None,
+        }
+        if temp is None or env is None:
+            return {**estimate, "status": STATUS_NO_READING}
+        if temp >= done_temp:
+            return {
+                **estimate,
+                "status": STATUS_DONE,
+                "eta_s": 0.0,
+                "eta_low_s": 0.0,
+                "eta_high_s": 0.0,
+            }
+        if env <= done_temp:
+            return {**estimate, "status": STATUS_UNREACHABLE}
+        k = fit.k
+        if fit.fits < MIN_FITS or k is None or k <= 0:
+            return {**estimate, "status": STATUS_FITTING}
+        spread = CONFIDENCE_Z * (fit.k_stderr or 0.0)
+        eta = time_to_reach(temp, env, done_temp, k)
+        return {
+            **estimate,
+            "status": STATUS_ESTIMATING,
+            "eta_s": eta,
+            # A faster k finishes sooner; a band reaching k <= 0 has no upper end
+            "eta_low_s": time_to_reach(temp, env, done_temp, k + spread),
+            "eta_high_s": time_to_reach(temp, env, done_temp, k - spread),
+            "done_at": now + eta,
+        }
+
+
+def _average(a, b):
+    if a is None or b is None:
+        return a if b is None else b
+    return (a + b) / 2
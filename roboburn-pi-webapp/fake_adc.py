@@ -0,0 +1,43 @@
+"""Stand-ins for the ADS1115 driver objects, for running the sampling code off-Pi."""
+
+import random
+
+
+class FakeADS1115:
+    """Accepts the same configuration attributes as the Adafruit ``ADS1115``."""
+
+    def __init__(self, i2c=None, gain=1, data_rate=128):
+        self.i2c = i2c
+        self.gain = gain
+        self.data_rate = data_rate
+        self.conversions = 0
+
+
+class FakeAnalogIn:
+    """``AnalogIn`` look-alike returning a settable voltage plus Gaussian noise.
+
+    ``voltage_fn`` (if given) is called on every read to produce the noiseless
+    voltage, which lets a simulation drive the reading; otherwise
+    ``base_voltage`` is used. ``glitch_rate`` injects occasional full-scale
+    spikes to exercise the outlier filtering.
+    """
+
+    def __init__(self, ads, pin, base_voltage=1.65, noise=0.0, glitch_rate=0.0,
+                 voltage_fn=None, rng=None):
+        self.ads = ads
+        self.pin = pin
+        self.base_voltage = base_voltage
+        self.noise = noise
+        self.glitch_rate = glitch_rate
+        self.voltage_fn = voltage_fn
+        self.rng = rng or random.Random()
+
+    @property
+    def voltage(self):
+        self.ads.conversions += 1
+        if self.glitch_rate and self.rng.random() < self.glitch_rate:
+            return 4.096
+        base = self.voltage_fn() if self.voltage_fn is not None else self.base_voltage
+        if self.noise:
+            base += self.rng.gauss(0.0, self.noise)
+        return base
@@ -0,0 +1,162 @@
+"""Hardware backends: the Pi's ADS1115s and relays, or a simulated fryer.
+
+A backend opens the probes' ADC channels (``open_adc(probes)`` returning
+``(boards, channels)``, see :class:`sampling.AdcSampler`) and the burner's
+stage relays (``open_relay(pin)`` returning an object with ``on()`` and
+``off()``). The app picks one by name (``ROBOBURN_HARDWARE``) and nothing
+hardware-specific is imported until it is opened: the Blinka and gpiozero
+stack is slow to import on a Pi Zero and missing everywhere else, and the
+simulator is not needed on the Pi.
+"""
+
+import threading
+import time
+
+BACKEND_PI = "pi"
+BACKEND_SIM = "sim"
+BACKENDS = (BACKEND_PI, BACKEND_SIM)
+
+
+def open_ads1115(probes):
+    """Open every ADS1115 on the Pi's I2C bus that ``probes`` use.
+
+    ``probes`` are :class:`channels.Probe` objects. Returns ``(boards,
+    channels)``, with one ``AnalogIn`` per probe name.
+    """
+    import adafruit_ads1x15.ads1115 as ADS
+    import board
+    import busio
+    from adafruit_ads1x15.analog_in import AnalogIn
+
+    i2c = busio.I2C(board.SCL, board.SDA)
+    pins = (ADS.P0, ADS.P1, ADS.P2, ADS.P3)
+
+    boards = {}
+    channels = {}
+    for probe in probes:
+        ads = boards.get(probe.address)
+        if ads is None:
+            # Create the ADS object and specify the gain
+            ads = boards[probe.address] = ADS.ADS1115(i2c, address=probe.address)
+            ads.gain = 1
+        channels[probe.name] = AnalogIn(ads, pins[probe.input])
+    return list(boards.values()), channels
+
+
+def open_relay(pin):
+    """Burner stage relay on a GPIO pin (active high, starts off)."""
+    from gpiozero import OutputDevice
+
+    return OutputDevice(pin, active_high=True, initial_value=False)
+
+
+class PiBackend:
+    """The real rig: ADS1115s on I2C and relays on GPIO."""
+
+    name = BACKEND_PI
+
+    def open_adc(self, probes):
+        return open_ads1115(probes)
+
+    def open_relay(self, pin):
+        return open_relay(pin)
+
+
+class SimBackend:
+    """The simulator's thermal model of the fryer, advanced in real time.
+
+    For running the whole app on a dev box: the primary zone's probe reads
+    the simulated oil and its relays fire the simulated burner, every other
+    probe reads the turkey probe (in the air until a load goes in) and other
+    zones' relays heat nothing, as in :class:`simulation.Simulation`. The
+    plant is advanced to ``clock()`` on every read and every relay switch.
+    """
+
+    name = BACKEND_SIM
+
+    def __init__(
+        self,
+        channels,
+        calibration,
+        plant=None,
+        noise=0.002,
+        seed=None,
+        clock=time.monotonic,
+    ):
+        from simulation import ThermalPlant
+
+        self.channels = channels
+        self.calibration = calibration
+        self.plant = plant if plant is not None else ThermalPlant()
+        self.noise = noise
+        self.seed = seed
+        self.clock = clock
+        self.relays = {}
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _advance(self):
+        with self._lock:
+            now = self.clock()
+            if now > self._last:
+                self.plant.advance(now - self._last)
+                self._last = now
+
+    def _voltage(self, attr):
+        from simulation import thermistor_voltage
+
+        def voltage():
+            self._advance()
+            return thermistor_voltage(self.calibration, getattr(self.plant, attr))
+        return voltage
+
+    def open_adc(self, probes):
+        import random
+
+        from fake_adc import FakeADS1115, FakeAnalogIn
+
+        rng = random.Random(self.seed)
+        oil = self.channels.primary.probe.name
+        boards = {}
+        channels = {}
+        for probe in probes:
+            ads = boards.setdefault(probe.address, FakeADS1115())
+            channels[probe.name] = FakeAnalogIn(
+                ads,
+                probe.input,
+                noise=self.noise,
+                rng=rng,
+                voltage_fn=self._voltage(
+                    "oil_probe" if probe.name == oil else "turkey_probe"
+                ),
+            )
+        return list(boards.values()), channels
+
+    def open_relay(self, pin):
+        from simulation import FakeRelay
+
+        relay = self.relays[pin] = FakeRelay(pin, on_change=self._relays_changed)
+        return relay
+
+    def _relays_changed(self):
+        from controllers import applied_stage
+
+        # Bring the plant up to now before the stage changes
+        self._advance()
+        primary = self.channels.primary
+        s1 = self.relays.get(primary.stage1_pin)
+        s2 = self.relays.get(primary.stage2_pin)
+        self.plant.set_stage(
+            applied_stage(s1 is not None and s1.value, s2 is not None and s2.value)
+        )
+
+
+def open_backend(name, channels, calibration):
+    """The backend called ``name``; raises ``ValueError`` for an unknown one."""
+    if name == BACKEND_PI:
+        return PiBackend()
+    if name == BACKEND_SIM:
+        return SimBackend(channels, calibration)
+    raise ValueError(
+        f"Unknown hardware backend {name!r} (expected one of {', '.join(BACKENDS)})"
+    )
@@ -0,0 +1,271 @@
+"""Columnar, array-backed ring buffer for the raw 1 Hz temperature history."""
+
+import bisect
+import math
+import os
+import time
+from array import array
+
+NAN = float("nan")
+
+
+def _nan_if_none(value):
+    return NAN if value is None else value
+
+
+class HistoryBuffer:
+    """Fixed-capacity ring of samples stored as one ``array('d')`` per column.
+
+    Each column is allocated at twice the capacity and every value is written
+    to both ``i`` and ``i + capacity``. The live window is therefore always a
+    contiguous run of the array, which lets :meth:`column` hand out zero-copy
+    ``memoryview`` slices (and lets ``bisect`` search the time column directly)
+    without ever unrolling the ring.
+
+    Entries go in and come out as dicts keyed by column name, so callers that
+    used the old ``deque`` of dicts keep working. Missing/``None`` values are
+    stored as NaN and returned as ``None``.
+
+    Appends must be serialized by the caller, but readers need no lock: every
+    append bumps a sequence counter before and after writing (a seqlock), and
+    the entry-returning reads retry if an append overlapped them. Values are
+    converted before the counter is bumped and it is bumped back in a
+    ``finally``, so a bad value raises without leaving readers spinning.
+    """
+
+    def __init__(self, capacity, columns, time_column="time"):
+        if capacity < 1:
+            raise ValueError("HistoryBuffer capacity must be at least 1.")
+        if time_column not in columns:
+            raise ValueError(f"Columns must include the time column {time_column!r}.")
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self.time_column = time_column
+        self._arrays = {
+            name: array("d", [NAN]) * (2 * capacity) for name in self.columns
+        }
+        self._cursor = 0  # next write slot in [0, capacity)
+        self._count = 0
+        self._seq = 0  # odd while an append is in progress
+
+    def __len__(self):
+        return self._count
+
+    def _start(self):
+        return (self._cursor - self._count) % self.capacity
+
+    def append(self, entry):
+        """Append one sample; columns absent from ``entry`` are stored as NaN."""
+        row = array("d", [_nan_if_none(entry.get(name)) for name in self.columns])
+        cursor = self._cursor
+        mirror = cursor + self.capacity
+        self._seq += 1
+        try:
+            for values, value in zip(self._arrays.values(), row):
+                values[cursor] = value
+                values[mirror] = value
+            self._cursor = (cursor + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+        finally:
+            self._seq += 1
+
+    def extend(self, columns):
+        """Append many samples at once, given as one equal-length list per column.
+
+        Equivalent to :meth:`append` per sample (missing columns and ``None``
+        values are stored as NaN), but each column is written with at most
+        two slice assignments per wrap of the ring.
+        """
+        n = len(columns[self.time_column])
+        capacity = self.capacity
+        first = max(0, n - capacity)  # older samples would be overwritten anyway
+        converted = {}
+        for name in self.columns:
+            column = columns.get(name)
+            if column is None:
+                converted[name] = array("d", [NAN]) * (n - first)
+            else:
+                converted[name] = array("d", [_nan_if_none(v) for v in column[first:n]])
+        n -= first
+        pos = 0
+        self._seq += 1
+        try:
+            while pos < n:
+                cursor = self._cursor
+                take = min(n - pos, capacity - cursor)
+                for name, values in self._arrays.items():
+                    chunk = converted[name][pos:pos + take]
+                    values[cursor:cursor + take] = chunk
+                    values[cursor + capacity:cursor + capacity + take] = chunk
+                self._cursor = (cursor + take) % capacity
+                self._count = min(capacity, self._count + take)
+                pos += take
+        finally:
+            self._seq += 1
+
+    def clear(self):
+        self._seq += 1
+        try:
+            self._cursor = 0
+            self._count = 0
+        finally:
+            self._seq += 1
+
+    def _consistent(self, read, *args):
+        """Run ``read`` until it completes without an append overlapping it."""
+        while True:
+            seq = self._seq
+            if not seq & 1:
+                result = read(*args)
+                if self._seq == seq:
+                    return result
+            time.sleep(0)  # yield so the writer can finish
+
+    def stamp(self):
+        """``(len, newest time)``, read together; changes with every append."""
+        return self._consistent(self._stamp)
+
+    def _stamp(self):
+        return self._count, self._latest(self.time_column, None)
+
+    def _entry_at(self, offset):
+        # offset is relative to the oldest live sample
+        pos = self._start() + offset
+        entry = {}
+        for name, values in self._arrays.items():
+            value = values[pos]
+            entry[name] = None if math.isnan(value) else value
+        return entry
+
+    def __getitem__(self, index):
+        return self._consistent(self._getitem, index)
+
+    def _getitem(self, index):
+        if isinstance(index, slice):
+            return [self._entry_at(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("HistoryBuffer index out of range")
+        return self._entry_at(index)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def latest(self, name, default=None):
+        """Most recent value of a single column without building an entry dict."""
+        return self._consistent(self._latest, name, default)
+
+    def _latest(self, name, default):
+        if not self._count:
+            return default
+        value = self._arrays[name][self._start() + self._count - 1]
+        return default if math.isnan(value) else value
+
+    def column(self, name, start=0, stop=None):
+        """Zero-copy view of one column over live offsets ``[start, stop)``.
+
+        Oldest first. The view aliases the ring, so it is only stable while
+        writers are held off (e.g. under the lock that serializes
+        :meth:`append`).
+        """
+        if stop is None or stop > self._count:
+            stop = self._count
+        base = self._start()
+        return memoryview(self._arrays[name])[base + start : base + max(start, stop)]
+
+    def view(self, start=0, stop=None):
+        """Zero-copy views of every column, keyed by column name."""
+        return {name: self.column(name, start, stop) for name in self.columns}
+
+    def index_at(self, timestamp):
+        """Offset of the first sample with time >= ``timestamp``."""
+        return bisect.bisect_left(self.column(self.time_column), timestamp)
+
+    def since(self, timestamp):
+        """Entries strictly newer than ``timestamp``."""
+        return self._consistent(self._since, timestamp)
+
+    def _since(self, timestamp):
+        start = bisect.bisect_right(self.column(self.time_column), timestamp)
+        return [self._entry_at(i) for i in range(start, self._count)]
+
+    def between(self, start_time=None, end_time=None):
+        """Entries with ``start_time <= time < end_time`` (either bound optional)."""
+        return self._consistent(self._between, start_time, end_time)
+
+    def _between(self, start_time, end_time):
+        start = 0 if start_time is None else self.index_at(start_time)
+        stop = self._count if end_time is None else self.index_at(end_time)
+        return [self._entry_at(i) for i in range(start, stop)]
+
+
+def _rss_bytes():
+    """Resident set size of this process (Linux only, else None)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _benchmark(capacity=3600, repeats=5):
+    """Memory and per-append cost of an hour of samples against the deque of dicts."""
+    import gc
+    import random
+    import tracemalloc
+    from collections import deque
+
+    from channels import default_registry
+
+    columns = default_registry().history_columns()
+    rng = random.Random(0)
+    samples = [
+        {
+            name: 1e12 + i * 1000.0 if name == "time" else rng.uniform(0, 200)
+            for name in columns
+        }
+        for i in range(capacity)
+    ]
+
+    def fill_deque():
+        history = deque(maxlen=capacity)
+        for sample in samples:
+            # The worker appended a fresh copy of temperature_data every second
+            history.append(dict(sample))
+        return history
+
+    def fill_buffer():
+        history = HistoryBuffer(capacity, columns)
+        for sample in samples:
+            history.append(sample)
+        return history
+
+    print(f"{capacity} samples of {len(columns)} columns")
+    print(f"{'store':<16}{'held':>10}{'RSS delta':>12}{'append':>10}")
+    for label, fill in (("HistoryBuffer", fill_buffer), ("deque of dicts", fill_deque)):
+        gc.collect()
+        rss_before = _rss_bytes()
+        tracemalloc.start()
+        held = fill()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rss_after = _rss_bytes()
+        rss = "-"
+        if rss_before is not None:
+            rss = f"{(rss_after - rss_before) / 1024:.0f} KiB"
+        best = None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fill()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        per_sample_us = best / capacity * 1e6
+        print(f"{label:<16}{size / 1024:>7.0f} KiB{rss:>12}{per_sample_us:>8.2f}us")
+        del held
+
+
+if __name__ == "__main__":
+    _benchmark()
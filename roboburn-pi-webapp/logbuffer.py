@@ -0,0 +1,210 @@
+"""Structured in-memory log ring for the web UI's log window.
+
+Records are kept as plain fields (sequence id, time, level, source and the
+unformatted message) and only turned into text when a client reads them,
+so a busy worker never pays for formatting lines nobody fetches. Routine
+lines and warnings/errors live in separate rings, so the PID line every ten
+seconds cannot push an error out of view. A record identical to one logged
+within ``coalesce_s`` is folded into it with a repeat count instead of
+taking another line, which keeps a one-per-second ADC error during an outage
+to a single, counting entry.
+"""
+
+import heapq
+import logging
+import operator
+import threading
+import time
+from collections import deque
+
+
+class LogEntry:
+    """One (possibly coalesced) log line.
+
+    ``id`` is the sequence number the entry was first logged with; ``seq``
+    moves up every time a repeat is folded in, so clients that read
+    ``after=`` their last ``seq`` see the updated count and can replace the
+    line they already show by ``id``.
+    """
+
+    __slots__ = (
+        "id",
+        "seq",
+        "created",
+        "last",
+        "levelno",
+        "levelname",
+        "source",
+        "msg",
+        "args",
+        "count",
+    )
+
+    def __init__(self, seq, record):
+        self.id = seq
+        self.seq = seq
+        self.created = record.created
+        self.last = record.created
+        self.levelno = record.levelno
+        self.levelname = record.levelname
+        self.source = record.module
+        self.msg = record.msg
+        self.args = record.args
+        self.count = 1
+
+    def key(self):
+        args = self.args
+        if isinstance(args, tuple):
+            # Exceptions compare by identity; the same error again still folds
+            args = tuple(
+                (type(a), a.args) if isinstance(a, BaseException) else a for a in args
+            )
+        return self.levelno, self.source, self.msg, args
+
+
+# Every field of an entry, copied out under the lock
+_ROW = operator.attrgetter(*LogEntry.__slots__)
+
+
+def format_time(timestamp):
+    """Same shape as ``logging``'s default asctime: ``2024-01-01 12:00:00,123``."""
+    return (
+        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+        + f",{int(timestamp % 1 * 1000):03d}"
+    )
+
+
+class LogBuffer:
+    """Thread-safe rings of :class:`LogEntry`, read incrementally by sequence id."""
+
+    def __init__(
+        self,
+        capacity=100,
+        important_capacity=100,
+        important_level=logging.WARNING,
+        coalesce_s=60.0,
+    ):
+        self.capacity = capacity
+        self.important_capacity = important_capacity
+        self.important_level = important_level
+        self.coalesce_s = coalesce_s
+        self._routine = deque()
+        self._important = deque()
+        self._recent = {}  # key() -> entry, for coalescing
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def append(self, record):
+        """Add a record; returns the entry it was stored in or folded into."""
+        with self._lock:
+            self._seq += 1
+            entry = LogEntry(self._seq, record)
+            ring = (
+                self._important
+                if entry.levelno >= self.important_level
+                else self._routine
+            )
+            key = entry.key()
+            try:
+                previous = self._recent.get(key)
+            except TypeError:
+                key = previous = None  # unhashable args are never coalesced
+            if previous is not None and entry.created - previous.last > self.coalesce_s:
+                previous = None  # too old to fold into; this starts a new line
+            if previous is not None:
+                # Move the coalesced entry to the tail so rings stay ordered by seq
+                try:
+                    ring.remove(previous)
+                except ValueError:
+                    previous = None  # already evicted
+            if previous is not None:
+                previous.seq = entry.seq
+                previous.last = entry.created
+                previous.count += 1
+                entry = previous
+            elif key is not None:
+                self._recent[key] = entry
+            ring.append(entry)
+            limit = (
+                self.important_capacity if ring is self._important else self.capacity
+            )
+            if len(ring) > limit:
+                evicted = ring.popleft()
+                try:
+                    if self._recent.get(evicted.key()) is evicted:
+                        del self._recent[evicted.key()]
+                except TypeError:
+                    pass
+            return entry
+
+    def entries(self, after=None, min_level=logging.NOTSET):
+        """Entries with ``seq > after`` and at least ``min_level``, oldest first.
+
+        Each is returned as a dict, formatted outside the lock.
+        """
+        with self._lock:
+            merged = heapq.merge(self._routine, self._important, key=lambda e: e.seq)
+            rows = [
+                _ROW(e)
+                for e in merged
+                if (after is None or e.seq > after) and e.levelno >= min_level
+            ]
+        # Formatting happens outside the lock, and only for what was asked for
+        out = []
+        for row in rows:
+            entry_id, seq, created, last, _, levelname, source, msg, args, count = row
+            message = _message(msg, args)
+            text = f"{format_time(created)} - {levelname} - {message}"
+            if count > 1:
+                text += f" (x{count}, last {format_time(last)[11:19]})"
+            out.append({
+                "id": entry_id,
+                "seq": seq,
+                "time": created,
+                "last_time": last,
+                "level": levelname,
+                "source": source,
+                "message": message,
+                "count": count,
+                "text": text,
+            })
+        return out
+
+
+def _message(msg, args):
+    msg = str(msg)
+    if args:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = f"{msg} {args!r}"
+    return msg
+
+
+class LogBufferHandler(logging.Handler):
+    """``logging`` handler that stores records in a :class:`LogBuffer`."""
+
+    def __init__(self, buffer, notifier=None, topic=None):
+        super().__init__()
+        self.buffer = buffer
+        self.notifier = notifier
+        self.topic = topic
+
+    def emit(self, record):
+        if record.exc_info:
+            # Keep the traceback text; the record's exc_info is not kept
+            msg = (
+                record.getMessage()
+                + "\n"
+                + logging.Formatter().formatException(record.exc_info)
+            )
+            record = logging.makeLogRecord(
+                {**record.__dict__, "msg": msg, "args": None, "exc_info": None}
+            )
+        self.buffer.append(record)
+        if self.notifier is not None:
+            self.notifier.notify(self.topic)
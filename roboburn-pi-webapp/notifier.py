@@ -0,0 +1,43 @@
+"""Change notification shared by the background workers and the push endpoints."""
+
+import threading
+
+TOPIC_TEMPERATURE = "temperature"
+TOPIC_STATUS = "status"
+TOPIC_LOGS = "logs"
+TOPICS = (TOPIC_TEMPERATURE, TOPIC_STATUS, TOPIC_LOGS)
+
+
+class UpdateNotifier:
+    """Per-topic version counters guarded by a condition variable.
+
+    Producers call :meth:`notify` after changing shared state; consumers call
+    :meth:`wait` with the versions they last saw and are woken as soon as any
+    topic moves on, instead of polling on a timer.
+    """
+
+    def __init__(self, topics=TOPICS):
+        self._condition = threading.Condition()
+        self._versions = {topic: 0 for topic in topics}
+
+    def notify(self, topic):
+        with self._condition:
+            self._versions[topic] += 1
+            self._condition.notify_all()
+
+    def versions(self):
+        with self._condition:
+            return dict(self._versions)
+
+    def wait(self, seen, timeout=None):
+        """Block until some topic's version differs from ``seen`` or ``timeout`` passes.
+
+        Returns a copy of the current versions; topics missing from ``seen``
+        count as changed.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: any(seen.get(t) != v for t, v in self._versions.items()),
+                timeout,
+            )
+            return dict(self._versions)
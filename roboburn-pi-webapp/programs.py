@@ -0,0 +1,532 @@
+"""Cook programs: ramp-and-soak profiles that drive a zone's target and run state.
+
+A program is a list of steps, each with a ``target`` (C) and optionally:
+
+- ``ramp_c_per_min``: move the setpoint towards the target at this rate
+  instead of jumping to it;
+- ``hold_s``: once the zone's probe reaches the target, hold it this long
+  (a soak or a mash rest);
+- ``until``: ``{"probe": name, "above" | "below": C}``, end the step once
+  that probe crosses the threshold (e.g. the turkey reaching 74 C).
+
+A step with neither ``hold_s`` nor ``until`` ends as soon as the target is
+reached. After the last step the zone is stopped (``"finish": "stop"``, the
+default) or left holding the last target (``"finish": "hold"``). So "hold at
+135 C until the turkey probe hits 74 C, then cut the burner" is::
+
+    {"steps": [{"target": 135, "until": {"probe": "turkey", "above": 74}}]}
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+from notifier import TOPIC_STATUS
+
+FINISH_STOP = "stop"
+FINISH_HOLD = "hold"
+FINISHES = (FINISH_STOP, FINISH_HOLD)
+
+PHASE_RUNNING = "running"
+PHASE_PAUSED = "paused"
+PHASE_DONE = "done"
+PHASE_STOPPED = "stopped"
+ACTIVE_PHASES = (PHASE_RUNNING, PHASE_PAUSED)
+
+MAX_STEPS = 64
+# The probe counts as at the target within this band (approached from the
+# ramp's side), which starts the step's hold timer
+REACHED_BAND_C = 1.0
+# Ramps write the target rounded to this many decimals, so a slow ramp
+# updates the status (and the session log) every few ticks, not every tick
+SETPOINT_DECIMALS = 1
+# A longer gap between ticks (a stalled scheduler) is not credited to ramps or holds
+MAX_TICK_S = 5.0
+
+
+def _number(value, what):
+    if (
+        isinstance(value, bool)
+        or not isinstance(value, (int, float))
+        or not math.isfinite(value)
+    ):
+        raise ValueError(f"{what} must be a number")
+    return float(value)
+
+
+def validate_program(definition, channels):
+    """Normalized copy of a program definition; raises ``ValueError`` if it is unusable.
+
+    ``channels`` (a :class:`channels.ChannelRegistry`) resolves ``until``
+    probes and the optional ``zone`` the program is meant for.
+    """
+    if not isinstance(definition, dict):
+        raise ValueError("A program must be an object")
+    steps = definition.get("steps")
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("A program needs a non-empty list of steps")
+    if len(steps) > MAX_STEPS:
+        raise ValueError(f"A program can have at most {MAX_STEPS} steps")
+    finish = definition.get("finish", FINISH_STOP)
+    if finish not in FINISHES:
+        raise ValueError(f"finish must be one of {', '.join(FINISHES)}")
+    zone = definition.get("zone")
+    if zone is not None and zone not in channels.zones:
+        raise ValueError(f"Unknown zone '{zone}'")
+
+    normalized = []
+    for i, step in enumerate(steps, 1):
+        if not isinstance(step, dict):
+            raise ValueError(f"Step {i} must be an object")
+        out = {"target": _number(step.get("target"), f"Step {i} target")}
+        if step.get("ramp_c_per_min") is not None:
+            out["ramp_c_per_min"] = _number(
+                step["ramp_c_per_min"], f"Step {i} ramp_c_per_min"
+            )
+            if out["ramp_c_per_min"] <= 0:
+                raise ValueError(f"Step {i} ramp_c_per_min must be positive")
+        if step.get("hold_s") is not None:
+            out["hold_s"] = _number(step["hold_s"], f"Step {i} hold_s")
+            if out["hold_s"] < 0:
+                raise ValueError(f"Step {i} hold_s cannot be negative")
+        until = step.get("until")
+        if until is not None:
+            if (
+                not isinstance(until, dict)
+                or until.get("probe") not in channels.by_name
+            ):
+                raise ValueError(f"Step {i} until needs a known probe")
+            directions = [
+                key for key in ("above", "below") if until.get(key) is not None
+            ]
+            if len(directions) != 1:
+                raise ValueError(f"Step {i} until needs exactly one of above/below")
+            out["until"] = {
+                "probe": until["probe"],
+                directions[0]: _number(
+                    until[directions[0]], f"Step {i} until {directions[0]}"
+                ),
+            }
+        if step.get("label") is not None:
+            out["label"] = str(step["label"])
+        normalized.append(out)
+    program = {"steps": normalized, "finish": finish}
+    if zone is not None:
+        program["zone"] = zone
+    if definition.get("description") is not None:
+        program["description"] = str(definition["description"])
+    return program
+
+
+class ProgramRunner:
+    """Runs cook programs, at most one per zone, from a scheduled :meth:`step`.
+
+    While a program runs it owns its zone's target: every tick it writes the
+    current (ramped) setpoint into the zone's ``zone_status`` cell, records
+    target and run changes in the session log through ``recorder`` and
+    wakes status listeners through ``notifier``. If the zone stops for any
+    other reason (the STOP button, a lost ADC) the program pauses rather than
+    restarting the burner behind the user's back.
+
+    The program library and every run's position are saved to ``path`` on
+    every change and at least every ``save_interval_s`` while a hold counts
+    down, so a restart loses at most that much soak time. Like the burner,
+    a run that was active comes back paused; :meth:`resume` continues it
+    from the same step. Handlers and the scheduler thread share the state
+    under a lock.
+    """
+
+    def __init__(
+        self,
+        channels,
+        zone_status,
+        temperature_history,
+        notifier,
+        recorder,
+        path=None,
+        save_interval_s=60.0,
+        logger=None,
+        clock=time.time,
+    ):
+        self.channels = channels
+        self.zone_status = zone_status
+        self.temperature_history = temperature_history
+        self.notifier = notifier
+        self.recorder = recorder
+        self.path = path
+        self.save_interval_s = save_interval_s
+        self.logger = logger
+        self.clock = clock
+        self.programs = {}
+        self.runs = {}  # zone name -> run state dict
+        self.save_error = None
+        self.last_save = clock()
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- persistence ---
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(saved, dict):
+            self._log("error", "Ignoring %s: not a JSON object", self.path)
+            return
+        for name, definition in (saved.get("programs") or {}).items():
+            try:
+                self.programs[name] = validate_program(definition, self.channels)
+            except ValueError as e:
+                self._log("error", "Dropping saved program '%s': %s", name, e)
+        for zone, run in (saved.get("runs") or {}).items():
+            if zone not in self.channels.zones or run.get("program_def") is None:
+                continue
+            if run.get("phase") == PHASE_RUNNING:
+                # The burner always comes back stopped, so the program waits too
+                run["phase"] = PHASE_PAUSED
+                run["reason"] = "restart"
+                self._log(
+                    "info",
+                    "%sProgram '%s' paused at step %d by the restart;"
+                    " resume it through /program.",
+                    self._label(zone),
+                    run["program"],
+                    run["step"] + 1,
+                )
+            run["last_tick"] = None
+            self.runs[zone] = run
+
+    def _save(self, now):
+        if self.path is None:
+            return
+        self.last_save = now
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"programs": self.programs, "runs": self.runs}, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self.save_error = None
+        except OSError as e:
+            # Never let a full or read-only card stop the program
+            self.save_error = str(e)
+
+    def _log(self, level, msg, *args):
+        if self.logger is not None:
+            getattr(self.logger, level)(msg, *args)
+
+    # --- library ---
+
+    def put(self, name, definition):
+        """Create or replace a program; returns the normalized definition."""
+        program = validate_program(definition, self.channels)
+        with self._lock:
+            self.programs[name] = program
+            self._save(self.clock())
+        return program
+
+    def delete(self, name):
+        """Remove a program; returns False if there was none.
+
+        Raises ``ValueError`` while a zone is running (or has paused) it.
+        """
+        with self._lock:
+            for run in self.runs.values():
+                if run["program"] == name and run["phase"] in ACTIVE_PHASES:
+                    raise ValueError(f"Program '{name}' is running on {run['zone']}")
+            if self.programs.pop(name, None) is None:
+                return False
+            self._save(self.clock())
+            return True
+
+    # --- runs ---
+
+    def start(self, name, zone=None):
+        """Start program ``name`` on ``zone`` (its own ``zone``, else the primary one).
+
+        Raises ``KeyError`` for an unknown program and ``ValueError`` if that
+        zone already has an active run. Starting also starts the zone.
+        """
+        with self._lock:
+            program = self.programs[name]
+            zone = zone or program.get("zone") or self.channels.primary.name
+            if zone not in self.channels.zones:
+                raise ValueError(f"Unknown zone '{zone}'")
+            run = self.runs.get(zone)
+            if run is not None and run["phase"] in ACTIVE_PHASES:
+                raise ValueError(
+                    f"Zone '{zone}' is already running program '{run['program']}'"
+                )
+            now = self.clock()
+            setpoint = self.zone_status[zone].get()["target_temp"]
+            self.runs[zone] = {
+                "program": name,
+                # A copy, so editing the library cannot change a run
+                "program_def": program,
+                "zone": zone,
+                "phase": PHASE_RUNNING,
+                "reason": None,
+                "started_at": now,
+                "finished_at": None,
+                "last_tick": None,
+                "step": 0,
+                "step_started_at": now,
+                "step_start_setpoint": setpoint,
+                "setpoint": setpoint,
+                "reached_at": None,
+                "held_s": 0.0,
+            }
+            self._enter_step(self.runs[zone], 0, now, log=False)
+            self._set_running(zone, True, now)
+            self._save(now)
+        self._log("info", "%sProgram '%s' started.", self._label(zone), name)
+        return zone
+
+    def stop(self, zone):
+        """End the zone's run, leaving the burner as it is; False if none was active."""
+        with self._lock:
+            run = self.runs.get(zone)
+            if run is None or run["phase"] not in ACTIVE_PHASES:
+                return False
+            self._finish(run, PHASE_STOPPED, "by request", self.clock())
+        self._log(
+            "info", "%sProgram '%s' stopped.", self._label(zone), run["program"]
+        )
+        return True
+
+    def pause(self, zone, reason="by request"):
+        """Pause the run and stop the zone; False if it was not running."""
+        with self._lock:
+            run = self.runs.get(zone)
+            if run is None or run["phase"] != PHASE_RUNNING:
+                return False
+            now = self.clock()
+            self._pause(run, reason, now)
+            self._set_running(zone, False, now)
+        return True
+
+    def resume(self, zone):
+        """Continue a paused run from its step and start the zone.
+
+        Returns False if none was paused.
+        """
+        with self._lock:
+            run = self.runs.get(zone)
+            if run is None or run["phase"] != PHASE_PAUSED:
+                return False
+            now = self.clock()
+            run["phase"] = PHASE_RUNNING
+            run["reason"] = None
+            run["last_tick"] = None
+            self._set_running(zone, True, now)
+            self._save(now)
+        self._log(
+            "info",
+            "%sProgram '%s' resumed at step %d.",
+            self._label(zone),
+            run["program"],
+            run["step"] + 1,
+        )
+        return True
+
+    def _label(self, zone):
+        return "" if zone == self.channels.primary.name else f"{zone}: "
+
+    def _pause(self, run, reason, now):
+        run["phase"] = PHASE_PAUSED
+        run["reason"] = reason
+        run["last_tick"] = None
+        self._save(now)
+        self._log(
+            "info",
+            "%sProgram '%s' paused (%s).",
+            self._label(run["zone"]),
+            run["program"],
+            reason,
+        )
+
+    def _finish(self, run, phase, reason, now):
+        run["phase"] = phase
+        run["reason"] = reason
+        run["finished_at"] = now
+        self._save(now)
+
+    def _set_running(self, zone, running, now):
+        cell = self.zone_status[zone]
+        if cell.get()["running"] == running:
+            return
+        cell.update({"running": running})
+        self.recorder.record_running(
+            now * 1000, running, self.channels.zones[zone].index
+        )
+        self.notifier.notify(TOPIC_STATUS)
+
+    def _set_target(self, zone, target, now):
+        cell = self.zone_status[zone]
+        if cell.get()["target_temp"] == target:
+            return
+        cell.update({"target_temp": target})
+        self.recorder.record_target(now * 1000, target, self.channels.zones[zone].index)
+        self.notifier.notify(TOPIC_STATUS)
+
+    def _enter_step(self, run, index, now, log=True):
+        run["step"] = index
+        run["step_started_at"] = now
+        run["step_start_setpoint"] = run["setpoint"]
+        run["reached_at"] = None
+        run["held_s"] = 0.0
+        step = run["program_def"]["steps"][index]
+        if "ramp_c_per_min" not in step:
+            run["setpoint"] = step["target"]
+        self._set_target(run["zone"], run["setpoint"], now)
+        if log:
+            self._log(
+                "info",
+                "%sProgram '%s': step %d/%d to %.1f C",
+                self._label(run["zone"]),
+                run["program"],
+                index + 1,
+                len(run["program_def"]["steps"]),
+                step["target"],
+            )
+
+    def _latest(self, probe_name):
+        value = self.temperature_history.latest(
+            self.channels.by_name[probe_name].temp_key
+        )
+        return None if value is None or math.isnan(value) else value
+
+    def _step_done(self, run, step):
+        until = step.get("until")
+        if until is not None:
+            value = self._latest(until["probe"])
+            if value is None:
+                return False
+            met = (
+                value >= until["above"] if "above" in until else value <= until["below"]
+            )
+            if met or "hold_s" not in step:
+                return met
+        if "hold_s" in step:
+            return run["held_s"] >= step["hold_s"]
+        return run["reached_at"] is not None
+
+    def step(self):
+        """Advance every running program by one tick."""
+        with self._lock:
+            now = self.clock()
+            changed = False
+            for zone, run in self.runs.items():
+                if run["phase"] == PHASE_RUNNING:
+                    changed = self._tick(zone, run, now) or changed
+            if changed or (
+                any(run["phase"] == PHASE_RUNNING for run in self.runs.values())
+                and now - self.last_save >= self.save_interval_s
+            ):
+                self._save(now)
+
+    def _tick(self, zone, run, now):
+        """One tick of one running program.
+
+        Returns True if it moved to another step or phase.
+        """
+        if not self.zone_status[zone].get()["running"]:
+            self._pause(run, "zone stopped", now)
+            return True
+        dt = (
+            0.0
+            if run["last_tick"] is None
+            else min(max(now - run["last_tick"], 0.0), MAX_TICK_S)
+        )
+        run["last_tick"] = now
+        steps = run["program_def"]["steps"]
+        step = steps[run["step"]]
+        target = step["target"]
+
+        # Ramp the setpoint towards the step target
+        setpoint = run["setpoint"]
+        if setpoint != target:
+            rate = step.get("ramp_c_per_min")
+            move = (rate / 60.0) * dt if rate is not None else math.inf
+            exact = (
+                target
+                if abs(target - setpoint) <= move
+                else setpoint + math.copysign(move, target - setpoint)
+            )
+            run["setpoint"] = exact
+            self._set_target(
+                zone,
+                target if exact == target else round(exact, SETPOINT_DECIMALS),
+                now,
+            )
+
+        # Hold timers only count once the probe is at the (fully ramped) target
+        temp = self._latest(self.channels.zones[zone].probe.name)
+        if run["reached_at"] is None and run["setpoint"] == target and temp is not None:
+            start = run["step_start_setpoint"]
+            if target > start:
+                reached = temp >= target - REACHED_BAND_C
+            elif target < start:
+                reached = temp <= target + REACHED_BAND_C
+            else:
+                reached = abs(temp - target) <= REACHED_BAND_C
+            if reached:
+                run["reached_at"] = now
+        elif run["reached_at"] is not None:
+            run["held_s"] += dt
+
+        if not self._step_done(run, step):
+            return False
+        if run["step"] + 1 < len(steps):
+            self._enter_step(run, run["step"] + 1, now)
+            return True
+        finish = run["program_def"]["finish"]
+        self._finish(run, PHASE_DONE, None, now)
+        if finish == FINISH_STOP:
+            self._set_running(zone, False, now)
+            outcome = "burner stopped"
+        else:
+            outcome = f"holding {target:.1f} C"
+        self._log(
+            "info",
+            "%sProgram '%s' finished, %s.",
+            self._label(zone),
+            run["program"],
+            outcome,
+        )
+        return True
+
+    def state(self):
+        with self._lock:
+            now = self.clock()
+            runs = {}
+            for zone, run in self.runs.items():
+                steps = run["program_def"]["steps"]
+                step = steps[run["step"]]
+                hold = step.get("hold_s")
+                runs[zone] = {
+                    **{
+                        key: value
+                        for key, value in run.items()
+                        if key not in ("program_def", "last_tick")
+                    },
+                    "steps": len(steps),
+                    "current": step,
+                    "hold_remaining_s": None
+                    if hold is None
+                    else max(0.0, hold - run["held_s"]),
+                    "elapsed_s": (run["finished_at"] or now) - run["started_at"],
+                }
+            return {
+                "programs": dict(self.programs),
+                "runs": runs,
+                "save_error": self.save_error,
+            }
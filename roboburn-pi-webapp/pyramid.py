@@ -0,0 +1,367 @@
+"""Multi-resolution temperature history for charting any time range.
+
+The fixed decimation windows can only answer "the last N hours" at their
+own resolution. The pyramid keeps the whole retention period at every
+power-of-two bucket width (``base_s``, ``2 * base_s``, ``4 * base_s`` ...),
+with the min, mean and max of each key per bucket, so a range query picks
+the finest level that fits the point budget and returns at most that many
+buckets. Buckets are aligned to multiples of their width, so every bucket
+of a level is exactly two of the level below. Each level holds
+``retention / width`` buckets, so the whole pyramid is about twice the size
+of its finest level.
+"""
+
+import bisect
+import math
+import time
+
+from decimation import DecimationAccumulator
+from history_buffer import HistoryBuffer
+from metrics import NULL_REGISTRY
+
+BASE_S = 2
+LEVELS = 10
+RETENTION_S = 24 * 60 * 60
+
+MIN_SUFFIX = "_min"
+MAX_SUFFIX = "_max"
+
+
+def pyramid_columns(keys, time_key="time"):
+    """Columns of a pyramid entry: the time, then each key's mean, min and max."""
+    columns = [time_key]
+    for key in keys:
+        columns.extend((key, key + MIN_SUFFIX, key + MAX_SUFFIX))
+    return tuple(columns)
+
+
+class _Level(DecimationAccumulator):
+    """One level: the running sums of its open bucket and a ring of closed ones.
+
+    Unlike a decimation window, a bucket closes when a sample lands in the
+    next aligned slot rather than a fixed time after the last emission. A
+    sample from a slot before the open bucket's is dropped: its bucket is
+    already closed, and opening it again would put the ring out of order.
+    """
+
+    def __init__(self, width_s, retention_s, keys, time_key):
+        super().__init__(width_s, keys, extremes=True)
+        self.width_ms = width_s * 1000
+        self.time_key = time_key
+        self.slot = None
+        self.buffer = HistoryBuffer(
+            math.ceil(retention_s / width_s) + 1,
+            pyramid_columns(self.keys, time_key),
+            time_key,
+        )
+
+    def add(self, entry):
+        slot = entry[self.time_key] // self.width_ms
+        if self.slot is not None and slot < self.slot:
+            return
+        if slot != self.slot:
+            self.close()
+            self.slot = slot
+        super().add(entry)
+
+    def close(self):
+        if self.count:
+            self.buffer.append(self.summary())
+            self._reset()
+
+    def summary(self):
+        """Entry of the open bucket (None if it is empty)."""
+        if not self.count:
+            return None
+        entry = {self.time_key: self.time_sum / self.count}
+        for key in self.keys:
+            count = self.counts[key]
+            entry[key] = self.sums[key] / count if count else None
+            entry[key + MIN_SUFFIX] = self.mins[key]
+            entry[key + MAX_SUFFIX] = self.maxs[key]
+        return entry
+
+    def load(self, buckets):
+        """Fill an empty level from :func:`_buckets` or :func:`_merge` output.
+
+        The newest bucket stays open.
+        """
+        if not buckets:
+            return
+        *closed, last = buckets
+        columns = {
+            self.time_key: [time_sum / count for _, count, time_sum, _ in closed]
+        }
+        for i, key in enumerate(self.keys):
+            stats = [bucket[3][i] for bucket in closed]
+            columns[key] = [total / n if n else None for n, total, _, _ in stats]
+            columns[key + MIN_SUFFIX] = [low for _, _, low, _ in stats]
+            columns[key + MAX_SUFFIX] = [high for _, _, _, high in stats]
+        self.buffer.extend(columns)
+        self.slot, self.count, self.time_sum, stats = last
+        for key, (n, total, low, high) in zip(self.keys, stats):
+            self.counts[key] = n
+            self.sums[key] = total
+            self.mins[key] = low
+            self.maxs[key] = high
+
+    def buckets(self, start_time, end_time):
+        """Upper bound on the buckets between two times."""
+        return int(end_time // self.width_ms - start_time // self.width_ms) + 1
+
+
+def _buckets(times, values, keys, width_ms):
+    """``(slot, count, time_sum, [(count, sum, min, max) per key])`` per aligned slot.
+
+    Only the slot boundaries are found in a Python loop; sums and extremes
+    are taken over list slices, as in :meth:`DecimationAccumulator.replay`.
+    """
+    buckets = []
+    columns = [values[key] for key in keys]
+    start = 0
+    n = len(times)
+    while start < n:
+        slot = times[start] // width_ms
+        stop = bisect.bisect_left(times, (slot + 1) * width_ms, start)
+        stats = []
+        for column in columns:
+            chunk = column[start:stop]
+            total = sum(chunk)
+            if total != total:
+                # NaN: the log holds gaps where this probe had no reading
+                chunk = [value for value in chunk if value == value]
+                total = sum(chunk)
+            if chunk:
+                stats.append((len(chunk), total, min(chunk), max(chunk)))
+            else:
+                stats.append((0, 0.0, None, None))
+        buckets.append((slot, stop - start, sum(times[start:stop]), stats))
+        start = stop
+    return buckets
+
+
+def _merge(buckets):
+    """The buckets of the next level up.
+
+    Neighbours sharing a slot at twice the width are combined.
+    """
+    merged = []
+    for slot, count, time_sum, stats in buckets:
+        slot //= 2
+        if merged and merged[-1][0] == slot:
+            _, merged_count, merged_time_sum, merged_stats = merged[-1]
+            merged[-1] = (
+                slot,
+                merged_count + count,
+                merged_time_sum + time_sum,
+                [_combine(a, b) for a, b in zip(merged_stats, stats)],
+            )
+        else:
+            merged.append((slot, count, time_sum, stats))
+    return merged
+
+
+def _combine(a, b):
+    if not a[0]:
+        return b
+    if not b[0]:
+        return a
+    return (a[0] + b[0], a[1] + b[1], min(a[2], b[2]), max(a[3], b[3]))
+
+
+class HistoryPyramid:
+    """Power-of-two pyramid of ``keys`` fed from ``temperature_history``.
+
+    :meth:`step` runs after each sample and folds the newest entry into every
+    level (O(levels) per sample). Only the scheduler thread writes; readers
+    need no lock, as :meth:`query` retries if a sample was folded in while it
+    was reading (the same seqlock as :class:`history_buffer.HistoryBuffer`).
+    """
+
+    def __init__(self, temperature_history, keys, base_s=BASE_S, levels=LEVELS,
+                 retention_s=RETENTION_S, time_key="time", metrics=NULL_REGISTRY):
+        self.temperature_history = temperature_history
+        self.keys = tuple(keys)
+        self.time_key = time_key
+        self.retention_ms = retention_s * 1000
+        self.columns = pyramid_columns(self.keys, time_key)
+        self.levels = [
+            _Level(base_s * 2**i, retention_s, self.keys, time_key)
+            for i in range(levels)
+        ]
+        self.pass_time = metrics.histogram(
+            "roboburn_pyramid_seconds", "Folding one sample into every pyramid level"
+        )
+        self._oldest = None
+        self._newest = None
+        self._seq = 0  # odd while a sample is being folded in
+
+    def step(self):
+        """Fold in the newest sample; returns False if it was already folded in."""
+        if not len(self.temperature_history):
+            return False
+        entry = self.temperature_history[-1]
+        if entry[self.time_key] == self._newest:
+            return False
+        with self.pass_time.time():
+            self.add(entry)
+        return True
+
+    def add(self, entry):
+        timestamp = entry[self.time_key]
+        if self._newest is not None and timestamp <= self._newest:
+            return
+        self._seq += 1
+        for level in self.levels:
+            level.add(entry)
+        if self._oldest is None:
+            self._oldest = timestamp
+        self._newest = timestamp
+        self._seq += 1
+
+    def replay(self, times, values):
+        """Fill an empty pyramid from recorded samples.
+
+        ``times`` are in ms and ``values`` maps each key to a list aligned
+        with them, NaN where a probe had no reading.
+
+        The finest level is aggregated from slices of the samples and every
+        coarser one from the level below, so a day of history loads in a
+        fraction of the time it takes to :meth:`add` it.
+        """
+        if self._newest is not None:
+            raise ValueError("Only an empty pyramid can be replayed into")
+        # Older samples would only be overwritten in every level
+        first = bisect.bisect_left(times, times[-1] - self.retention_ms) if times else 0
+        if first >= len(times):
+            return
+        times = times[first:]
+        values = {key: values[key][first:] for key in self.keys}
+        self._seq += 1
+        buckets = _buckets(times, values, self.keys, self.levels[0].width_ms)
+        for i, level in enumerate(self.levels):
+            if i:
+                buckets = _merge(buckets)
+            level.load(buckets)
+        if self._oldest is None:
+            self._oldest = times[0]
+        self._newest = times[-1]
+        self._seq += 1
+
+    def query(self, start_time=None, end_time=None, count=None):
+        """``(interval_s, entries)`` between ``start_time`` and ``end_time``.
+
+        Both are in ms and either is optional. The level is the finest with at
+        most ``count`` buckets in the range (the finest overall without a
+        ``count``). If even the coarsest has more, its entries are returned
+        and left to the caller to thin out.
+        """
+        while True:
+            seq = self._seq
+            if not seq & 1:
+                result = self._query(start_time, end_time, count)
+                if self._seq == seq:
+                    return result
+            time.sleep(0)  # yield so the writer can finish
+
+    def _query(self, start_time, end_time, count):
+        if self._newest is None:
+            return self.levels[0].interval, []
+        low = max(self._oldest, self._newest - self.retention_ms)
+        high = self._newest
+        if start_time is not None:
+            low = max(low, start_time)
+        if end_time is not None:
+            high = min(high, end_time)
+        level = self.levels[-1]
+        if count is None:
+            level = self.levels[0]
+        elif high >= low:
+            level = next(
+                (lv for lv in self.levels if lv.buckets(low, high) <= count), level
+            )
+        entries = level.buffer.between(start_time, end_time)
+        # The open bucket holds the newest samples; it is served as it stands
+        open_bucket = level.summary()
+        if open_bucket is not None:
+            timestamp = open_bucket[self.time_key]
+            if (start_time is None or timestamp >= start_time) and (
+                end_time is None or timestamp < end_time
+            ):
+                entries.append(open_bucket)
+        return level.interval, entries
+
+    def stats(self):
+        """Bucket width, stored buckets and capacity per level."""
+        return [
+            {
+                "interval_s": level.interval,
+                "buckets": len(level.buffer),
+                "capacity": level.buffer.capacity,
+            }
+            for level in self.levels
+        ]
+
+
+def _benchmark():
+    """Per-sample cost, replay of a 24 h log and query time.
+
+    Query times are compared against the fixed windows.
+    """
+    import random
+
+    from channels import default_registry
+
+    registry = default_registry()
+    keys = registry.temp_keys
+    rng = random.Random(0)
+    now = time.time() * 1000
+    times = [now - (RETENTION_S - i) * 1000.0 for i in range(RETENTION_S)]
+    values = {
+        key: [
+            150 + 30 * math.sin(i / 3000) + rng.gauss(0, 0.3) for i in range(len(times))
+        ]
+        for key in keys
+    }
+
+    history = HistoryBuffer(4, ("time",) + tuple(keys))
+    pyramid = HistoryPyramid(history, keys)
+    started = time.perf_counter()
+    pyramid.replay(
+        times[:-3600], {key: column[:-3600] for key, column in values.items()}
+    )
+    replay_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(len(times) - 3600, len(times)):
+        pyramid.add({"time": times[i], **{key: values[key][i] for key in keys}})
+    add_us = (time.perf_counter() - started) / 3600 * 1e6
+    buckets = sum(len(level.buffer) for level in pyramid.levels)
+    print(
+        f"replayed 23 h in {replay_s * 1e3:.0f} ms,"
+        f" then {add_us:.1f} us per live sample"
+    )
+    print(f"{buckets} buckets in {len(pyramid.levels)} levels, "
+          f"{buckets * len(pyramid.columns) * 16 / 1e6:.1f} MB of arrays")
+
+    print(f"{'range':<24}{'count':>6}{'level':>8}{'points':>8}{'query':>10}")
+    for label, start, end in (
+        ("24 h", None, None),
+        ("last 8 h", now - 8 * 3600e3, None),
+        ("1:10-1:20 of the cook", times[0] + 70 * 60e3, times[0] + 80 * 60e3),
+        ("last 5 min", now - 300e3, None),
+    ):
+        for count in (200, 800):
+            best = None
+            for _ in range(20):
+                started = time.perf_counter()
+                interval, entries = pyramid.query(start, end, count)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            print(
+                f"{label:<24}{count:>6}{interval:>7}s{len(entries):>8}"
+                f"{best * 1e3:>8.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    _benchmark()
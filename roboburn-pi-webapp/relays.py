@@ -0,0 +1,276 @@
+"""Per-relay duty-cycle and wear accounting with a start budget.
+
+Every burner start costs an ignition cycle on the gas valve and the
+ignition controller, so the accounting counts starts (off -> on) against an
+optional ``max_starts`` per rolling ``window_s``. The burner worker asks
+:meth:`RelayAccounting.allow_on` before switching a stage on; switching off
+is never refused, so the budget can only ever leave the burner off.
+
+By default the budget is a plain rolling count. With ``paced`` it is
+spread out instead, starts at least ``window_s / max_starts`` apart: a
+chattering controller then cannot use the whole hour's budget in minutes and
+leave the oil cooling with the burner locked out until the window rolls
+over, but every burner cycle is stretched to that spacing, so pacing is
+opt-in.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class RelayAccount:
+    """Counters for one relay: session totals, rolling window and lifetime.
+
+    A watchdog trip records its forced off from the watchdog thread while
+    the control task may be reading the stats, so both go through a lock.
+    """
+
+    def __init__(self, name, window_s, started_at, lifetime=None):
+        lifetime = lifetime or {}
+        self.name = name
+        self.window_s = window_s
+        self.started_at = started_at
+        self.on = False
+        self.on_since = None
+        self.on_time_s = 0.0  # completed on-periods this session
+        self.toggles = 0
+        self.starts = 0
+        self.last_start = None
+        self.deferred = 0  # control steps a start was held back
+        self.lifetime_toggles = int(lifetime.get("toggles", 0))
+        self.lifetime_starts = int(lifetime.get("starts", 0))
+        self.lifetime_on_s = float(lifetime.get("on_s", 0.0))
+        # (time, on) for every switch inside the window, oldest first
+        self.events = deque()
+        self.on_at_window_start = False
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        horizon = now - self.window_s
+        events = self.events
+        while events and events[0][0] < horizon:
+            self.on_at_window_start = events.popleft()[1]
+
+    def record(self, on, now):
+        with self._lock:
+            self._record(on, now)
+
+    def _record(self, on, now):
+        if on == self.on:
+            return
+        self._expire(now)
+        self.on = on
+        self.toggles += 1
+        self.lifetime_toggles += 1
+        if on:
+            self.on_since = now
+            self.last_start = now
+            self.starts += 1
+            self.lifetime_starts += 1
+        else:
+            period = now - self.on_since
+            self.on_time_s += period
+            self.lifetime_on_s += period
+            self.on_since = None
+        self.events.append((now, on))
+
+    def starts_in_window(self, now):
+        with self._lock:
+            self._expire(now)
+            return sum(1 for _, on in self.events if on)
+
+    def _window_on_time(self, now):
+        start = max(now - self.window_s, self.started_at)
+        on, since, total = self.on_at_window_start, start, 0.0
+        for t, state in self.events:
+            if on:
+                total += max(0.0, t - since)
+            on, since = state, max(t, start)
+        if on:
+            total += now - since
+        return total, now - start
+
+    def stats(self, now, max_starts):
+        with self._lock:
+            return self._stats(now, max_starts)
+
+    def _stats(self, now, max_starts):
+        self._expire(now)
+        current = now - self.on_since if self.on else 0.0
+        elapsed = now - self.started_at
+        window_on, window_length = self._window_on_time(now)
+        starts = sum(1 for _, on in self.events if on)
+        hours = min(self.window_s, max(elapsed, 1.0)) / 3600.0
+        remaining = None if max_starts is None else max(0, max_starts - starts)
+        return {
+            "on": self.on,
+            "on_time_s": self.on_time_s + current,
+            "duty_cycle": (self.on_time_s + current) / elapsed if elapsed > 0 else 0.0,
+            "toggles": self.toggles,
+            "starts": self.starts,
+            "deferred_start_steps": self.deferred,
+            "window": {
+                "seconds": self.window_s,
+                "toggles": len(self.events),
+                "starts": starts,
+                "duty_cycle": window_on / window_length if window_length > 0 else 0.0,
+                "toggles_per_hour": len(self.events) / hours,
+                "starts_remaining": remaining,
+            },
+            "lifetime": {
+                "toggles": self.lifetime_toggles,
+                "starts": self.lifetime_starts,
+                "on_hours": (self.lifetime_on_s + current) / 3600.0,
+            },
+        }
+
+    def lifetime(self, now):
+        with self._lock:
+            current = now - self.on_since if self.on else 0.0
+            return {
+                "toggles": self.lifetime_toggles,
+                "starts": self.lifetime_starts,
+                "on_s": self.lifetime_on_s + current,
+            }
+
+
+class AccountedRelay:
+    """Wraps a relay (``on()``/``off()``) so every switch is recorded.
+
+    A relay that can refuse to switch on (one with an ``is_on`` attribute,
+    like :class:`watchdog.InterlockedRelay`) is only counted as started when
+    it actually did.
+    """
+
+    def __init__(self, relay, account, clock):
+        self.relay = relay
+        self.account = account
+        self.clock = clock
+
+    def on(self):
+        self.relay.on()
+        if getattr(self.relay, "is_on", True):
+            self.account.record(True, self.clock())
+
+    def off(self):
+        self.relay.off()
+        self.account.record(False, self.clock())
+
+
+class RelayAccounting:
+    """Accounts for a set of named relays and enforces the start budget.
+
+    Switching and :meth:`publish` happen on the control task (a watchdog
+    trip also switches off from its own thread); the stats go
+    out through ``snapshot`` (a :class:`snapshot.SnapshotCell`) so HTTP
+    handlers read them without locking. Lifetime counters are loaded from
+    ``path`` and written back at most every ``save_interval_s`` (and by
+    :meth:`save`), so an SD card is not written on every switch.
+    """
+
+    def __init__(
+        self,
+        names,
+        window_s=3600.0,
+        max_starts=None,
+        paced=False,
+        path=None,
+        save_interval_s=300.0,
+        snapshot=None,
+        clock=time.time,
+    ):
+        self.window_s = window_s
+        self.max_starts = max_starts
+        self.min_start_spacing_s = (
+            window_s / max_starts if paced and max_starts else None
+        )
+        self.path = path
+        self.save_interval_s = save_interval_s
+        self.snapshot = snapshot
+        self.clock = clock
+        now = clock()
+        saved = self._load()
+        self.accounts = {
+            name: RelayAccount(name, window_s, now, saved.get(name)) for name in names
+        }
+        self.last_save = now
+        self.save_error = None
+        self.publish(now)
+
+    def _load(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            return saved if isinstance(saved, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def wrap(self, name, relay):
+        return AccountedRelay(relay, self.accounts[name], self.clock)
+
+    def allow_on(self, name, now):
+        """Whether ``name`` may start now.
+
+        Every refusal (one per control step) is counted.
+        """
+        if self.max_starts is None:
+            return True
+        account = self.accounts[name]
+        spacing = self.min_start_spacing_s
+        spaced = (
+            spacing is None
+            or account.last_start is None
+            or now - account.last_start >= spacing
+        )
+        if spaced and account.starts_in_window(now) < self.max_starts:
+            return True
+        account.deferred += 1
+        return False
+
+    def stats(self, now=None):
+        now = self.clock() if now is None else now
+        return {
+            "max_starts": self.max_starts,
+            "window_s": self.window_s,
+            "min_start_spacing_s": self.min_start_spacing_s,
+            "save_error": self.save_error,
+            "relays": {
+                name: account.stats(now, self.max_starts)
+                for name, account in self.accounts.items()
+            },
+        }
+
+    def publish(self, now=None):
+        """Publish current stats to ``snapshot`` and save lifetime counters when due."""
+        now = self.clock() if now is None else now
+        if self.snapshot is not None:
+            self.snapshot.publish(self.stats(now))
+        if self.path is not None and now - self.last_save >= self.save_interval_s:
+            try:
+                self.save(now)
+            except OSError as e:
+                # Never let a full or read-only card stop the control step
+                self.save_error = str(e)
+
+    def save(self, now=None):
+        if self.path is None:
+            return
+        now = self.clock() if now is None else now
+        self.last_save = now
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {name: a.lifetime(now) for name, a in self.accounts.items()},
+                f,
+                indent=2,
+            )
+        os.replace(tmp_path, self.path)
+        self.save_error = None
@@ -0,0 +1,124 @@
+"""Oversampled, filtered multi-channel reads from the ADS1115."""
+
+import math
+
+FILTER_MEDIAN = "median"
+FILTER_TRIMMED_MEAN = "trimmed_mean"
+FILTERS = (FILTER_MEDIAN, FILTER_TRIMMED_MEAN)
+
+# ADS1115 single-shot data rates (samples per second)
+ADS1115_DATA_RATES = (8, 16, 32, 64, 128, 250, 475, 860)
+
+# Smoothing factor for the running noise estimate
+NOISE_EWMA_ALPHA = 0.1
+
+
+def median(values):
+    ordered = sorted(values)
+    n = len(ordered)
+    mid = n // 2
+    if n % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2.0
+
+
+def trimmed_mean(values, trim_fraction=0.25):
+    """Mean after dropping ``trim_fraction`` of the samples from each end."""
+    ordered = sorted(values)
+    k = int(len(ordered) * trim_fraction)
+    kept = ordered[k : len(ordered) - k] or ordered
+    return sum(kept) / len(kept)
+
+
+class ChannelStats:
+    """Noise statistics for one channel, refreshed every tick."""
+
+    def __init__(self):
+        self.value = None
+        self.stddev = 0.0
+        self.spread = 0.0
+        self.noise_ewma = None
+        self.samples = 0
+        self.failures = 0
+
+    def update(self, raw, value):
+        n = len(raw)
+        mean = sum(raw) / n
+        self.stddev = math.sqrt(sum((v - mean) ** 2 for v in raw) / n)
+        self.spread = max(raw) - min(raw)
+        self.value = value
+        self.samples = n
+        if self.noise_ewma is None:
+            self.noise_ewma = self.stddev
+        else:
+            self.noise_ewma += NOISE_EWMA_ALPHA * (self.stddev - self.noise_ewma)
+
+    def as_dict(self):
+        return {
+            "voltage": self.value,
+            "stddev": self.stddev,
+            "spread": self.spread,
+            "noise_ewma": self.noise_ewma,
+            "samples": self.samples,
+            "failures": self.failures,
+        }
+
+
+class AdcSampler:
+    """Reads every channel ``oversample`` times per tick and filters the burst.
+
+    ``channels`` maps a name to an ``AnalogIn``-like object exposing
+    ``.voltage``; ``boards`` are the ADS1115s they sit on, which all get the
+    same ``data_rate``. Raising the ADS1115 data rate keeps a burst of N single-shot
+    conversions per channel well inside the 1 s publication period, while the
+    median / trimmed mean rejects the occasional I2C glitch or spike that a
+    single raw read would pass straight to the PID.
+    """
+
+    def __init__(self, boards, channels, oversample=8, filter_name=FILTER_MEDIAN,
+                 trim_fraction=0.25, data_rate=None):
+        if filter_name not in FILTERS:
+            raise ValueError(f"Unknown ADC filter: {filter_name}")
+        if oversample < 1:
+            raise ValueError("ADC oversample count must be at least 1.")
+        if data_rate is not None:
+            if data_rate not in ADS1115_DATA_RATES:
+                raise ValueError(f"Unsupported ADS1115 data rate: {data_rate}")
+            for ads in boards:
+                ads.data_rate = data_rate
+        self.boards = tuple(boards)
+        self.channels = dict(channels)
+        self.oversample = oversample
+        self.filter_name = filter_name
+        self.trim_fraction = trim_fraction
+        self.channel_stats = {name: ChannelStats() for name in self.channels}
+
+    def _filter(self, raw):
+        if self.filter_name == FILTER_MEDIAN:
+            return median(raw)
+        return trimmed_mean(raw, self.trim_fraction)
+
+    def read_channel(self, name):
+        """Oversample and filter one channel; raises if the whole burst failed."""
+        channel = self.channels[name]
+        stats = self.channel_stats[name]
+        raw = []
+        error = None
+        for _ in range(self.oversample):
+            try:
+                raw.append(channel.voltage)
+            except Exception as e:  # I2C errors: OSError, ValueError, RuntimeError
+                stats.failures += 1
+                error = e
+        if not raw:
+            raise error
+        value = self._filter(raw)
+        stats.update(raw, value)
+        return value
+
+    def sample(self):
+        """Filtered voltage for every channel, keyed by channel name."""
+        return {name: self.read_channel(name) for name in self.channels}
+
+    def stats(self):
+        return {name: stats.as_dict() for name, stats in self.channel_stats.items()}
@@ -0,0 +1,134 @@
+"""Monotonic-clock task scheduler for the sampling, decimation and control steps."""
+
+import threading
+import time
+
+# Smoothing factor for the running mean jitter
+JITTER_EWMA_ALPHA = 0.1
+
+
+class ScheduledTask:
+    """A step function plus its deadline bookkeeping and timing statistics.
+
+    A task either runs on a fixed ``period`` (deadlines advance by exactly one
+    period, so they do not drift), is chained ``after`` another task and runs
+    right after it completes, or both: a chained task with a period also runs
+    on its own if its trigger has not fired for a full period.
+    """
+
+    def __init__(self, name, func, period=None, after=None):
+        if period is None and after is None:
+            raise ValueError(f"Task {name!r} needs a period, a trigger, or both.")
+        self.name = name
+        self.func = func
+        self.period = period
+        self.after = after
+        self.next_deadline = None
+        self.runs = 0
+        self.triggered_runs = 0
+        self.overruns = 0
+        self.errors = 0
+        self.last_jitter = 0.0
+        self.max_jitter = 0.0
+        self.mean_jitter = 0.0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+
+    def as_dict(self):
+        return {
+            "period": self.period,
+            "after": self.after,
+            "runs": self.runs,
+            "triggered_runs": self.triggered_runs,
+            "overruns": self.overruns,
+            "errors": self.errors,
+            "last_jitter_s": self.last_jitter,
+            "max_jitter_s": self.max_jitter,
+            "mean_jitter_s": self.mean_jitter,
+            "last_duration_s": self.last_duration,
+            "max_duration_s": self.max_duration,
+        }
+
+
+class Scheduler:
+    """Runs registered tasks on one thread against a monotonic clock.
+
+    Jitter is how late a periodic task started relative to its deadline; an
+    overrun is a deadline that was missed entirely (the task was still busy or
+    the loop was blocked for more than a period) and is skipped rather than
+    run late in a burst.
+    """
+
+    def __init__(self, logger, clock=time.monotonic, sleep=time.sleep):
+        self.logger = logger
+        self.clock = clock
+        self.sleep = sleep
+        self.tasks = {}
+        self._stats_lock = threading.Lock()
+
+    def add_task(self, name, func, period=None, after=None):
+        if after is not None and after not in self.tasks:
+            raise ValueError(f"Task {name!r} is chained after unknown task {after!r}.")
+        task = ScheduledTask(name, func, period, after)
+        self.tasks[name] = task
+        return task
+
+    def _run(self, task, deadline, triggered=False):
+        start = self.clock()
+        jitter = max(0.0, start - deadline)
+        try:
+            task.func()
+        except Exception as e:
+            task.errors += 1
+            self.logger.error("Scheduled task %s failed: %s", task.name, e)
+        end = self.clock()
+        with self._stats_lock:
+            task.runs += 1
+            if triggered:
+                task.triggered_runs += 1
+            task.last_jitter = jitter
+            task.max_jitter = max(task.max_jitter, jitter)
+            task.mean_jitter += JITTER_EWMA_ALPHA * (jitter - task.mean_jitter)
+            task.last_duration = end - start
+            task.max_duration = max(task.max_duration, task.last_duration)
+        if task.period is not None:
+            # A triggered run also pushes back the task's own fallback deadline
+            base = end if triggered else deadline
+            task.next_deadline = base + task.period
+        # Chained tasks run immediately after their trigger, in registration order
+        for dependent in self.tasks.values():
+            if dependent.after == task.name:
+                self._run(dependent, end, triggered=True)
+
+    def run_pending(self):
+        """Run every periodic task whose deadline has passed; returns the next one."""
+        now = self.clock()
+        for task in list(self.tasks.values()):
+            if task.period is None:
+                continue
+            if task.next_deadline is None:
+                task.next_deadline = now if task.after is None else now + task.period
+            if now < task.next_deadline:
+                continue
+            deadline = task.next_deadline
+            missed = int((now - deadline) // task.period)
+            if missed:
+                with self._stats_lock:
+                    task.overruns += missed
+                deadline += missed * task.period
+            self._run(task, deadline)
+        deadlines = [
+            t.next_deadline for t in self.tasks.values() if t.next_deadline is not None
+        ]
+        return min(deadlines) if deadlines else now
+
+    def run_forever(self, stop_event=None):
+        while stop_event is None or not stop_event.is_set():
+            next_deadline = self.run_pending()
+            delay = next_deadline - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+
+    def stats(self):
+        with self._stats_lock:
+            return {name: task.as_dict() for name, task in self.tasks.items()}
@@ -0,0 +1,349 @@
+"""Append-only binary log of a cook, replayable at startup via mmap.
+
+File layout: a fixed ``HEADER_SIZE`` header (magic + JSON metadata, NUL
+padded) followed by fixed-width little-endian records. Every record is a
+type byte, 7 pad bytes, the timestamp in ms and one double per sample column,
+so the body can be viewed as a flat array of doubles with a constant stride.
+Non-sample records reuse the value slots and leave the rest as NaN.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC = b"RBSESS1\0"
+HEADER_SIZE = 1024
+SESSION_SUFFIX = ".rbs"
+
+RECORD_SAMPLE = 1
+RECORD_STAGE = 2  # values: requested stage, stage1 on, stage2 on[, zone]
+RECORD_TARGET = 3  # values: target temperature (C)[, zone]
+RECORD_RUNNING = 4  # values: 1.0 running / 0.0 stopped[, zone]
+# Position of the optional zone index in each event's values. Events of the
+# primary zone (index 0) leave it out, so single-zone logs are unchanged.
+_ZONE_SLOT = {RECORD_STAGE: 3, RECORD_TARGET: 1, RECORD_RUNNING: 1}
+
+NAN = float("nan")
+
+
+def _record_struct(n_values):
+    return struct.Struct("<B7x" + "d" * (1 + n_values))
+
+
+def read_header(path):
+    """Return the metadata dict stored in a session file's header."""
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+        raise ValueError(f"{path} is not a session log")
+    return json.loads(header[len(MAGIC):].rstrip(b"\0").decode("utf-8"))
+
+
+class SessionRecorder:
+    """Batches records in memory and appends them to disk every ``flush_interval`` s.
+
+    Appends are cheap (pack into a bytearray under a lock) and never touch
+    the disk: a writer thread of its own takes the pending bytes every
+    interval and does the write and ``fsync``, so the SD card sees a few
+    large writes and a slow card never stalls sampling or control. Failed
+    writes are retried at the next interval and reported to ``logger``.
+
+    Record times never go backwards in the file (a wall-clock step back is
+    stamped with the newest time written so far), which is what lets
+    readers binary-search it.
+    """
+
+    def __init__(self, path, columns, flush_interval=5.0, logger=None):
+        self.path = path
+        self.columns = tuple(columns)
+        self.flush_interval = flush_interval
+        self.logger = logger
+        self._record = _record_struct(len(self.columns))
+        self._pad = (NAN,) * len(self.columns)
+        self._pending = bytearray()
+        self._last_time = None
+        self._lock = threading.Lock()
+        # Held across a write so batches reach the file in order
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._stop = threading.Event()
+        self._writer = None
+
+    def open(self, start_time_ms=None):
+        """Open the log for appending, writing a header if the file is new."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER_SIZE:
+            if start_time_ms is None:
+                start_time_ms = time.time() * 1000
+            meta = {"columns": list(self.columns), "start": start_time_ms}
+            header = MAGIC + json.dumps(meta).encode("utf-8")
+            if len(header) > HEADER_SIZE:
+                raise ValueError("Session header does not fit; too many columns.")
+            with open(self.path, "wb") as f:
+                f.write(header.ljust(HEADER_SIZE, b"\0"))
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            # Drop a torn trailing record left by a crash mid-write
+            size = os.path.getsize(self.path)
+            excess = (size - HEADER_SIZE) % self._record.size
+            if excess:
+                with open(self.path, "r+b") as f:
+                    f.truncate(size - excess)
+            self._last_time = session_info(self.path)["end"]
+        # Unbuffered, so a failed write leaves nothing behind to go out later
+        self._file = open(self.path, "ab", buffering=0)
+        self._stop.clear()
+        self._writer = threading.Thread(
+            target=self._run, name="session-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                if self.logger is not None:
+                    self.logger.error("Session log write failed, retrying: %s", e)
+
+    def _append(self, kind, time_ms, values):
+        with self._lock:
+            if self._last_time is not None and time_ms < self._last_time:
+                time_ms = self._last_time
+            self._last_time = time_ms
+            self._pending += self._record.pack(kind, time_ms, *values)
+
+    def record_sample(self, entry):
+        values = []
+        for name in self.columns:
+            value = entry.get(name)
+            values.append(NAN if value is None else value)
+        self._append(RECORD_SAMPLE, entry["time"], values)
+
+    def _append_event(self, kind, time_ms, values, zone):
+        if zone:
+            values += (float(zone),)
+        self._append(kind, time_ms, values + self._pad[len(values):])
+
+    def record_stage(self, time_ms, requested_stage, stage1_on, stage2_on, zone=0):
+        values = (float(requested_stage), float(stage1_on), float(stage2_on))
+        self._append_event(RECORD_STAGE, time_ms, values, zone)
+
+    def record_target(self, time_ms, target, zone=0):
+        self._append_event(RECORD_TARGET, time_ms, (float(target),), zone)
+
+    def record_running(self, time_ms, running, zone=0):
+        self._append_event(RECORD_RUNNING, time_ms, (float(running),), zone)
+
+    def flush(self):
+        """Write and fsync everything pending, on the calling thread."""
+        with self._write_lock:
+            if self._file is None:
+                return
+            with self._lock:
+                pending, self._pending = self._pending, bytearray()
+            if not pending:
+                return
+            position = self._file.tell()
+            try:
+                view = memoryview(pending)
+                while view:
+                    view = view[self._file.write(view):]
+                os.fsync(self._file.fileno())
+            except OSError:
+                # Cut off whatever part of the batch got in and keep all of
+                # it ahead of anything appended since, to write again later
+                with self._lock:
+                    self._pending[:0] = pending
+                try:
+                    self._file.truncate(position)
+                except OSError:
+                    pass
+                raise
+
+    def close(self):
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_TIME = struct.Struct("<d")
+
+
+def _bisect_time(mm, record_size, n_records, timestamp):
+    """Index of the first record with time >= ``timestamp``.
+
+    Records are fixed width and :class:`SessionRecorder` never lets their
+    times go backwards, so the file is its own time index: a binary search
+    touches O(log n) pages of the mmap.
+    """
+    lo, hi = 0, n_records
+    while lo < hi:
+        mid = (lo + hi) // 2
+        (mid_time,) = _TIME.unpack_from(mm, HEADER_SIZE + mid * record_size + 8)
+        if mid_time < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def session_info(path):
+    """Summary of a session file without reading its body.
+
+    Returns ``{"start", "end", "records"}``; ``end`` is the newest record's time.
+    """
+    meta = read_header(path)
+    record = _record_struct(len(meta["columns"]))
+    with open(path, "rb") as f:
+        n_records = (os.fstat(f.fileno()).st_size - HEADER_SIZE) // record.size
+        end = None
+        if n_records > 0:
+            f.seek(HEADER_SIZE + (n_records - 1) * record.size + 8)
+            (end,) = _TIME.unpack(f.read(_TIME.size))
+    return {"start": meta.get("start"), "end": end, "records": max(0, n_records)}
+
+
+def list_sessions(directory):
+    """Session ids (file stems) in ``directory`` with their :func:`session_info`.
+
+    Oldest first.
+    """
+    sessions = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return sessions
+    for name in names:
+        if not name.endswith(SESSION_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            info = session_info(path)
+        except (OSError, ValueError):
+            continue
+        info["id"] = name[: -len(SESSION_SUFFIX)]
+        sessions.append(info)
+    sessions.sort(key=lambda info: info["start"] or 0)
+    return sessions
+
+
+class SessionLog:
+    """Read-only, column-oriented view of a session file.
+
+    ``times`` and ``values[column]`` hold the sample records only; ``events``
+    is a list of ``(kind, time_ms, values)`` tuples for every other record.
+    Only records with ``start_time <= time < end_time`` are read: the range is
+    located by binary search and the columns are pulled out with strided
+    memoryview slices over the mmap, so no per-record unpacking happens in
+    Python and the rest of the file is never touched.
+    """
+
+    def __init__(self, path, start_time=None, end_time=None):
+        self.path = path
+        self.meta = read_header(path)
+        self.columns = tuple(self.meta["columns"])
+        self.times = []
+        self.values = {name: [] for name in self.columns}
+        self.events = []
+        self._load(start_time, end_time)
+
+    def _load(self, start_time, end_time):
+        record = _record_struct(len(self.columns))
+        stride = record.size // 8
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            n_records = (size - HEADER_SIZE) // record.size
+            if n_records <= 0:
+                return
+            # Every view must be released before the mmap can close
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                first = (
+                    0
+                    if start_time is None
+                    else _bisect_time(mm, record.size, n_records, start_time)
+                )
+                last = (
+                    n_records
+                    if end_time is None
+                    else _bisect_time(mm, record.size, n_records, end_time)
+                )
+                if last <= first:
+                    return
+                n_records = last - first
+                begin = HEADER_SIZE + first * record.size
+                end = begin + n_records * record.size
+                view = memoryview(mm)
+                with view, view[begin:end] as body, body.cast("d") as doubles:
+                    kinds = body[:: record.size].tobytes()
+                    times = doubles[1::stride].tolist()
+                    columns = [
+                        doubles[2 + k :: stride].tolist()
+                        for k in range(len(self.columns))
+                    ]
+
+        if kinds.count(RECORD_SAMPLE) == n_records:
+            self.times = times
+            self.values = dict(zip(self.columns, columns))
+            return
+        sample_idx = [i for i, kind in enumerate(kinds) if kind == RECORD_SAMPLE]
+        self.times = [times[i] for i in sample_idx]
+        for name, column in zip(self.columns, columns):
+            self.values[name] = [column[i] for i in sample_idx]
+        for i, kind in enumerate(kinds):
+            if kind != RECORD_SAMPLE:
+                values = tuple(
+                    column[i] for column in columns if not math.isnan(column[i])
+                )
+                self.events.append((kind, times[i], values))
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def end_time(self):
+        """Timestamp (ms) of the newest record of any kind, or None if empty."""
+        candidates = []
+        if self.times:
+            candidates.append(self.times[-1])
+        if self.events:
+            candidates.append(self.events[-1][1])
+        return max(candidates) if candidates else None
+
+    def zone_events(self, kind, zone=0):
+        """``(time_ms, values)`` of every ``kind`` event of one zone.
+
+        The zone index is stripped from the values.
+        """
+        slot = _ZONE_SLOT[kind]
+        return [
+            (time_ms, values[:slot])
+            for event_kind, time_ms, values in self.events
+            if event_kind == kind
+            and (values[slot] if len(values) > slot else 0) == zone
+        ]
+
+    def last_event(self, kind, zone=0):
+        events = (
+            self.zone_events(kind, zone)
+            if kind in _ZONE_SLOT
+            else [
+                (time_ms, values)
+                for event_kind, time_ms, values in self.events
+                if event_kind == kind
+            ]
+        )
+        return events[-1] if events else None
@@ -0,0 +1,1077 @@
+"""Closed-loop burner simulation: the real workers driving a thermal model of the fryer.
+
+The temperature and burner workers run unchanged on a :class:`Scheduler`
+whose clock is virtual, with the ADS1115 and the stage relays replaced by
+fakes wired to :class:`ThermalPlant`. Sleeping advances the plant instead of
+waiting, so an 8 hour cook runs in seconds. ``python simulation.py`` runs
+every configuration in :data:`CONFIGURATIONS` through the same scenario and
+prints settling time, overshoot, steady-state error and relay toggles;
+``--probe-scaling`` instead times the per-tick worker cost for 2 to 8 probes,
+``--eta`` checks the cook-completion estimate against the simulated bird,
+``--watchdog`` measures the safety watchdog's trip latency in real time and
+``--contention`` times the running app's burner loop under HTTP load.
+"""
+
+import argparse
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+
+from simple_pid import PID
+
+from autotune import CONTROLLER_AUTOTUNE, DEFAULT_RULE, TUNING_RULES, RelayAutotuner
+from background_workers import BurnerControlWorker, TemperatureWorker
+from channels import (
+    ADS1115_ADDRESSES,
+    ADS1115_INPUTS,
+    ChannelRegistry,
+    Probe,
+    default_registry,
+)
+from controllers import (
+    CONTROLLER_PID,
+    CONTROLLER_PREDICTIVE,
+    PidHysteresisController,
+    PredictiveController,
+    applied_stage,
+)
+from decimation import DecimationAccumulator, HistoryDecimator
+from eta import DEFAULT_DONE_TEMP_C, STATUS_ESTIMATING, EtaPredictor
+from fake_adc import FakeADS1115, FakeAnalogIn
+from hardware import SimBackend
+from history_buffer import HistoryBuffer
+from metrics import NULL_REGISTRY
+from notifier import TOPICS, UpdateNotifier
+from relays import RelayAccounting
+from scheduler import Scheduler
+from session_recorder import RECORD_STAGE, SessionLog
+from snapshot import SnapshotCell
+from thermistor import ThermistorCalibration
+from watchdog import Watchdog
+
+BTU_PER_HOUR_W = 0.29307107
+# Settled means staying within this many degrees of the target; a two-stage
+# burner cycling around the setpoint swings a couple of degrees either way
+SETTLE_BAND_C = 3.0
+
+# Controller configurations compared by the benchmark: controller mode plus
+# PID gains and PredictiveController keyword overrides.
+CONFIGURATIONS = {
+    "pid": {"controller": CONTROLLER_PID},
+    "pid-soft": {"controller": CONTROLLER_PID, "pid_gains": (3.0, 0.02, 30.0)},
+    "predictive": {"controller": CONTROLLER_PREDICTIVE},
+    "predictive-calm": {
+        "controller": CONTROLLER_PREDICTIVE,
+        "predictive": {"toggle_cost": 5000.0},
+    },
+}
+
+
+class VirtualClock:
+    """Shared stand-in for ``time.time`` / ``time.monotonic``; moves only when told."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+
+class LoadEvent:
+    """Food put in the oil at ``time_s``, a lumped mass exchanging heat with it."""
+
+    def __init__(self, time_s, mass_kg=6.0, specific_heat=3500.0, initial_temp=4.0,
+                 transfer_w_per_k=150.0):
+        self.time_s = time_s
+        self.mass_kg = mass_kg
+        self.specific_heat = specific_heat
+        self.initial_temp = initial_temp
+        self.transfer_w_per_k = transfer_w_per_k
+
+
+class ThermalPlant:
+    """Lumped thermal model of the oil pot, its burner and an optional load.
+
+    Oil gains ``efficiency`` of the burner's rated BTU/h for the current
+    stage, delayed by ``dead_time_s`` (flame to oil), loses heat to ambient
+    through ``loss_w_per_k`` and exchanges heat with a dropped-in
+    :class:`LoadEvent`. Each probe reads its body through a first-order lag
+    of ``probe_tau_s``; the turkey probe sits in ambient air until the load
+    goes in. Integration is explicit Euler in steps of at most ``max_step_s``.
+    """
+
+    def __init__(
+        self,
+        oil_mass_kg=17.4,  # 5 gal of peanut oil
+        oil_specific_heat=2000.0,
+        stage_btu=(0.0, 125000.0, 250000.0),
+        efficiency=0.25,
+        loss_w_per_k=20.0,
+        ambient_temp=21.0,
+        dead_time_s=10.0,
+        probe_tau_s=5.0,
+        load=None,
+        max_step_s=0.5,
+    ):
+        self.oil_heat_capacity = oil_mass_kg * oil_specific_heat
+        self.stage_watts = tuple(btu * BTU_PER_HOUR_W * efficiency for btu in stage_btu)
+        self.loss_w_per_k = loss_w_per_k
+        self.ambient_temp = ambient_temp
+        self.dead_time_s = dead_time_s
+        self.probe_tau_s = probe_tau_s
+        self.load = load
+        self.max_step_s = max_step_s
+        self.time = 0.0
+        self.oil_temp = ambient_temp
+        self.load_temp = None
+        self.oil_probe = ambient_temp
+        self.turkey_probe = ambient_temp
+        self.stage = 0
+        # (time, watts) the burner started delivering, for the dead time
+        self._heat_queue = deque([(0.0, 0.0)])
+
+    def set_stage(self, stage):
+        if stage != self.stage:
+            self.stage = stage
+            self._heat_queue.append((self.time, self.stage_watts[stage]))
+
+    def _delayed_heat(self):
+        cutoff = self.time - self.dead_time_s
+        queue = self._heat_queue
+        while len(queue) > 1 and queue[1][0] <= cutoff:
+            queue.popleft()
+        return queue[0][1]
+
+    def advance(self, dt):
+        remaining = dt
+        while remaining > 1e-9:
+            step = min(self.max_step_s, remaining)
+            self._step(step)
+            remaining -= step
+
+    def _step(self, dt):
+        load = self.load
+        if load is not None and self.load_temp is None and self.time >= load.time_s:
+            self.load_temp = load.initial_temp
+        power = self._delayed_heat() - self.loss_w_per_k * (
+            self.oil_temp - self.ambient_temp
+        )
+        if self.load_temp is not None:
+            exchange = load.transfer_w_per_k * (self.oil_temp - self.load_temp)
+            power -= exchange
+            self.load_temp += exchange * dt / (load.mass_kg * load.specific_heat)
+        self.oil_temp += power * dt / self.oil_heat_capacity
+        lag = dt / (self.probe_tau_s + dt)
+        self.oil_probe += (self.oil_temp - self.oil_probe) * lag
+        turkey = self.ambient_temp if self.load_temp is None else self.load_temp
+        self.turkey_probe += (turkey - self.turkey_probe) * lag
+        self.time += dt
+
+
+def thermistor_voltage(calibration, temp_c):
+    """Divider voltage the probe produces at ``temp_c`` (Newton's method on ln R)."""
+    sh_a, sh_b, sh_c = calibration.coefficients
+    target = 1.0 / (temp_c + 273.15)
+    ln_r = (target - sh_a) / sh_b
+    for _ in range(8):
+        f = sh_a + sh_b * ln_r + sh_c * ln_r ** 3 - target
+        ln_r -= f / (sh_b + 3.0 * sh_c * ln_r * ln_r)
+    r = math.exp(ln_r)
+    return calibration.system_voltage * r / (calibration.r_fixed + r)
+
+
+class FakeRelay:
+    """``gpiozero.OutputDevice`` stand-in; counts switching and notifies the plant."""
+
+    def __init__(self, pin, on_change=None):
+        self.pin = pin
+        self.value = 0
+        self.toggles = 0
+        self.on_change = on_change
+
+    def _set(self, value):
+        if value != self.value:
+            self.value = value
+            self.toggles += 1
+            if self.on_change is not None:
+                self.on_change()
+
+    def on(self):
+        self._set(1)
+
+    def off(self):
+        self._set(0)
+
+
+class _NullRecorder:
+    """Session recorder that drops everything."""
+
+    def record_sample(self, entry):
+        pass
+
+    def record_stage(self, time_ms, requested_stage, stage1_on, stage2_on, zone=0):
+        pass
+
+    def record_running(self, time_ms, running, zone=0):
+        pass
+
+
+class SimulationResult:
+    """Sampled trace of one run plus the metrics computed from it."""
+
+    def __init__(
+        self, target_temp, load_time_s, times, oil_temps, stages, toggles, wall_time_s
+    ):
+        self.target_temp = target_temp
+        self.load_time_s = load_time_s
+        self.times = times
+        self.oil_temps = oil_temps
+        self.stages = stages
+        self.toggles = toggles
+        self.wall_time_s = wall_time_s
+
+    def _window(self, start_s, end_s):
+        return [
+            (t, temp) for t, temp in zip(self.times, self.oil_temps)
+            if start_s <= t and (end_s is None or t < end_s)
+        ]
+
+    def settling_time(self, start_s=0.0, end_s=None, band=SETTLE_BAND_C):
+        """Seconds from ``start_s`` until the oil stays within ``band`` of the target.
+
+        None if it never does.
+        """
+        window = self._window(start_s, end_s)
+        settled_at = None
+        for t, temp in window:
+            if abs(temp - self.target_temp) <= band:
+                if settled_at is None:
+                    settled_at = t
+            else:
+                settled_at = None
+        return None if settled_at is None else settled_at - start_s
+
+    def overshoot(self, start_s=0.0, end_s=None):
+        """Largest excursion above the target (C), never negative."""
+        window = self._window(start_s, end_s)
+        return max([0.0] + [temp - self.target_temp for _, temp in window])
+
+    def steady_state_error(self, window_s=1800.0):
+        """Mean absolute error (C) over the last ``window_s`` seconds."""
+        window = self._window(self.times[-1] - window_s, None)
+        return sum(abs(temp - self.target_temp) for _, temp in window) / len(window)
+
+    def metrics(self):
+        load = self.load_time_s
+        return {
+            "settling_s": self.settling_time(0.0, load),
+            "overshoot_c": self.overshoot(0.0, load),
+            "recovery_s": None if load is None else self.settling_time(load),
+            "recovery_overshoot_c": None if load is None else self.overshoot(load),
+            "steady_state_error_c": self.steady_state_error(),
+            "toggles": self.toggles,
+            "wall_time_s": self.wall_time_s,
+        }
+
+
+class Simulation:
+    """One closed-loop run of the real workers against a :class:`ThermalPlant`.
+
+    ``channels`` (a :class:`channels.ChannelRegistry`, the fryer by default)
+    sets the probes and zones. The primary zone's probe reads the oil and
+    its relays drive the plant's burner; every other probe reads the turkey
+    probe, and further zones run their own workers on relays that heat
+    nothing, which is enough to measure what they cost.
+    """
+
+    def __init__(
+        self,
+        plant,
+        controller=CONTROLLER_PID,
+        target_temp=176.7,
+        duration_s=8 * 3600,
+        sample_period=1.0,
+        pid_gains=(5.0, 0.05, 20.0),
+        predictive=None,
+        autotune_rule=DEFAULT_RULE,
+        max_starts=None,
+        paced_starts=False,
+        metrics=NULL_REGISTRY,
+        oversample=8,
+        adc_noise=0.002,
+        seed=0,
+        calibration=None,
+        logger=None,
+        channels=None,
+    ):
+        self.plant = plant
+        self.channels = channels if channels is not None else default_registry()
+        primary = self.channels.primary
+        self.target_temp = target_temp
+        self.duration_s = duration_s
+        self.sample_period = sample_period
+        self.clock = VirtualClock()
+        self.calibration = calibration or ThermistorCalibration()
+        self.adc_noise = adc_noise
+        self.rng = random.Random(seed)
+        self.logger = logger or logging.getLogger("simulation")
+
+        clock = self.clock.time
+        kp, ki, kd = pid_gains
+        self.zone_controllers = {}
+        self.zone_status = {}
+        for zone in self.channels.zones.values():
+            pid = PID(
+                Kp=kp,
+                Ki=ki,
+                Kd=kd,
+                setpoint=target_temp,
+                output_limits=(0, 100),
+                time_fn=clock,
+            )
+            self.zone_controllers[zone.name] = {
+                CONTROLLER_PID: PidHysteresisController(pid),
+                CONTROLLER_PREDICTIVE: PredictiveController(
+                    PidHysteresisController(pid),
+                    sample_period=sample_period,
+                    **(predictive or {}),
+                ),
+                CONTROLLER_AUTOTUNE: RelayAutotuner(
+                    on_finish=self._autotune_finished if zone.primary else None,
+                    clock=clock,
+                ),
+            }
+            self.zone_status[zone.name] = SnapshotCell({
+                "running": True,
+                "target_temp": target_temp,
+                "burner_on": False,
+                "pid_output": 0.0,
+                "burner_stage1_on": False,
+                "burner_stage2_on": False,
+                "burner_request_stage": 0,
+                "connected": False,
+                "controller": controller,
+            })
+        self.controllers = self.zone_controllers[primary.name]
+        self.control_status = self.zone_status[primary.name]
+        self.autotune_result = None
+        if controller == CONTROLLER_AUTOTUNE:
+            for controllers in self.zone_controllers.values():
+                controllers[CONTROLLER_AUTOTUNE].start(CONTROLLER_PID, autotune_rule)
+        self.temperature_history = HistoryBuffer(600, self.channels.history_columns())
+        self.relays = {}
+        notifier = UpdateNotifier(TOPICS)
+        recorder = _NullRecorder()
+        self.temp_worker = TemperatureWorker(
+            self.logger,
+            SnapshotCell(),
+            self.temperature_history,
+            threading.Lock(),
+            self.zone_status,
+            notifier,
+            recorder,
+            {"oversample": oversample, "filter": "median"},
+            SnapshotCell(),
+            self.calibration,
+            channels=self.channels,
+            open_adc=self._open_adc,
+            clock=clock,
+            metrics=metrics,
+        )
+        relay_accounting = RelayAccounting(
+            [
+                relay
+                for zone in self.channels.zones.values()
+                for relay in (zone.relay_stage1, zone.relay_stage2)
+            ],
+            max_starts=max_starts,
+            paced=paced_starts,
+            clock=clock,
+        )
+        self.burner_workers = {
+            zone.name: BurnerControlWorker(
+                self.logger,
+                self.temperature_history,
+                self.zone_status[zone.name],
+                self.zone_controllers[zone.name],
+                notifier,
+                recorder,
+                relay_accounting,
+                open_relay=self._open_relay,
+                clock=clock,
+                metrics=metrics,
+                zone=zone,
+            )
+            for zone in self.channels.zones.values()
+        }
+        self.burner_worker = self.burner_workers[primary.name]
+        self.scheduler = Scheduler(self.logger, clock=clock, sleep=self._sleep)
+        self.scheduler.add_task("sample", self.temp_worker.step, period=sample_period)
+        for name, worker in self.burner_workers.items():
+            self.scheduler.add_task(
+                "control" if name == primary.name else f"control_{name}",
+                worker.step,
+                period=2 * sample_period,
+                after="sample",
+            )
+        self.scheduler.add_task("record", self._record, after="control")
+        self._stop = threading.Event()
+        self.times = []
+        self.oil_temps = []
+        self.stages = []
+
+    def _probe_voltage(self, attr):
+        def voltage():
+            return thermistor_voltage(self.calibration, getattr(self.plant, attr))
+        return voltage
+
+    def _open_adc(self, probes):
+        boards = {}
+        channels = {}
+        oil = self.channels.primary.probe.name
+        for probe in probes:
+            ads = boards.setdefault(probe.address, FakeADS1115())
+            channels[probe.name] = FakeAnalogIn(
+                ads,
+                probe.input,
+                noise=self.adc_noise,
+                rng=self.rng,
+                voltage_fn=self._probe_voltage(
+                    "oil_probe" if probe.name == oil else "turkey_probe"
+                ),
+            )
+        return list(boards.values()), channels
+
+    def _open_relay(self, pin):
+        relay = FakeRelay(pin, on_change=self._relays_changed)
+        self.relays[pin] = relay
+        return relay
+
+    def _relays_changed(self):
+        primary = self.channels.primary
+        s1 = self.relays.get(primary.stage1_pin)
+        s2 = self.relays.get(primary.stage2_pin)
+        self.plant.set_stage(
+            applied_stage(s1 is not None and s1.value, s2 is not None and s2.value)
+        )
+
+    def _sleep(self, seconds):
+        # Advance the plant instead of waiting
+        self.plant.advance(seconds)
+        self.clock.now += seconds
+        if self.clock.now >= self.duration_s:
+            self._stop.set()
+
+    def _autotune_finished(self, result):
+        # The experiment is the whole run
+        self.autotune_result = result
+        self._stop.set()
+
+    def _record(self):
+        self.times.append(self.clock.now)
+        self.oil_temps.append(self.plant.oil_temp)
+        self.stages.append(self.plant.stage)
+
+    def run(self):
+        started = time.perf_counter()
+        self.temp_worker.setup()
+        for worker in self.burner_workers.values():
+            worker.setup()
+        self.scheduler.run_forever(self._stop)
+        load = self.plant.load
+        return SimulationResult(
+            self.target_temp,
+            None if load is None else load.time_s,
+            self.times,
+            self.oil_temps,
+            self.stages,
+            sum(
+                relay.toggles
+                for pin, relay in self.relays.items()
+                if pin
+                in (self.channels.primary.stage1_pin, self.channels.primary.stage2_pin)
+            ),
+            time.perf_counter() - started,
+        )
+
+
+def replay_session(path, controllers, target_temp=176.7, clock=None):
+    """Run ``controllers`` open loop over a recorded session log.
+
+    Each controller observes the recorded oil temperatures and burner stages
+    and decides as if it were in charge. Returns per controller how many
+    stage changes it would have requested and how often it agreed with the
+    stage that was actually applied, plus its final :meth:`state`. A PID
+    controller should be built with ``time_fn=clock.time`` for a
+    :class:`VirtualClock` passed as ``clock``, which follows the log's
+    timestamps so the integral and derivative see the recorded intervals.
+    """
+    log = SessionLog(path)
+    stage_events = [
+        (t, applied_stage(v[1], v[2])) for t, v in log.zone_events(RECORD_STAGE)
+    ]
+    results = {}
+    for name, controller in controllers.items():
+        stage = 0
+        event = 0
+        previous = None
+        changes = 0
+        agree = 0
+        for time_ms, temp in zip(log.times, log.values["oil_temp"]):
+            while event < len(stage_events) and stage_events[event][0] <= time_ms:
+                stage = stage_events[event][1]
+                event += 1
+            if math.isnan(temp):
+                continue
+            if clock is not None:
+                clock.now = time_ms / 1000.0
+            controller.observe(time_ms, temp, stage)
+            requested, _ = controller.decide(temp, target_temp, stage >= 1, stage == 2)
+            changes += previous is not None and requested != previous
+            agree += requested == stage
+            previous = requested
+        results[name] = {
+            "samples": len(log),
+            "recorded_stage_changes": len(stage_events),
+            "stage_changes": changes,
+            "agreement": agree / len(log) if len(log) else None,
+            "state": controller.state(),
+        }
+    return results
+
+
+def probe_registry(n_probes, n_zones=1):
+    """The fryer layout grown to ``n_probes`` probes and ``n_zones`` zones.
+
+    Probes are placed four per ADS1115.
+    """
+    names = ["oil", "turkey"] + [f"probe{i}" for i in range(2, n_probes)]
+    probes = [
+        Probe(name, i % ADS1115_INPUTS, ADS1115_ADDRESSES[i // ADS1115_INPUTS])
+        for i, name in enumerate(names[:n_probes])
+    ]
+    zones = [("fryer", "oil", 21, 20)] + [
+        (f"zone{i}", names[i], 2 * i, 2 * i + 1) for i in range(1, n_zones)
+    ]
+    return ChannelRegistry(probes, zones)
+
+
+def probe_scaling(
+    hours=1.0, probe_counts=(2, 4, 8), repeats=3, oversample=8, data_rate=860
+):
+    """Print the worker time per 1 s tick against the probe (and zone) count.
+
+    Sampling, control and decimation (over the same windows as the app) are
+    timed separately; the best of ``repeats`` runs is kept. The fake ADC
+    answers instantly, so the ADS1115's own conversion time, which also
+    grows with every probe, is listed alongside.
+    """
+    calibration = ThermistorCalibration()
+    layouts = [(n, 1) for n in probe_counts] + [(probe_counts[-1], 2)]
+    print(f"{'probes':>6}{'zones':>6}{'sample':>10}{'control':>10}{'decimate':>10}"
+          f"{'total':>10}{'per probe':>11}{'ADC conv.':>11}")
+    for n_probes, n_zones in layouts:
+        best = None
+        for _ in range(repeats):
+            registry = probe_registry(n_probes, n_zones)
+            sim = Simulation(
+                ThermalPlant(), duration_s=hours * 3600, calibration=calibration,
+                oversample=oversample, channels=registry,
+            )
+            windows = {"30min": 3, "2hr": 10, "8hr": 40}
+            history = {
+                name: {"data": deque(maxlen=8 * 3600 // interval), "interval": interval}
+                for name, interval in windows.items()
+            }
+            accumulators = {
+                name: DecimationAccumulator(interval, registry.temp_keys)
+                for name, interval in windows.items()
+            }
+            decimator = HistoryDecimator(
+                sim.temperature_history, history, accumulators, threading.Lock()
+            )
+            sim.scheduler.add_task("decimate", decimator.step, after="sample")
+            spent = {"sample": 0.0, "control": 0.0, "decimate": 0.0}
+            for name, task in sim.scheduler.tasks.items():
+                if name == "record":
+                    continue
+                kind = "control" if name.startswith("control") else name
+
+                def timed(func=task.func, kind=kind):
+                    start = time.perf_counter()
+                    func()
+                    spent[kind] += time.perf_counter() - start
+
+                task.func = timed
+            sim.run()
+            per_tick = {
+                kind: seconds / len(sim.times) for kind, seconds in spent.items()
+            }
+            if best is None or sum(per_tick.values()) < sum(best.values()):
+                best = per_tick
+        total = sum(best.values())
+        conversions = n_probes * oversample / data_rate
+        print(
+            f"{n_probes:>6}{n_zones:>6}{best['sample'] * 1e6:>8.1f}us"
+            f"{best['control'] * 1e6:>8.1f}us{best['decimate'] * 1e6:>8.1f}us"
+            f"{total * 1e6:>8.1f}us{total / n_probes * 1e6:>9.1f}us"
+            f"{conversions * 1e3:>9.1f}ms"
+        )
+
+
+def eta_accuracy(load_at_min=30.0, transfer_w_per_k=(3.0, 4.0, 6.0), every_min=5.0):
+    """Print the turkey's estimated time to done, its band and its error over the cook.
+
+    The load's heat transfer sets how long the bird takes; the error is the
+    estimated finish minus the time the simulated probe actually reaches
+    the done temperature.
+    """
+    calibration = ThermistorCalibration()
+    for transfer in transfer_w_per_k:
+        load_s = load_at_min * 60
+        sim = Simulation(
+            ThermalPlant(load=LoadEvent(load_s, transfer_w_per_k=transfer)),
+            duration_s=load_s + 3 * 3600, calibration=calibration,
+        )
+        estimates = SnapshotCell()
+        predictor = EtaPredictor(
+            sim.channels,
+            sim.temperature_history,
+            sim.zone_status,
+            estimates,
+            clock=sim.clock.time,
+        )
+        spent = [0.0]
+        log = []
+
+        def step():
+            start = time.perf_counter()
+            predictor.step()
+            spent[0] += time.perf_counter() - start
+            log.append(
+                (sim.clock.now, sim.plant.turkey_probe, estimates.get().get("turkey"))
+            )
+
+        sim.scheduler.add_task("eta", step, after="sample")
+        sim.run()
+        done = next((t for t, temp, _ in log if temp >= DEFAULT_DONE_TEMP_C), None)
+        if done is None:
+            print(f"{transfer} W/K: the turkey never got done")
+            continue
+        print(f"{transfer} W/K: done {(done - load_s) / 60:.1f} min after the load, "
+              f"{spent[0] / len(log) * 1e6:.1f} us per tick")
+        print(f"{'cooked':>8}{'left':>8}{'estimate':>10}{'band':>14}{'error':>8}")
+        for t, _, estimate in log:
+            cooked = (t - load_s) / 60
+            if (
+                t > done
+                or cooked <= 0
+                or cooked % every_min
+                or estimate["status"] != STATUS_ESTIMATING
+            ):
+                continue
+            high = estimate["eta_high_s"]
+            high = "?" if high is None else f"{high / 60:.1f}"
+            band = f"{estimate['eta_low_s'] / 60:.1f}-{high}"
+            print(
+                f"{cooked:>7.0f}m{(done - t) / 60:>7.1f}m"
+                f"{estimate['eta_s'] / 60:>9.1f}m{band:>13}m"
+                f"{(estimate['done_at'] - done) / 60:>+7.1f}m"
+            )
+
+
+def contention(clients=8, seconds=10.0, sample_period=0.05):
+    """Burner-loop latency of the running app, idle and under concurrent HTTP load.
+
+    Starts ``app.py`` on the simulated hardware (in a scratch config and
+    session directory unless those are set) with the sample period cut to
+    ``sample_period``, and times every pass from the sample's deadline to
+    the end of the control step acting on it. ``clients`` threads then
+    fetch /status, /temperatures, /temperature_history and /logs through
+    Flask's test client as fast as they can. Handlers read published
+    snapshots and lock-free rings, so the load only reaches the loop
+    through the GIL.
+    """
+    import os
+    import tempfile
+
+    scratch = tempfile.mkdtemp(prefix="roboburn-contention-")
+    os.environ.setdefault("ROBOBURN_HARDWARE", "sim")
+    os.environ.setdefault("ROBOBURN_CONFIG_DIR", os.path.join(scratch, "config"))
+    os.environ.setdefault("ROBOBURN_SESSION_DIR", os.path.join(scratch, "sessions"))
+    import app as webapp
+
+    webapp.app.logger.setLevel(logging.WARNING)
+    webapp.start_background_threads()
+    sample = webapp.scheduler.tasks["sample"]
+    control = webapp.scheduler.tasks["control"]
+    sample.period = sample_period
+    latencies = []
+    deadline = [None]
+    sample_step, control_step = sample.func, control.func
+
+    def timed_sample():
+        # Still the deadline this run was due at; the scheduler moves it after
+        deadline[0] = sample.next_deadline
+        sample_step()
+
+    def timed_control():
+        control_step()
+        if deadline[0] is not None:
+            latencies.append(time.monotonic() - deadline[0])
+            deadline[0] = None
+
+    sample.func = timed_sample
+    control.func = timed_control
+    paths = ("/status", "/temperatures", "/temperature_history?count=800", "/logs")
+
+    def client(stop, counts):
+        http = webapp.app.test_client()
+        while not stop.is_set():
+            for path in paths:
+                http.get(path).close()
+                counts[0] += 1
+
+    time.sleep(1.0)
+    print(f"sample period {sample_period * 1000:.0f} ms, {seconds:.0f}s per phase")
+    print(f"{'load':<12}{'requests/s':>11}{'passes':>8}{'p50':>9}{'p99':>9}{'max':>9}")
+    for n_clients in (0, clients):
+        stop = threading.Event()
+        counts = [[0] for _ in range(n_clients)]
+        threads = [
+            threading.Thread(target=client, args=(stop, count), daemon=True)
+            for count in counts
+        ]
+        for thread in threads:
+            thread.start()
+        del latencies[:]
+        time.sleep(seconds)
+        stop.set()
+        measured = sorted(latencies)
+        for thread in threads:
+            thread.join()
+        requests = sum(count[0] for count in counts) / seconds
+        print(
+            f"{f'{n_clients} clients':<12}{requests:>11.0f}{len(measured):>8}"
+            f"{measured[len(measured) // 2] * 1e3:>7.2f}ms"
+            f"{measured[int(len(measured) * 0.99)] * 1e3:>7.2f}ms"
+            f"{measured[-1] * 1e3:>7.2f}ms"
+        )
+    sample.func, control.func = sample_step, control_step
+
+
+WATCHDOG_SCENARIOS = ("over_temp", "rate_of_rise", "sensor", "frozen")
+
+
+def _watchdog_trial(scenario, calibration, max_temp_c, timeout_s, ramp_c_per_s=3.0):
+    """One real-time run of the workers and watchdog on a :class:`hardware.SimBackend`.
+
+    The burner heats hot oil until a fault is injected: the oil passing
+    ``max_temp_c``, the oil probe running away at ``ramp_c_per_s``, the ADC
+    failing or the scheduler thread freezing in the control task. Returns
+    ``(trip, latency_s)``, the latency running from when the fault became
+    detectable (the first sample showing it, or its timeout running out) to
+    the relays being off.
+    """
+    channels = default_registry()
+    zone = channels.primary
+    plant = ThermalPlant()
+    plant.oil_temp = plant.oil_probe = max_temp_c - 20
+    backend = SimBackend(channels, calibration, plant=plant, seed=0)
+    logger = logging.getLogger("simulation.watchdog")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    fault = {"adc": False, "ramp_from": None}
+
+    def open_adc(probes):
+        boards, adc_channels = backend.open_adc(probes)
+        oil = adc_channels[zone.probe.name]
+        read = oil.voltage_fn
+
+        def voltage():
+            if fault["adc"]:
+                raise OSError("simulated I2C failure")
+            value = read()
+            if fault["ramp_from"] is None:
+                return value
+            runaway = ramp_c_per_s * (time.monotonic() - fault["ramp_from"])
+            return thermistor_voltage(calibration, plant.oil_probe + runaway)
+        oil.voltage_fn = voltage
+        return boards, adc_channels
+
+    zone_status = {
+        name: SnapshotCell({
+            "running": True,
+            "target_temp": max_temp_c - 5,
+            "burner_on": False,
+            "pid_output": 0.0,
+            "burner_stage1_on": False,
+            "burner_stage2_on": False,
+            "burner_request_stage": 0,
+            "connected": False,
+            "controller": CONTROLLER_PID,
+        })
+        for name in channels.zones
+    }
+    history = HistoryBuffer(600, channels.history_columns())
+    latest = SnapshotCell()
+    notifier = UpdateNotifier(TOPICS)
+    recorder = _NullRecorder()
+    watchdog = Watchdog(
+        channels,
+        latest,
+        zone_status,
+        notifier,
+        recorder,
+        logger,
+        max_temp_c=max_temp_c,
+        stale_s=timeout_s,
+        sensor_timeout_s=timeout_s,
+        heartbeat_timeout_s=timeout_s,
+    )
+    beats = []
+    beat = watchdog.heartbeat(zone.name)
+
+    def heartbeat():
+        beat()
+        beats.append(time.time())
+
+    temp_worker = TemperatureWorker(
+        logger, latest, history, threading.Lock(), zone_status, notifier, recorder,
+        {"oversample": 8, "filter": "median"}, SnapshotCell(), calibration,
+        channels=channels, open_adc=open_adc,
+    )
+    pid = PID(Kp=5.0, Ki=0.05, Kd=20.0, setpoint=max_temp_c - 5, output_limits=(0, 100))
+    burner_worker = BurnerControlWorker(
+        logger,
+        history,
+        zone_status[zone.name],
+        {CONTROLLER_PID: PidHysteresisController(pid)},
+        notifier,
+        recorder,
+        open_relay=backend.open_relay,
+        zone=zone,
+        heartbeat=heartbeat,
+        interlock=watchdog.guard,
+    )
+    scheduler = Scheduler(logger)
+    scheduler.add_task("sample", temp_worker.step, period=1.0)
+    scheduler.add_task("control", burner_worker.step, after="sample")
+    stop = threading.Event()
+    frozen = threading.Event()
+
+    def run():
+        temp_worker.setup()
+        burner_worker.setup()
+        scheduler.run_forever(stop)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    watchdog.start()
+    try:
+        deadline = time.monotonic() + 15
+        while not any(relay.is_on for relay in watchdog.relays[zone.name]):
+            if time.monotonic() > deadline:
+                raise RuntimeError("The simulated burner never came on.")
+            time.sleep(0.05)
+        # Heat for long enough to fill the rate-of-rise window
+        time.sleep(watchdog.rise_window_s * 0.6)
+        injected = time.time()
+        if scenario == "over_temp":
+            plant.oil_temp = plant.oil_probe = max_temp_c + 1
+        elif scenario == "rate_of_rise":
+            fault["ramp_from"] = time.monotonic()
+        elif scenario == "sensor":
+            fault["adc"] = True
+        else:
+            scheduler.tasks["control"].func = frozen.wait
+        deadline = time.monotonic() + 30
+        while watchdog.tripped is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        frozen.set()
+        stop.set()
+        watchdog.stop()
+        thread.join(5)
+    trip = watchdog.tripped
+    if trip is None:
+        return None, None
+
+    everything = list(history)
+    entries = [entry for entry in everything if entry["time"] / 1000 >= injected]
+    key = zone.probe.temp_key
+    if scenario == "over_temp":
+        detectable = (
+            next(entry["time"] for entry in entries if entry[key] > max_temp_c) / 1000
+        )
+    elif scenario == "rate_of_rise":
+        window_ms = watchdog.rise_window_s * 1000
+        detectable = None
+        for entry in entries:
+            recent = [
+                e
+                for e in everything
+                if entry["time"] - window_ms <= e["time"] <= entry["time"]
+            ]
+            span_s = (recent[-1]["time"] - recent[0]["time"]) / 1000
+            rise = (recent[-1][key] - recent[0][key]) / span_s * 60 if span_s else 0.0
+            if (
+                span_s >= watchdog.rise_window_s / 2
+                and rise > watchdog.max_rise_c_per_min
+            ):
+                detectable = entry["time"] / 1000
+                break
+    elif scenario == "sensor":
+        # The first failed read marks the zone disconnected
+        detectable = entries[0]["time"] / 1000 + timeout_s
+    else:
+        last_beat = max(b for b in beats if b <= injected)
+        detectable = min(last_beat, everything[-1]["time"] / 1000) + timeout_s
+    return trip, trip["at"] - detectable
+
+
+def watchdog_latency(repeats=3, max_temp_c=200.0, timeout_s=2.0):
+    """Trip latency of the safety watchdog for each fault, on the real workers.
+
+    The workers run in real time. The timeouts are cut to ``timeout_s`` to
+    keep the run short; the latency past a timeout does not depend on its
+    length.
+    """
+    calibration = ThermistorCalibration()
+    print(f"{'fault':<14}{'tripped on':<16}{'latency min':>12}{'max':>10}")
+    for scenario in WATCHDOG_SCENARIOS:
+        checks = set()
+        latencies = []
+        for _ in range(repeats):
+            trip, latency = _watchdog_trial(
+                scenario, calibration, max_temp_c, timeout_s
+            )
+            checks.add("no trip" if trip is None else trip["check"])
+            if latency is not None:
+                latencies.append(latency * 1000)
+        low = _format(min(latencies), "ms") if latencies else "-"
+        high = _format(max(latencies), "ms") if latencies else "-"
+        print(f"{scenario:<14}{'/'.join(sorted(checks)):<16}{low:>12}{high:>10}")
+
+
+def _format(value, unit=""):
+    if value is None:
+        return "-"
+    return f"{value:.1f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark burner controllers in closed-loop simulation."
+    )
+    parser.add_argument(
+        "--hours", type=float, default=8.0, help="simulated cook length"
+    )
+    parser.add_argument(
+        "--load-at", type=float, default=40.0, help="minutes until the turkey goes in"
+    )
+    parser.add_argument("--config", action="append", choices=sorted(CONFIGURATIONS),
+                        help="configuration(s) to run (default: all)")
+    parser.add_argument(
+        "--max-starts",
+        type=int,
+        default=None,
+        help="burner start budget per stage relay and hour (default: unlimited)",
+    )
+    parser.add_argument("--paced-starts", action="store_true",
+                        help="space budgeted starts evenly over the hour")
+    parser.add_argument(
+        "--autotune",
+        choices=sorted(TUNING_RULES),
+        nargs="?",
+        const=DEFAULT_RULE,
+        help="run the relay autotune first and add its gains as 'pid-autotuned'",
+    )
+    parser.add_argument("--probe-scaling", action="store_true",
+                        help="time the workers per tick with 2, 4 and 8 probes instead")
+    parser.add_argument("--eta", action="store_true",
+                        help="check the turkey's time-to-done estimate instead")
+    parser.add_argument(
+        "--watchdog",
+        action="store_true",
+        help="measure the safety watchdog's trip latency instead (real time)",
+    )
+    parser.add_argument(
+        "--contention",
+        action="store_true",
+        help=(
+            "time the app's burner loop under concurrent HTTP load instead"
+            " (real time)"
+        ),
+    )
+    args = parser.parse_args()
+
+    if args.probe_scaling:
+        probe_scaling()
+        return
+    if args.eta:
+        eta_accuracy()
+        return
+    if args.watchdog:
+        watchdog_latency()
+        return
+    if args.contention:
+        contention()
+        return
+
+    calibration = ThermistorCalibration()
+    configurations = {
+        name: CONFIGURATIONS[name] for name in args.config or CONFIGURATIONS
+    }
+    if args.autotune:
+        tuning = Simulation(
+            ThermalPlant(),
+            CONTROLLER_AUTOTUNE,
+            calibration=calibration,
+            autotune_rule=args.autotune,
+        )
+        tuning.run()
+        result = tuning.autotune_result
+        if result is None or result["phase"] != "done":
+            print(f"autotune failed: {result and result.get('error')}")
+        else:
+            print(
+                f"autotune ({args.autotune}): Ku {result['ultimate_gain']:.2f}, "
+                f"Tu {result['ultimate_period_s']:.0f}s"
+                f" after {result['duration_s']:.0f}s -> "
+                f"kp {result['kp']:.3f}, ki {result['ki']:.4f}, kd {result['kd']:.1f}"
+            )
+            configurations["pid-autotuned"] = {
+                "controller": CONTROLLER_PID,
+                "pid_gains": (result["kp"], result["ki"], result["kd"]),
+            }
+
+    print(
+        f"{'config':<18}{'settle':>9}{'overshoot':>11}{'recovery':>10}{'rec. over':>11}"
+        f"{'ss error':>10}{'toggles':>9}{'wall':>8}"
+    )
+    for name, config in configurations.items():
+        plant = ThermalPlant(load=LoadEvent(args.load_at * 60))
+        result = Simulation(
+            plant,
+            duration_s=args.hours * 3600,
+            calibration=calibration,
+            max_starts=args.max_starts,
+            paced_starts=args.paced_starts,
+            **config,
+        ).run()
+        m = result.metrics()
+        print(
+            f"{name:<18}{_format(m['settling_s'], 's'):>9}"
+            f"{_format(m['overshoot_c'], 'C'):>11}{_format(m['recovery_s'], 's'):>10}"
+            f"{_format(m['recovery_overshoot_c'], 'C'):>11}"
+            f"{_format(m['steady_state_error_c'], 'C'):>10}{m['toggles']:>9}"
+            f"{_format(m['wall_time_s'], 's'):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Copy-on-write snapshot publication for state shared between workers and handlers."""
+
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+
+
+def freeze(mapping):
+    """Read-only view over a private copy of ``mapping``."""
+    return MappingProxyType(dict(mapping))
+
+
+class SnapshotCell:
+    """Holds the current immutable snapshot of some shared mapping.
+
+    Writers build a complete new snapshot and swap it in with a single
+    reference assignment, so readers call :meth:`get` without any lock and
+    always see a consistent state, never a half-applied update. Writers are
+    serialized among themselves by a private lock so a read-modify-write in
+    :meth:`edit` cannot lose a concurrent change; that lock is only ever held
+    for the copy and never while a reader serializes a response.
+    """
+
+    def __init__(self, initial=()):
+        # (version, snapshot) is swapped as one object so both are read together
+        self._state = (0, freeze(initial))
+        self._write_lock = threading.Lock()
+
+    def get(self):
+        return self._state[1]
+
+    def versioned(self):
+        """``(version, snapshot)``; the version increases on every publish."""
+        return self._state
+
+    def _swap(self, mapping):
+        self._state = (self._state[0] + 1, freeze(mapping))
+
+    def publish(self, mapping):
+        """Replace the snapshot with a copy of ``mapping``."""
+        with self._write_lock:
+            self._swap(mapping)
+
+    def update(self, changes):
+        """Publish the current snapshot with ``changes`` applied."""
+        with self._write_lock:
+            self._swap({**self._state[1], **changes})
+
+    @contextmanager
+    def edit(self):
+        """Yield a mutable draft of the current snapshot and publish it on exit.
+
+        The draft is discarded if the block raises.
+        """
+        with self._write_lock:
+            draft = dict(self._state[1])
+            yield draft
+            self._swap(draft)
@@ -0,0 +1,105 @@
+"""Import-time profile of the app, for catching startup regressions.
+
+Imports the app in fresh interpreters under ``python -X importtime``, keeps
+the fastest of ``--repeats`` runs and prints its total, the app's direct
+imports by cumulative time and the modules with the most self time. Exits
+non-zero if the total is over ``--budget-ms`` or if a module that must stay
+lazy (the hardware libraries and the simulator, see ``hardware.py``) was
+imported, so it can run as a check::
+
+    python startup_profile.py --budget-ms 800
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Imported only by the backend that needs them, never at startup
+LAZY_MODULES = (
+    "board",
+    "busio",
+    "adafruit_ads1x15",
+    "gpiozero",
+    "simulation",
+    "fake_adc",
+)
+
+
+def parse_importtime(stderr):
+    """``(self_us, cumulative_us, depth, module)`` per ``-X importtime`` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        rows.append((int(fields[0]), int(fields[1]), depth, stripped))
+    return rows
+
+
+def profile(module="app", repeats=5):
+    """Rows of the fastest of ``repeats`` imports of ``module``."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=here, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        rows = parse_importtime(result.stderr)
+        total = next(cumulative for _, cumulative, _, name in rows if name == module)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Profile how long importing the app takes."
+    )
+    parser.add_argument(
+        "--module", default="app", help="module to import (default: app)"
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=5, help="imports to take the fastest of"
+    )
+    parser.add_argument("--top", type=int, default=15, help="modules to list")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail if the import takes longer than this")
+    args = parser.parse_args()
+
+    total, rows = profile(args.module, args.repeats)
+    print(f"import {args.module}: {total / 1000:.1f} ms (fastest of {args.repeats})")
+
+    print(f"\n{'direct imports':<40}{'cumulative':>12}")
+    direct = [row for row in rows if row[2] == 1]
+    slowest = sorted(direct, reverse=True, key=lambda row: row[1])[: args.top]
+    for _, cumulative, _, name in slowest:
+        print(f"  {name:<38}{cumulative / 1000:>10.1f}ms")
+
+    print(f"\n{'self time':<40}{'self':>12}")
+    for self_us, _, _, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {name:<38}{self_us / 1000:>10.1f}ms")
+
+    failed = False
+    eager = sorted({name for *_, name in rows if name.split(".")[0] in LAZY_MODULES})
+    if eager:
+        print(f"\nFAIL: imported at startup but meant to be lazy: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and total / 1000 > args.budget_ms:
+        print(
+            f"\nFAIL: {total / 1000:.1f} ms is over the {args.budget_ms:.0f} ms budget"
+        )
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
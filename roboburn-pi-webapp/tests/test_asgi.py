@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def asgi(tmp_path_factory):
+    """The ASGI module over an app with its config and sessions in a temp directory."""
+    root = tmp_path_factory.mktemp("roboburn")
+    for name, sub in (
+        ("CONFIG", "config"),
+        ("SESSION", "sessions"),
+        ("CACHE", "cache"),
+    ):
+        os.environ[f"ROBOBURN_{name}_DIR"] = str(root / sub)
+    os.environ["ROBOBURN_HARDWARE"] = "sim"
+    import asgi
+
+    return asgi
+
+
+def _shared(asgi, before, after, body=b"{}"):
+    return asgi.SharedUpdate(before, after, body)
+
+
+def test_publish_fans_out_and_marks_laggards(asgi):
+    async def scenario():
+        hub = asgi.UpdateHub(None, None, json.dumps, 15.0)
+        steady = hub.subscribe()
+        slow = hub.subscribe()
+        received = []
+        for i in range(asgi.CLIENT_QUEUE_SIZE + 3):
+            hub.publish(_shared(asgi, i, i + 1))
+            received.append(steady.get_nowait())  # keeps up with every update
+        hub.publish(asgi._KEEPALIVE)
+        queued = [slow.get_nowait() for _ in range(slow.qsize())]
+        hub.unsubscribe(slow)
+        hub.publish(_shared(asgi, 99, 100))
+        return hub, received, steady, queued, slow
+
+    hub, received, steady, queued, slow = asyncio.run(scenario())
+    assert hub.published == asgi.CLIENT_QUEUE_SIZE + 4  # keepalives are not counted
+    assert [u.before for u in received] == list(range(asgi.CLIENT_QUEUE_SIZE + 3))
+    assert steady.get_nowait() is asgi._KEEPALIVE
+    assert steady.get_nowait().before == 99
+    # The slow client got what fit, then a single lag marker and nothing more
+    assert [u.before for u in queued[:-1]] == list(range(asgi.CLIENT_QUEUE_SIZE - 1))
+    assert queued[-1] is asgi._LAGGED
+    assert slow.empty()
+
+
+def test_next_update_only_follows_on(asgi):
+    async def next_body(updates, position):
+        queue = asyncio.Queue()
+        for update in updates:
+            queue.put_nowait(update)
+        return await asgi._next_update(queue, position)
+
+    follows = _shared(asgi, "a", "b", b'{"n": 1}')
+    assert asyncio.run(next_body([asgi._KEEPALIVE, follows], "a")) == b'{"n": 1}'
+    assert asyncio.run(next_body([follows], "x")) is None
+    assert asyncio.run(next_body([asgi._LAGGED], "a")) is None
+
+
+def test_advance_tracks_samples_and_logs(asgi):
+    webapp = asgi.webapp
+    position = ({}, 1000.0, 4)
+    versions = {topic: 1 for topic in webapp.TOPICS}
+    assert asgi._advance(position, versions, {}) == (versions, 1000.0, 4)
+    update = {
+        webapp.TOPIC_TEMPERATURE: [
+            {webapp.KEY_TIME: 2000.0},
+            {webapp.KEY_TIME: 3000.0},
+        ],
+        webapp.TOPIC_LOGS: [{"seq": 7}],
+    }
+    assert asgi._advance(position, versions, update) == (versions, 3000.0, 7)
+
+
+def test_environ_from_scope(asgi):
+    environ = asgi._environ(
+        {
+            "method": "POST",
+            "path": "/control",
+            "query_string": b"zone=fryer",
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"x-tag", b"a"),
+                (b"x-tag", b"b"),
+            ],
+            "client": ("10.0.0.2", 5555),
+        },
+        b'{"action": "start"}',
+    )
+    assert environ["REQUEST_METHOD"] == "POST"
+    assert environ["QUERY_STRING"] == "zone=fryer"
+    assert environ["CONTENT_TYPE"] == "application/json"
+    assert environ["HTTP_X_TAG"] == "a,b"
+    assert environ["REMOTE_ADDR"] == "10.0.0.2"
+    assert environ["wsgi.input"].read() == b'{"action": "start"}'
+
+
+def _request(application, path, query=b""):
+    """Run one GET through ``application``; returns (status, body)."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query,
+        "headers": [],
+    }
+    asyncio.run(application(scope, receive, send))
+    status = sent[0]["status"]
+    return status, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_routes(asgi):
+    # Marked started so no scheduler or producer thread is spun up
+    application = asgi.Application(asgi.webapp.app, asgi.hub, threads=1)
+    application.started = True
+
+    status, body = _request(application, "/status")
+    assert status == 200
+    assert "target_temp" in json.loads(body)
+
+    # A client that has seen nothing is answered at once with every topic
+    status, body = _request(application, "/poll")
+    update = json.loads(body)
+    assert status == 200
+    assert set(asgi.webapp.TOPICS) <= set(update) | {"versions"}
+    assert update["versions"] == json.loads(json.dumps(asgi.webapp.notifier.versions()))
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from channels import ChannelRegistry, default_registry, load_registry
+
+BREW = {
+    "probes": [
+        {"name": "hlt", "input": 0},
+        {"name": "mash", "input": 1},
+        {"name": "wort", "address": 73, "input": 0},
+    ],
+    "zones": [
+        {"name": "hlt", "probe": "hlt", "stage1_pin": 21, "stage2_pin": 20},
+        {"name": "mash", "probe": "mash", "stage1_pin": 16, "stage2_pin": 12},
+    ],
+}
+
+
+def _config(**changes):
+    config = json.loads(json.dumps(BREW))
+    for path, value in changes.items():
+        kind, index, field = path.split("__")
+        config[kind][int(index)][field] = value
+    return config
+
+
+def test_default_is_the_fryer():
+    registry = default_registry()
+    assert registry.history_columns() == (
+        "time", "oil_temp", "turkey_temp", "oil_voltage", "turkey_voltage",
+        "oil_resistance", "turkey_resistance",
+    )
+    assert registry.primary.name == "fryer"
+    zone = registry.primary
+    assert (zone.relay_stage1, zone.relay_stage2) == ("stage1", "stage2")
+    assert registry.by_name["oil"].critical and not registry.by_name["turkey"].critical
+
+
+def test_round_trip_and_zone_names():
+    registry = ChannelRegistry.from_dict(BREW)
+    again = ChannelRegistry.from_dict(registry.as_dict())
+    assert again.as_dict() == registry.as_dict()
+    mash = registry.zones["mash"]
+    assert (mash.index, mash.primary, mash.relay_stage1) == (1, False, "mash_stage1")
+    assert not registry.by_name["wort"].critical
+
+
+@pytest.mark.parametrize(
+    "changes, message",
+    [
+        ({"probes__0__name": "HLT"}, "lowercase"),
+        ({"probes__1__name": "hlt"}, "Duplicate probe"),
+        ({"probes__0__input": 4}, "not on an ADS1115 input"),
+        ({"probes__2__address": 0x50}, "not on an ADS1115 input"),
+        ({"probes__1__input": 0}, "shares its ADS1115 input"),
+        ({"zones__1__name": "hlt"}, "Duplicate zone"),
+        ({"zones__1__name": "mash tun"}, "lowercase"),
+        ({"zones__1__probe": "kettle"}, "unknown probe"),
+        ({"zones__1__probe": "hlt"}, "already controls"),
+        ({"zones__1__stage1_pin": 21}, "reuses a relay pin"),
+        ({"zones__0__stage2_pin": 21}, "reuses a relay pin"),
+    ],
+)
+def test_invalid_configs_are_refused(changes, message):
+    with pytest.raises(ValueError, match=message):
+        ChannelRegistry.from_dict(_config(**changes))
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"probes": []},
+        {"probes": [{"input": 0}], "zones": []},
+        {
+            "probes": [{"name": "oil", "input": 0}],
+            "zones": [{"name": "fryer", "probe": "oil"}],
+        },
+        {"probes": [{"name": "oil", "input": "A0"}], "zones": []},
+        {"probes": [{"name": "oil", "input": 0}], "zones": []},
+        {"probes": None, "zones": None},
+    ],
+)
+def test_malformed_configs_are_refused(config):
+    with pytest.raises(ValueError):
+        ChannelRegistry.from_dict(config)
+
+
+def test_load_registry(tmp_path):
+    assert (
+        load_registry(tmp_path / "missing.json").as_dict()
+        == default_registry().as_dict()
+    )
+    path = tmp_path / "channels.json"
+    path.write_text(json.dumps(BREW))
+    assert list(load_registry(path).zones) == ["hlt", "mash"]
+    path.write_text("{not json")
+    with pytest.raises(ValueError):
+        load_registry(path)
@@ -0,0 +1,15 @@
+from controllers import PredictiveController
+
+
+def test_state_does_not_switch_the_model():
+    controller = PredictiveController(fallback=None)
+    better, worse = controller.models[:2]
+    for model, mse in ((better, 1.0), (worse, 10.0)):
+        model.samples = controller.min_samples
+        model.mse = mse
+    controller.active_model = worse
+    assert controller.state()["active_model"] == worse.parameters()
+    assert controller.active_model is worse
+    # The control thread's next decision is what switches
+    assert controller.best_model() is better
+    assert controller.state()["active_model"] == better.parameters()
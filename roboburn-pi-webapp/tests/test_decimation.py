@@ -0,0 +1,144 @@
+import random
+import threading
+import time
+
+from decimation import DecimationAccumulator, HistoryDecimator
+from history_buffer import HistoryBuffer
+
+KEYS = ("oil_temp", "turkey_temp")
+
+
+def _samples(n, start_ms=1_000_000.0):
+    rng = random.Random(0)
+    return [
+        {
+            "time": start_ms + i * 1000.0,
+            "oil_temp": 150 + rng.gauss(0, 2),
+            "turkey_temp": None if i % 7 == 3 else 20 + i * 0.01,
+        }
+        for i in range(n)
+    ]
+
+
+def _rescan(samples, interval):
+    """The averaging the worker did before: rescan everything since the last bucket."""
+    emitted = []
+    last_update = 0
+    for i, entry in enumerate(samples):
+        current_time = entry["time"] / 1000
+        if current_time - last_update < interval:
+            continue
+        recent = [e for e in samples[: i + 1] if e["time"] / 1000 > last_update]
+        avg = {"time": sum(e["time"] for e in recent) / len(recent)}
+        for key in KEYS:
+            values = [e[key] for e in recent if e[key] is not None]
+            avg[key] = sum(values) / len(values) if values else None
+        emitted.append(avg)
+        last_update = current_time
+    return emitted
+
+
+def _assert_entries_equal(actual, expected):
+    assert len(actual) == len(expected)
+    for a, b in zip(actual, expected):
+        assert a.keys() == b.keys()
+        for key in a:
+            if b[key] is None:
+                assert a[key] is None
+            else:
+                assert abs(a[key] - b[key]) < 1e-9
+
+
+def test_streaming_matches_rescan():
+    samples = _samples(500)
+    for interval in (1, 3, 10, 60):
+        accumulator = DecimationAccumulator(interval, KEYS)
+        emitted = []
+        for entry in samples:
+            avg = accumulator.update(entry, entry["time"] / 1000)
+            if avg is not None:
+                emitted.append(avg)
+        _assert_entries_equal(emitted, _rescan(samples, interval))
+
+
+def test_replay_matches_update():
+    samples = _samples(500)
+    times = [entry["time"] for entry in samples]
+    values = {
+        key: [float("nan") if e[key] is None else e[key] for e in samples]
+        for key in KEYS
+    }
+    for interval in (3, 60):
+        streamed = DecimationAccumulator(interval, KEYS)
+        emitted = []
+        for entry in samples:
+            avg = streamed.update(entry, entry["time"] / 1000)
+            if avg is not None:
+                emitted.append(avg)
+        _assert_entries_equal(
+            DecimationAccumulator(interval, KEYS).replay(times, values), emitted
+        )
+
+
+def test_extremes_only_when_asked():
+    plain = DecimationAccumulator(10, KEYS)
+    tracked = DecimationAccumulator(10, KEYS, extremes=True)
+    for entry in _samples(5):
+        plain.add(entry)
+        tracked.add(entry)
+    assert plain.mins["oil_temp"] is None
+    assert tracked.mins["oil_temp"] <= tracked.maxs["oil_temp"]
+
+
+class _HoldTimingLock:
+    """Lock recording how long each acquisition was held."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.holds = []
+
+    def acquire(self, blocking=True, timeout=-1):
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._acquired_at = time.perf_counter()
+        return acquired
+
+    def release(self):
+        self.holds.append(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _lock_hold_s(history_len, ticks=300):
+    samples = _samples(history_len + ticks)
+    history = HistoryBuffer(history_len + ticks, ("time",) + KEYS)
+    for entry in samples[:history_len]:
+        history.append(entry)
+    windows = {"5min": 1, "30min": 3, "2hr": 10, "8hr": 40}
+    decimated = {
+        name: {"data": [], "interval": interval} for name, interval in windows.items()
+    }
+    accumulators = {
+        name: DecimationAccumulator(interval, KEYS)
+        for name, interval in windows.items()
+    }
+    lock = _HoldTimingLock()
+    decimator = HistoryDecimator(history, decimated, accumulators, lock)
+    for entry in samples[history_len:]:
+        history.append(entry)
+        decimator.step()
+    holds = sorted(lock.holds)
+    return holds[len(holds) // 2]
+
+
+def test_lock_hold_time_flat_as_history_grows():
+    small = min(_lock_hold_s(60) for _ in range(3))
+    large = min(_lock_hold_s(3600) for _ in range(3))
+    # Rescanning the history would make this 60x; allow for timer noise
+    assert large < small * 3 + 50e-6
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from downsampling import ALGORITHMS, downsample, lttb, m4
+
+
+def _entries(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "time": i * 1000.0,
+            "oil_temp": 150 + rng.gauss(0, 1),
+            "turkey_temp": 20 + i * 0.01,
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("algo", sorted(ALGORITHMS))
+def test_returns_input_entries_in_order_within_budget(algo):
+    entries = _entries(5000)
+    sampled = downsample(entries, 200, algo)
+    assert len(sampled) <= 200
+    assert sampled[0] is entries[0]
+    assert sampled[-1] is entries[-1]
+    times = [entry["time"] for entry in sampled]
+    assert times == sorted(set(times))
+
+
+def test_small_inputs_pass_through():
+    entries = _entries(10)
+    assert downsample(entries, 50, "lttb") == entries
+
+
+def test_unknown_algorithm():
+    with pytest.raises(ValueError):
+        downsample(_entries(10), 5, "bogus")
+
+
+@pytest.mark.parametrize("algo", [lttb, m4])
+def test_spike_kept(algo):
+    entries = _entries(5000)
+    entries[1234]["oil_temp"] = 230.0
+    assert entries[1234] in algo(entries, 200)
+
+
+@pytest.mark.parametrize("spike", [385, 405, 410, 500])
+def test_lttb_skips_gaps_instead_of_scoring_zero(spike):
+    # The turkey probe drops out for 200 s; a gap scored as 0 C outweighs
+    # an oil spike next to its edges
+    entries = [
+        {
+            "time": i * 1000.0,
+            "oil_temp": 150.0 + (i % 2) * 0.5,
+            "turkey_temp": None if 400 <= i < 600 else 60.0,
+        }
+        for i in range(1000)
+    ]
+    entries[spike]["oil_temp"] = 160.0
+    assert entries[spike] in lttb(entries, 50)
@@ -0,0 +1,113 @@
+import math
+
+import pytest
+
+from channels import default_registry
+from eta import (
+    STATUS_DONE,
+    STATUS_ESTIMATING,
+    STATUS_FITTING,
+    STATUS_NO_READING,
+    STATUS_UNREACHABLE,
+    EtaPredictor,
+    NewtonFit,
+    time_to_reach,
+)
+from history_buffer import HistoryBuffer
+from snapshot import SnapshotCell
+
+K = 1 / 3600.0  # per second
+
+
+def _turkey(t, start=4.0, env=175.0):
+    return env - (env - start) * math.exp(-K * t)
+
+
+class _Rig:
+    def __init__(self, running=True, target=175.0):
+        channels = default_registry()
+        self.now = 0.0
+        self.history = HistoryBuffer(1000, channels.history_columns())
+        self.status = SnapshotCell({"running": running, "target_temp": target})
+        self.snapshot = SnapshotCell()
+        self.predictor = EtaPredictor(
+            channels,
+            self.history,
+            {"fryer": self.status},
+            self.snapshot,
+            clock=lambda: self.now,
+        )
+
+    def feed(self, seconds, turkey=_turkey, oil=175.0, start=0):
+        for t in range(start, start + seconds):
+            self.now = float(t)
+            self.history.append(
+                {"time": t * 1000.0, "oil_temp": oil, "turkey_temp": turkey(t)}
+            )
+            self.predictor.step()
+
+    def estimate(self):
+        return self.snapshot.get()["turkey"]
+
+
+def test_time_to_reach():
+    assert time_to_reach(4.0, 175.0, 73.9, K) == pytest.approx(
+        math.log((175 - 4) / (175 - 73.9)) * 3600
+    )
+    assert time_to_reach(4.0, 70.0, 73.9, K) is None
+    assert time_to_reach(4.0, 175.0, 73.9, 0.0) is None
+
+
+def test_fit_recovers_k():
+    fit = NewtonFit()
+    for drive in (100.0, 80.0, 60.0, 40.0):
+        fit.update(drive, K * drive)
+    assert fit.k == pytest.approx(K)
+    assert fit.k_stderr == pytest.approx(0.0, abs=1e-9)
+    fit.reset()
+    assert fit.k is None and fit.fits == 0
+
+
+def test_statuses_as_the_cook_goes():
+    rig = _Rig()
+    assert rig.estimate()["status"] == STATUS_NO_READING
+    rig.feed(60)
+    assert rig.estimate()["status"] == STATUS_FITTING
+    rig.feed(600, start=60)
+    estimate = rig.estimate()
+    assert estimate["status"] == STATUS_ESTIMATING
+    expected = time_to_reach(_turkey(659), 175.0, estimate["done_temp"], K)
+    # Interval averages lag the curve a little; a few minutes in hours is fine
+    assert estimate["eta_s"] == pytest.approx(expected, rel=0.05)
+    assert estimate["eta_low_s"] <= estimate["eta_s"] <= estimate["eta_high_s"]
+    # Estimates are republished when an interval closes, not every sample
+    assert rig.now - 30 <= estimate["done_at"] - estimate["eta_s"] <= rig.now
+
+
+def test_done_unreachable_and_new_bird():
+    rig = _Rig()
+    rig.feed(600)
+    fits = rig.estimate()["fits"]
+    assert fits > 0
+    # A fresh cold bird resets the fit
+    rig.feed(120, turkey=lambda t: 4.0, start=600)
+    assert rig.estimate()["fits"] < fits
+    rig.predictor.set_done_temp("turkey", 3.0)
+    assert rig.estimate()["status"] == STATUS_DONE
+    with pytest.raises(KeyError):
+        rig.predictor.set_done_temp("oil", 60.0)
+
+    cold = _Rig(running=True, target=60.0)
+    cold.feed(60, oil=60.0)
+    assert cold.estimate()["status"] == STATUS_UNREACHABLE
+
+
+def test_prime_matches_stepping():
+    stepped = _Rig()
+    stepped.feed(900)
+    primed = _Rig()
+    primed.predictor.prime(
+        {"time": t * 1000.0, "oil_temp": 175.0, "turkey_temp": _turkey(t)}
+        for t in range(900)
+    )
+    assert primed.predictor.fits["turkey"].k == stepped.predictor.fits["turkey"].k
@@ -0,0 +1,61 @@
+import sys
+
+import pytest
+
+from channels import ChannelRegistry, Probe, default_registry
+from hardware import BACKEND_PI, BACKEND_SIM, PiBackend, SimBackend, open_backend
+from thermistor import ThermistorCalibration, get_temp_celsius
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def calibration():
+    return ThermistorCalibration()
+
+
+def test_backend_selection(calibration):
+    channels = default_registry()
+    assert isinstance(open_backend(BACKEND_PI, channels, calibration), PiBackend)
+    assert isinstance(open_backend(BACKEND_SIM, channels, calibration), SimBackend)
+    with pytest.raises(ValueError, match="Unknown hardware backend"):
+        open_backend("arduino", channels, calibration)
+
+
+def test_pi_backend_imports_nothing_until_opened(calibration):
+    open_backend(BACKEND_PI, default_registry(), calibration)
+    assert "gpiozero" not in sys.modules
+    assert "board" not in sys.modules
+
+
+def test_sim_backend_reads_the_plant_and_fires_the_burner(calibration):
+    channels = ChannelRegistry(
+        [Probe("oil", 0), Probe("turkey", 1), Probe("pan", 0, address=0x49)],
+        [("fryer", "oil", 21, 20), ("pan", "pan", 16, 12)],
+    )
+    clock = _Clock()
+    backend = SimBackend(channels, calibration, noise=0.0, seed=0, clock=clock)
+    boards, adc = backend.open_adc(channels.probes)
+    assert len(boards) == 2
+    assert set(adc) == {"oil", "turkey", "pan"}
+    oil = get_temp_celsius(adc["oil"].voltage).temperature_celsius
+    assert oil == pytest.approx(backend.plant.oil_probe, abs=0.5)
+
+    stage1, stage2 = backend.open_relay(21), backend.open_relay(20)
+    backend.open_relay(16).on()  # another zone's relays heat nothing
+    assert backend.plant.stage == 0
+    stage1.on()
+    stage2.on()
+    assert backend.plant.stage == 2
+    clock.now = 600.0
+    heated = get_temp_celsius(adc["oil"].voltage).temperature_celsius
+    assert heated > oil + 10
+    stage2.off()
+    stage1.off()
+    assert backend.plant.stage == 0
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from history_buffer import HistoryBuffer
+
+COLUMNS = ("time", "oil_temp")
+
+
+def test_ring_keeps_newest_and_maps_none():
+    history = HistoryBuffer(3, COLUMNS)
+    for i in range(5):
+        history.append({"time": i * 1000.0, "oil_temp": None if i == 3 else float(i)})
+    assert [entry["time"] for entry in history] == [2000.0, 3000.0, 4000.0]
+    assert history[-2]["oil_temp"] is None
+    assert history.between(3000, 4000) == [{"time": 3000.0, "oil_temp": None}]
+    assert [entry["time"] for entry in history.since(2000)] == [3000.0, 4000.0]
+
+
+def test_extend_matches_append():
+    columns = {
+        "time": [i * 1000.0 for i in range(7)],
+        "oil_temp": [1.0, None, 3.0, 4, 5, 6, 7],
+    }
+    extended = HistoryBuffer(4, COLUMNS)
+    extended.append({"time": -1000.0, "oil_temp": 0.0})
+    extended.extend(columns)
+    appended = HistoryBuffer(4, COLUMNS)
+    appended.append({"time": -1000.0, "oil_temp": 0.0})
+    for i in range(7):
+        appended.append({name: columns[name][i] for name in COLUMNS})
+    assert list(extended) == list(appended)
+
+
+@pytest.mark.parametrize("write", [
+    lambda history: history.append({"time": 5000.0, "oil_temp": "hot"}),
+    lambda history: history.extend({"time": [5000.0], "oil_temp": ["hot"]}),
+])
+def test_failed_write_leaves_readers_unblocked(write):
+    history = HistoryBuffer(3, COLUMNS)
+    history.append({"time": 1000.0, "oil_temp": 20.0})
+    with pytest.raises(TypeError):
+        write(history)
+    result = []
+    reader = threading.Thread(
+        target=lambda: result.append(history.latest("oil_temp")), daemon=True
+    )
+    reader.start()
+    reader.join(1)
+    assert result == [20.0]
+    assert list(history) == [{"time": 1000.0, "oil_temp": 20.0}]
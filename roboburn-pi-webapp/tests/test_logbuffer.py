@@ -0,0 +1,85 @@
+import logging
+
+from logbuffer import LogBuffer, LogBufferHandler
+
+
+def _record(msg, created, level=logging.ERROR):
+    return logging.makeLogRecord(
+        {
+            "msg": msg,
+            "levelno": level,
+            "levelname": logging.getLevelName(level),
+            "module": "test",
+            "created": created,
+        }
+    )
+
+
+def test_repeats_within_window_coalesce():
+    buffer = LogBuffer(coalesce_s=60.0)
+    for t in (0.0, 30.0, 80.0):
+        buffer.append(_record("ADC read failed", 1000.0 + t))
+    entries = buffer.entries()
+    assert len(entries) == 1
+    assert entries[0]["count"] == 3
+    assert entries[0]["last_time"] == 1080.0
+
+
+def test_repeat_outside_window_starts_a_new_line():
+    buffer = LogBuffer(coalesce_s=60.0)
+    buffer.append(_record("ADC read failed", 1000.0))
+    buffer.append(_record("ADC read failed", 1200.0))
+    buffer.append(_record("ADC read failed", 1210.0))
+    entries = buffer.entries()
+    assert [(e["count"], e["time"], e["last_time"]) for e in entries] == [
+        (1, 1000.0, 1000.0),
+        (2, 1200.0, 1210.0),
+    ]
+    assert len({e["id"] for e in entries}) == 2
+
+
+def test_routine_lines_cannot_push_out_errors():
+    buffer = LogBuffer(capacity=5, important_capacity=5)
+    buffer.append(_record("probe lost", 0.0))
+    for i in range(20):
+        buffer.append(_record(f"PID {i}", 1.0 + i, level=logging.INFO))
+    entries = buffer.entries(min_level=logging.WARNING)
+    assert [e["message"] for e in entries] == ["probe lost"]
+    assert len(buffer.entries()) == 6
+
+
+class _Counted:
+    """An argument that counts how often it is turned into text."""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "179.4"
+
+
+def test_args_are_formatted_only_when_read():
+    buffer = LogBuffer()
+    logger = logging.getLogger("test.logbuffer.lazy")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(LogBufferHandler(buffer))
+    value = _Counted()
+    for _ in range(3):
+        logger.info("PID %s | stage_req %s", value, 2)
+    assert value.formatted == 0
+    assert buffer.entries()[0]["message"] == "PID 179.4 | stage_req 2"
+    assert value.formatted == 1
+
+
+def test_repeated_exceptions_coalesce():
+    buffer = LogBuffer()
+    for t in (0.0, 1.0):
+        record = _record("ADC read error: %s", 1000.0 + t)
+        record.args = (OSError(121, "Remote I/O error"),)
+        buffer.append(record)
+    entries = buffer.entries()
+    assert len(entries) == 1
+    assert entries[0]["count"] == 2
+    assert entries[0]["message"] == "ADC read error: [Errno 121] Remote I/O error"
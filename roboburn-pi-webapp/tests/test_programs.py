@@ -0,0 +1,196 @@
+import pytest
+
+from channels import default_registry
+from history_buffer import HistoryBuffer
+from notifier import UpdateNotifier
+from programs import (
+    PHASE_DONE,
+    PHASE_PAUSED,
+    PHASE_RUNNING,
+    PHASE_STOPPED,
+    ProgramRunner,
+    validate_program,
+)
+from snapshot import SnapshotCell
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _Recorder:
+    def __init__(self):
+        self.events = []
+
+    def record_target(self, time_ms, target, zone=0):
+        self.events.append(("target", target))
+
+    def record_running(self, time_ms, running, zone=0):
+        self.events.append(("running", running))
+
+
+class _Rig:
+    """A fryer zone and its probes driven by hand, one runner tick per :meth:`tick`."""
+
+    def __init__(self, path=None):
+        self.channels = default_registry()
+        self.clock = _Clock()
+        self.status = SnapshotCell({"running": False, "target_temp": 20.0})
+        self.history = HistoryBuffer(100, self.channels.history_columns())
+        self.recorder = _Recorder()
+        self.runner = ProgramRunner(
+            self.channels,
+            {"fryer": self.status},
+            self.history,
+            UpdateNotifier(),
+            self.recorder,
+            path=path,
+            clock=self.clock,
+        )
+
+    def tick(self, dt=1.0, oil=None, turkey=None):
+        self.clock.now += dt
+        self.history.append(
+            {"time": self.clock.now * 1000, "oil_temp": oil, "turkey_temp": turkey}
+        )
+        self.runner.step()
+
+    def run(self):
+        return self.runner.state()["runs"]["fryer"]
+
+
+def test_validation_normalizes_and_refuses():
+    channels = default_registry()
+    program = validate_program(
+        {
+            "steps": [
+                {
+                    "target": 135,
+                    "until": {"probe": "turkey", "above": 74, "below": None},
+                }
+            ]
+        },
+        channels,
+    )
+    assert program == {
+        "steps": [{"target": 135.0, "until": {"probe": "turkey", "above": 74.0}}],
+        "finish": "stop",
+    }
+    for bad in (
+        [],
+        {"steps": []},
+        {"steps": [{"target": "hot"}]},
+        {"steps": [{"target": True}]},
+        {"steps": [{"target": 100, "ramp_c_per_min": 0}]},
+        {"steps": [{"target": 100, "hold_s": -1}]},
+        {"steps": [{"target": 100, "until": {"probe": "brisket", "above": 90}}]},
+        {
+            "steps": [
+                {"target": 100, "until": {"probe": "turkey", "above": 70, "below": 60}}
+            ]
+        },
+        {"steps": [{"target": 100}], "finish": "explode"},
+        {"steps": [{"target": 100}], "zone": "smoker"},
+    ):
+        with pytest.raises(ValueError):
+            validate_program(bad, channels)
+
+
+def test_ramp_hold_then_stop():
+    rig = _Rig()
+    rig.runner.put(
+        "soak", {"steps": [{"target": 30, "ramp_c_per_min": 60, "hold_s": 3}]}
+    )
+    assert rig.runner.start("soak") == "fryer"
+    assert rig.status.get()["running"]
+
+    rig.tick(oil=20.0)  # first tick only sets the clock
+    rig.tick(oil=20.0)
+    assert rig.status.get()["target_temp"] == 21.0
+    for _ in range(9):
+        rig.tick(oil=25.0)
+    assert rig.status.get()["target_temp"] == 30.0
+    assert rig.run()["reached_at"] is None  # the oil is not there yet
+
+    rig.tick(oil=29.5)
+    assert rig.run()["reached_at"] == rig.clock.now
+    for _ in range(2):
+        rig.tick(oil=30.0)
+    assert rig.run()["phase"] == PHASE_RUNNING
+    rig.tick(oil=30.0)
+    assert rig.run()["phase"] == PHASE_DONE
+    assert not rig.status.get()["running"]
+    assert rig.recorder.events[0] == ("running", True)
+    assert rig.recorder.events[-1] == ("running", False)
+
+
+def test_until_probe_moves_to_next_step_and_finish_hold():
+    rig = _Rig()
+    rig.runner.put("turkey", {
+        "steps": [
+            {"target": 175, "until": {"probe": "turkey", "above": 74}},
+            {"target": 90},
+        ],
+        "finish": "hold",
+    })
+    rig.runner.start("turkey")
+    rig.tick(oil=175.0, turkey=60.0)
+    assert rig.run()["step"] == 0
+    rig.tick(oil=175.0, turkey=74.5)
+    assert rig.run()["step"] == 1
+    assert rig.status.get()["target_temp"] == 90.0
+    rig.tick(oil=90.5, turkey=75.0)
+    assert rig.run()["phase"] == PHASE_DONE
+    assert rig.status.get()["running"]  # finish "hold" leaves the burner on
+
+
+def test_zone_stop_pauses_and_resume_continues():
+    rig = _Rig()
+    rig.runner.put("soak", {"steps": [{"target": 30, "hold_s": 60}]})
+    rig.runner.start("soak")
+    rig.tick(oil=30.0)
+    rig.tick(oil=30.0)
+    rig.status.update({"running": False})  # the STOP button
+    rig.tick(oil=30.0)
+    run = rig.run()
+    assert (run["phase"], run["reason"]) == (PHASE_PAUSED, "zone stopped")
+    assert not rig.runner.pause("fryer")
+    with pytest.raises(ValueError):
+        rig.runner.delete("soak")
+    with pytest.raises(ValueError):
+        rig.runner.start("soak")
+
+    assert rig.runner.resume("fryer")
+    assert rig.status.get()["running"]
+    rig.tick(dt=100.0, oil=30.0)  # a stalled scheduler is not credited to the hold
+    assert rig.run()["held_s"] == 1.0
+    assert rig.runner.stop("fryer")
+    assert rig.run()["phase"] == PHASE_STOPPED
+    assert rig.runner.delete("soak")
+
+
+def test_restart_comes_back_paused(tmp_path):
+    path = str(tmp_path / "programs.json")
+    rig = _Rig(path)
+    rig.runner.put("soak", {"steps": [{"target": 30}, {"target": 40, "hold_s": 60}]})
+    rig.runner.start("soak")
+    rig.tick(oil=30.0)
+    assert rig.run()["step"] == 1
+
+    restarted = _Rig(path)
+    run = restarted.run()
+    assert (run["phase"], run["reason"], run["step"]) == (PHASE_PAUSED, "restart", 1)
+    assert restarted.runner.resume("fryer")
+    assert restarted.status.get()["running"]
+
+
+@pytest.mark.parametrize("content", ["[]", '"soak"', "null"])
+def test_saved_file_that_is_not_an_object_is_ignored(tmp_path, content):
+    path = tmp_path / "programs.json"
+    path.write_text(content)
+    rig = _Rig(str(path))
+    assert (rig.runner.programs, rig.runner.runs) == ({}, {})
@@ -0,0 +1,101 @@
+import math
+import random
+
+import pytest
+
+from history_buffer import HistoryBuffer
+from pyramid import HistoryPyramid, _buckets, _Level, _merge
+
+KEYS = ("oil_temp", "turkey_temp")
+RETENTION_S = 3600
+
+
+def _samples(n, start_ms=1_700_000_000_500.0):
+    rng = random.Random(0)
+    times = [start_ms + i * 1000.0 + rng.uniform(-200, 200) for i in range(n)]
+    values = {
+        "oil_temp": [
+            150 + 20 * math.sin(i / 300) + rng.gauss(0, 0.3) for i in range(n)
+        ],
+        "turkey_temp": [math.nan if 200 <= i < 260 else 4 + i * 0.01 for i in range(n)],
+    }
+    return times, values
+
+
+def _entry(times, values, i):
+    entry = {"time": times[i]}
+    for key in KEYS:
+        value = values[key][i]
+        entry[key] = None if value != value else value
+    return entry
+
+
+def _pyramid(levels=6):
+    return HistoryPyramid(
+        HistoryBuffer(4, ("time",) + KEYS), KEYS, levels=levels, retention_s=RETENTION_S
+    )
+
+
+def _assert_levels_equal(a, b):
+    for level_a, level_b in zip(a.levels, b.levels):
+        closed_a, closed_b = level_a.buffer[:], level_b.buffer[:]
+        assert len(closed_a) == len(closed_b)
+        for x, y in zip(closed_a + [level_a.summary()], closed_b + [level_b.summary()]):
+            assert x.keys() == y.keys()
+            for column in x:
+                if y[column] is None:
+                    assert x[column] is None
+                else:
+                    assert x[column] == pytest.approx(y[column], rel=1e-12)
+
+
+def test_replay_matches_adding_every_sample():
+    times, values = _samples(2000)
+    added = _pyramid()
+    for i in range(len(times)):
+        added.add(_entry(times, values, i))
+    replayed = _pyramid()
+    replayed.replay(times, values)
+    _assert_levels_equal(replayed, added)
+    interval, entries = replayed.query(count=100)
+    added_interval, added_entries = added.query(count=100)
+    assert (interval, len(entries)) == (added_interval, len(added_entries))
+
+
+def test_merge_matches_bucketing_at_twice_the_width():
+    times, values = _samples(1000)
+    buckets = _buckets(times, values, KEYS, 2000)
+    for width in (4000, 8000, 16000):
+        buckets = _merge(buckets)
+        direct = _buckets(times, values, KEYS, width)
+        assert [b[:2] for b in buckets] == [b[:2] for b in direct]
+        for (_, _, time_sum, stats), (_, _, direct_time_sum, direct_stats) in zip(
+            buckets, direct
+        ):
+            assert time_sum == pytest.approx(direct_time_sum, rel=1e-12)
+            for s, d in zip(stats, direct_stats):
+                assert s[0] == d[0] and s[2:] == d[2:]
+                assert s[1] == pytest.approx(d[1], rel=1e-12)
+
+
+def test_level_drops_samples_older_than_its_open_bucket():
+    level = _Level(2, RETENTION_S, KEYS, "time")
+    for t in (0.0, 1000.0, 2000.0, 4000.0, 1500.0, 3000.0, 4500.0):
+        level.add({"time": t, "oil_temp": t / 100, "turkey_temp": None})
+    closed = level.buffer[:]
+    assert [entry["time"] for entry in closed] == [500.0, 2000.0]
+    assert level.summary()["time"] == 4250.0
+    assert level.summary()["oil_temp_max"] == 45.0
+
+
+def test_query_picks_the_finest_level_within_the_budget():
+    times, values = _samples(2000)
+    pyramid = _pyramid()
+    pyramid.replay(times, values)
+    interval, entries = pyramid.query(count=300)
+    assert interval == 8  # 2000 s in 8 s buckets is 250 or so
+    assert len(entries) <= 300
+    assert [e["time"] for e in entries] == sorted(e["time"] for e in entries)
+    interval, entries = pyramid.query(times[100], times[200], count=1000)
+    assert interval == 2
+    assert all(times[100] <= e["time"] < times[200] for e in entries)
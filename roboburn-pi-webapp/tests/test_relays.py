@@ -0,0 +1,69 @@
+import threading
+
+from relays import RelayAccounting
+from simulation import FakeRelay
+from watchdog import InterlockedRelay
+
+
+class _Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _TrippedWatchdog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tripped = {"check": "over_temp"}
+
+
+def test_refused_start_is_not_counted():
+    clock = _Clock()
+    accounting = RelayAccounting(["stage1"], clock=clock)
+    raw = FakeRelay(17)
+    relay = accounting.wrap("stage1", InterlockedRelay(raw, _TrippedWatchdog()))
+    relay.on()
+    clock.now = 60.0
+    stats = accounting.stats()["relays"]["stage1"]
+    assert raw.value == 0
+    assert stats["starts"] == 0
+    assert stats["on"] is False
+    assert stats["on_time_s"] == 0.0
+
+
+def test_on_time_and_starts():
+    clock = _Clock()
+    accounting = RelayAccounting(["stage1"], clock=clock)
+    relay = accounting.wrap("stage1", FakeRelay(17))
+    relay.on()
+    clock.now = 30.0
+    relay.off()
+    clock.now = 60.0
+    stats = accounting.stats()["relays"]["stage1"]
+    assert stats["starts"] == 1
+    assert stats["on_time_s"] == 30.0
+    assert stats["duty_cycle"] == 0.5
+
+
+def _starts_allowed(accounting, times):
+    allowed = []
+    relay = accounting.wrap("stage1", FakeRelay(17))
+    for now in times:
+        if accounting.allow_on("stage1", now):
+            relay.account.record(True, now)
+            relay.account.record(False, now + 1)
+            allowed.append(now)
+    return allowed
+
+
+def test_budget_is_unpaced_by_default():
+    accounting = RelayAccounting(["stage1"], max_starts=3, clock=_Clock())
+    assert accounting.stats()["min_start_spacing_s"] is None
+    assert _starts_allowed(accounting, [0, 5, 10, 15, 3601]) == [0, 5, 10, 3601]
+
+
+def test_paced_budget_spaces_starts():
+    accounting = RelayAccounting(["stage1"], max_starts=3, paced=True, clock=_Clock())
+    assert _starts_allowed(accounting, [0, 5, 1200, 1205, 2400]) == [0, 1200, 2400]
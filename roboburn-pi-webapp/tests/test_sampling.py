@@ -0,0 +1,101 @@
+import math
+import random
+
+import pytest
+
+from fake_adc import FakeADS1115, FakeAnalogIn
+from sampling import (
+    FILTER_TRIMMED_MEAN,
+    AdcSampler,
+    ChannelStats,
+    median,
+    trimmed_mean,
+)
+
+
+class _FlakyChannel:
+    """An ``AnalogIn`` whose reads fail wherever ``fails`` says, cycling."""
+
+    def __init__(self, fails, voltage=1.5):
+        self.fails = fails
+        self.reads = 0
+        self._voltage = voltage
+
+    @property
+    def voltage(self):
+        failed = self.fails[self.reads % len(self.fails)]
+        self.reads += 1
+        if failed:
+            raise OSError("I2C NACK")
+        return self._voltage
+
+
+def test_median_and_trimmed_mean():
+    assert median([3.0, 1.0, 2.0]) == 2.0
+    assert median([4.0, 1.0, 3.0, 2.0]) == 2.5
+    assert trimmed_mean([1.0, 2.0, 3.0, 4.0, 100.0], 0.2) == 3.0
+    assert trimmed_mean([1.0, 2.0, 3.0, 100.0, -50.0, 4.0], 0.25) == 2.5
+    # Trimming everything away falls back to the plain mean
+    assert trimmed_mean([1.0, 2.0, 3.0, 6.0], 0.5) == 3.0
+    assert trimmed_mean([7.0], 0.25) == 7.0
+
+
+def test_glitches_are_filtered_out():
+    ads = FakeADS1115()
+    oil = FakeAnalogIn(ads, 0, base_voltage=1.2, glitch_rate=0.2, rng=random.Random(0))
+    sampler = AdcSampler([ads], {"oil": oil}, oversample=8)
+    spikes = 0
+    for _ in range(10):
+        assert sampler.read_channel("oil") == 1.2
+        spikes += sampler.channel_stats["oil"].spread > 0
+    assert spikes > 0  # the bursts did contain full-scale spikes
+    assert ads.conversions == 80
+
+
+def test_trimmed_mean_filter_and_data_rate():
+    boards = [FakeADS1115(), FakeADS1115()]
+    channels = {
+        "oil": FakeAnalogIn(boards[0], 0, base_voltage=1.0),
+        "turkey": FakeAnalogIn(boards[1], 0, base_voltage=2.0),
+    }
+    sampler = AdcSampler(
+        boards, channels, oversample=4, filter_name=FILTER_TRIMMED_MEAN, data_rate=860
+    )
+    assert [ads.data_rate for ads in boards] == [860, 860]
+    assert sampler.sample() == {"oil": 1.0, "turkey": 2.0}
+
+
+def test_channel_stats():
+    stats = ChannelStats()
+    stats.update([1.0, 2.0, 3.0, 4.0], 2.5)
+    assert stats.stddev == pytest.approx(math.sqrt(1.25))
+    assert stats.spread == 3.0
+    assert stats.noise_ewma == stats.stddev
+    stats.update([2.0, 2.0], 2.0)
+    assert (stats.stddev, stats.spread) == (0.0, 0.0)
+    assert stats.noise_ewma == pytest.approx(0.9 * math.sqrt(1.25))
+    assert stats.as_dict()["samples"] == 2
+
+
+def test_read_failures():
+    partial = _FlakyChannel([False, True])
+    dead = _FlakyChannel([True])
+    sampler = AdcSampler([], {"oil": partial, "turkey": dead}, oversample=4)
+    # Half the burst failing still yields a reading
+    assert sampler.read_channel("oil") == 1.5
+    assert sampler.stats()["oil"]["failures"] == 2
+    assert sampler.stats()["oil"]["samples"] == 2
+    # The whole burst failing raises the last read error
+    with pytest.raises(OSError, match="NACK"):
+        sampler.read_channel("turkey")
+    assert sampler.stats()["turkey"]["failures"] == 4
+    assert sampler.stats()["turkey"]["voltage"] is None
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"data_rate": 100}, {"filter_name": "mean"}, {"oversample": 0}],
+)
+def test_invalid_settings_are_refused(kwargs):
+    with pytest.raises(ValueError):
+        AdcSampler([FakeADS1115()], {}, **kwargs)
@@ -0,0 +1,97 @@
+import logging
+import threading
+
+from scheduler import Scheduler
+
+
+class _Clock:
+    """Monotonic time that only moves when the scheduler sleeps or a task works."""
+
+    def __init__(self, until):
+        self.now = 0.0
+        self.until = until
+        self.stop = threading.Event()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.now > self.until:
+            self.stop.set()
+
+
+def _scheduler(clock):
+    return Scheduler(
+        logging.getLogger("test.scheduler"), clock=clock, sleep=clock.sleep
+    )
+
+
+def test_control_runs_once_per_sample():
+    clock = _Clock(until=10.0)
+    scheduler = _scheduler(clock)
+    samples, seen = [], []
+    scheduler.add_task("sample", lambda: samples.append(clock.now), period=1.0)
+    scheduler.add_task(
+        "control", lambda: seen.append(samples[-1]), after="sample", period=2.0
+    )
+    scheduler.run_forever(clock.stop)
+    assert samples == [float(t) for t in range(11)]
+    assert seen == samples
+    control = scheduler.stats()["control"]
+    assert control["runs"] == control["triggered_runs"] == len(samples)
+    assert scheduler.stats()["sample"]["max_jitter_s"] == 0.0
+
+
+def test_control_falls_back_to_its_own_period():
+    clock = _Clock(until=10.0)
+    scheduler = _scheduler(clock)
+    runs = []
+    scheduler.add_task("sample", lambda: None, period=10.0)
+    scheduler.add_task(
+        "control", lambda: runs.append(clock.now), after="sample", period=2.0
+    )
+    scheduler.run_forever(clock.stop)
+    # Triggered at 0 and 10, on its own every 2 s while sampling is quiet
+    assert runs == [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+    assert scheduler.stats()["control"]["triggered_runs"] == 2
+
+
+def test_overrun_skips_missed_deadlines():
+    clock = _Clock(until=5.0)
+    scheduler = _scheduler(clock)
+    starts = []
+
+    def sample():
+        starts.append(clock.now)
+        if len(starts) == 2:
+            clock.now += 2.5  # busy through the deadline at 2 s
+
+    scheduler.add_task("sample", sample, period=1.0)
+    scheduler.run_forever(clock.stop)
+    # The 2 s deadline is dropped, not run late back to back with the 3 s one
+    assert starts == [0.0, 1.0, 3.5, 4.0, 5.0]
+    stats = scheduler.stats()["sample"]
+    assert stats["overruns"] == 1
+    assert stats["max_jitter_s"] == 0.5
+    assert stats["max_duration_s"] == 2.5
+
+
+def test_failing_task_does_not_stop_the_others(caplog):
+    clock = _Clock(until=3.0)
+    scheduler = _scheduler(clock)
+    samples, decimated = [], []
+
+    def control():
+        raise RuntimeError("relay board gone")
+
+    scheduler.add_task("sample", lambda: samples.append(clock.now), period=1.0)
+    scheduler.add_task("control", control, after="sample")
+    scheduler.add_task("decimate", lambda: decimated.append(clock.now), after="sample")
+    with caplog.at_level(logging.ERROR, logger="test.scheduler"):
+        scheduler.run_forever(clock.stop)
+    assert samples == decimated == [0.0, 1.0, 2.0, 3.0]
+    stats = scheduler.stats()
+    assert (stats["control"]["runs"], stats["control"]["errors"]) == (4, 4)
+    assert stats["sample"]["errors"] == stats["decimate"]["errors"] == 0
+    assert caplog.messages[0] == "Scheduled task control failed: relay board gone"
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+import pytest
+
+from session_recorder import (
+    HEADER_SIZE,
+    RECORD_RUNNING,
+    RECORD_STAGE,
+    SessionLog,
+    SessionRecorder,
+    list_sessions,
+)
+
+COLUMNS = ("oil_temp", "turkey_temp", "oil_voltage", "turkey_voltage")
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = SessionRecorder(
+        str(tmp_path / "current.rbs"), COLUMNS, flush_interval=3600
+    )
+    recorder.open(start_time_ms=0.0)
+    yield recorder
+    recorder.close()
+
+
+def _sample(time_ms, oil=150.0):
+    return {"time": time_ms, "oil_temp": oil, "turkey_temp": None, "oil_voltage": 1.5}
+
+
+def test_round_trip_with_events(recorder):
+    for i in range(10):
+        recorder.record_sample(_sample(i * 1000.0, 150.0 + i))
+        if i == 4:
+            recorder.record_stage(4500.0, 2, True, True)
+        elif i == 5:
+            recorder.record_running(5500.0, False, zone=1)
+    recorder.flush()
+    log = SessionLog(recorder.path)
+    assert log.times == [i * 1000.0 for i in range(10)]
+    assert log.values["oil_temp"][3] == 153.0
+    assert log.values["turkey_temp"][3] != log.values["turkey_temp"][3]  # NaN
+    assert log.last_event(RECORD_STAGE) == (4500.0, (2.0, 1.0, 1.0))
+    assert log.zone_events(RECORD_RUNNING, zone=1) == [(5500.0, (0.0,))]
+
+
+def test_append_never_writes_on_the_calling_thread(recorder, monkeypatch):
+    writers = []
+    fsync = os.fsync
+    monkeypatch.setattr(
+        os, "fsync", lambda fd: (writers.append(threading.current_thread()), fsync(fd))
+    )
+    recorder.flush_interval = 0.05
+    recorder.close()
+    recorder.open()
+    for i in range(5):
+        recorder.record_sample(_sample(i * 1000.0))
+    deadline = time.monotonic() + 5
+    while len(SessionLog(recorder.path)) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(SessionLog(recorder.path)) == 5
+    assert writers and threading.current_thread() not in writers
+
+
+def test_clock_step_back_keeps_the_file_searchable(recorder):
+    for time_ms in (1000.0, 2000.0, 3000.0, 1500.0, 2500.0, 4000.0):
+        recorder.record_sample(_sample(time_ms))
+    recorder.flush()
+    log = SessionLog(recorder.path)
+    assert log.times == sorted(log.times)
+    assert (
+        SessionLog(recorder.path, start_time=3000.0, end_time=4000.0).times
+        == [3000.0] * 3
+    )
+
+
+def test_reopen_continues_from_the_newest_time(recorder):
+    recorder.record_sample(_sample(5000.0))
+    recorder.close()
+    recorder.open()
+    recorder.record_sample(_sample(1000.0))
+    recorder.flush()
+    assert SessionLog(recorder.path).times == [5000.0, 5000.0]
+
+
+def test_failed_write_is_retried_without_duplicates(recorder, monkeypatch):
+    recorder.record_sample(_sample(1000.0))
+    recorder.flush()
+    recorder.record_sample(_sample(2000.0))
+
+    def fail(fd):
+        raise OSError("card gone")
+
+    monkeypatch.setattr(os, "fsync", fail)
+    with pytest.raises(OSError):
+        recorder.flush()
+    monkeypatch.undo()
+    recorder.record_sample(_sample(3000.0))
+    recorder.flush()
+    assert SessionLog(recorder.path).times == [1000.0, 2000.0, 3000.0]
+
+
+def test_corrupt_logs_are_skipped_in_listings(tmp_path):
+    (tmp_path / "123.rbs").write_bytes(b"garbage" * 200)
+    good = SessionRecorder(str(tmp_path / "456.rbs"), COLUMNS)
+    good.open(start_time_ms=456.0)
+    good.close()
+    assert os.path.getsize(good.path) == HEADER_SIZE
+    assert [info["id"] for info in list_sessions(str(tmp_path))] == ["456"]
@@ -0,0 +1,48 @@
+import math
+import random
+
+import pytest
+
+from thermistor import ThermistorCalibration, get_temp_celsius
+
+
+@pytest.fixture(scope="module")
+def calibration():
+    return ThermistorCalibration()
+
+
+def test_table_matches_exact_formula(calibration):
+    rng = random.Random(0)
+    for _ in range(2000):
+        voltage = rng.uniform(calibration.v_min, calibration.v_max)
+        assert abs(calibration.temperature(voltage) - calibration.exact(voltage)) <= (
+            calibration.max_error + 1e-9
+        )
+
+
+def test_get_temp_celsius_agrees_with_calibration(calibration):
+    reading = get_temp_celsius(1.5)
+    assert reading.temperature_celsius == pytest.approx(calibration.exact(1.5))
+    assert reading.resistance_ohms == pytest.approx(calibration.resistance(1.5))
+
+
+@pytest.mark.parametrize("voltage", [0.0, -0.1, 3.3, 4.0, math.nan])
+def test_invalid_voltages_read_none(calibration, voltage):
+    assert calibration.temperature(voltage) is None
+    assert calibration.resistance(voltage) is None
+    assert calibration.readings([voltage]) == [(None, None)]
+    assert not get_temp_celsius(voltage).is_valid
+
+
+def test_readings_are_plain_tuples(calibration):
+    (temp, resistance), invalid = calibration.readings([1.5, math.nan])
+    assert temp == pytest.approx(calibration.temperature(1.5))
+    assert resistance == pytest.approx(10000 * 1.5 / 1.8)
+    assert invalid == (None, None)
+
+
+def test_cached_table_is_reused(tmp_path):
+    built = ThermistorCalibration(cache_dir=str(tmp_path))
+    cached = ThermistorCalibration(cache_dir=str(tmp_path))
+    assert not built.from_cache and cached.from_cache
+    assert cached.table == built.table
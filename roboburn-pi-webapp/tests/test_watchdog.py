@@ -0,0 +1,190 @@
+import logging
+
+import pytest
+
+from background_workers import BurnerControlWorker
+from channels import default_registry
+from controllers import CONTROLLER_PID
+from notifier import UpdateNotifier
+from relays import RelayAccounting
+from simulation import FakeRelay
+from snapshot import SnapshotCell
+from watchdog import CHECK_OVER_TEMP, CHECK_RATE_OF_RISE, Watchdog
+
+
+class _Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _Recorder:
+    def __init__(self):
+        self.running = []
+
+        self.stages = []
+
+    def record_running(self, time_ms, running, zone=0):
+        self.running.append(running)
+
+    def record_stage(self, time_ms, request_stage, s1_on, s2_on, zone=0):
+        self.stages.append((request_stage, s1_on, s2_on))
+
+
+class _History:
+    """No samples yet: every column reads its default."""
+
+    def latest(self, name, default=None):
+        return default
+
+
+class _TrippingController:
+    """Asks for full fire, and trips the watchdog before the worker switches."""
+
+    name = CONTROLLER_PID
+
+    def __init__(self, watchdog):
+        self.watchdog = watchdog
+
+    def reset(self):
+        pass
+
+    def observe(self, time_ms, temp, stage):
+        pass
+
+    def decide(self, current_temp, target_temp, s1_on, s2_on):
+        self.watchdog.trip(CHECK_OVER_TEMP, "fryer", "tripped mid-step")
+        return 2, 100.0
+
+
+class _Rig:
+    """A fryer zone with its relays wrapped like the app does, checked by hand."""
+
+    def __init__(self, running=True):
+        self.channels = default_registry()
+        zone = self.channels.primary
+        self.clock = _Clock(100.0)
+        self.latest = SnapshotCell()
+        self.status = SnapshotCell({"running": running, "connected": True})
+        self.recorder = _Recorder()
+        logger = logging.getLogger("test.watchdog")
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+        self.watchdog = Watchdog(
+            self.channels, self.latest, {zone.name: self.status}, UpdateNotifier(),
+            self.recorder, logger, max_temp_c=200.0, max_rise_c_per_min=60.0,
+            rise_window_s=10.0, clock=self.clock, wall_clock=self.clock,
+        )
+        self.accounting = RelayAccounting(
+            [zone.relay_stage1, zone.relay_stage2], clock=self.clock
+        )
+        self.raw = FakeRelay(zone.stage1_pin)
+        self.stage1 = self.watchdog.guard(
+            self.accounting.wrap(zone.relay_stage1, self.raw), zone.stage1_pin
+        )
+
+    def sample(self, oil, dt=1.0):
+        self.clock.now += dt
+        self.latest.publish(
+            {"time": self.clock.now * 1000, "oil_temp": oil, "turkey_temp": 20.0}
+        )
+        return self.watchdog.check()
+
+    def stage1_stats(self):
+        return self.accounting.stats()["relays"][self.channels.primary.relay_stage1]
+
+
+def test_over_temp_trips_and_latches():
+    rig = _Rig(running=False)
+    assert rig.sample(190.0) is None
+    trip = rig.sample(201.0)
+    assert trip["check"] == CHECK_OVER_TEMP
+    assert trip["zone"] == "fryer"
+    assert "201.0" in trip["detail"]
+    # Latched: a later pass neither clears nor replaces the trip
+    assert rig.sample(150.0) is trip
+
+
+def test_rate_of_rise_trips_only_while_heating():
+    idle = _Rig(running=False)
+    for i in range(10):
+        assert idle.sample(100.0 + 2 * i) is None  # 120 C/min, but not heating
+
+    rig = _Rig()
+    for i in range(5):
+        assert rig.sample(100.0 + 0.5 * i) is None  # 30 C/min
+    trip = None
+    for i in range(10):
+        trip = rig.sample(102.0 + 2 * i)
+        if trip is not None:
+            break
+    assert trip["check"] == CHECK_RATE_OF_RISE
+    assert not rig.status.get()["running"]
+    assert rig.recorder.running == [False]
+
+
+def test_trip_switches_off_through_the_accounting():
+    rig = _Rig()
+    rig.sample(150.0)
+    rig.stage1.on()
+    assert rig.raw.value == 1
+    rig.clock.now += 30.0
+    rig.sample(250.0, dt=0.0)
+    assert rig.raw.value == 0
+    stats = rig.stage1_stats()
+    assert (stats["on"], stats["starts"], stats["on_time_s"]) == (False, 1, 30.0)
+
+    # Refused while tripped, and not counted as a start
+    rig.stage1.on()
+    assert rig.raw.value == 0
+    assert rig.stage1_stats()["starts"] == 1
+
+
+def test_reset_refused_while_the_cause_is_there():
+    rig = _Rig()
+    rig.sample(250.0)
+    with pytest.raises(ValueError, match="over_temp"):
+        rig.watchdog.reset()
+    rig.sample(180.0)
+    assert rig.watchdog.reset()
+    assert rig.watchdog.tripped is None
+    rig.stage1.on()
+    assert rig.raw.value == 1
+
+
+def test_state_reports_the_latest_sample():
+    rig = _Rig()
+    rig.sample(150.0)
+    rig.stage1.on()
+    zone = rig.watchdog.state()["zones"]["fryer"]
+    assert (zone["temp"], zone["heating"], zone["relays_on"]) == (150.0, True, 1)
+
+
+def test_trip_between_decision_and_switch(caplog):
+    rig = _Rig()
+    rig.status.update({
+        "target_temp": 175.0,
+        "burner_stage1_on": False,
+        "burner_stage2_on": False,
+        "burner_on": False,
+        "burner_request_stage": 0,
+    })
+    worker = BurnerControlWorker(
+        logging.getLogger("test.burner"), _History(), rig.status,
+        {CONTROLLER_PID: _TrippingController(rig.watchdog)}, UpdateNotifier(),
+        rig.recorder, rig.accounting, open_relay=FakeRelay, clock=rig.clock,
+        interlock=rig.watchdog.guard,
+    )
+    worker.setup()
+    with caplog.at_level(logging.INFO, logger="test.burner"):
+        worker.step()
+    # Both starts were refused, so nothing reads as on or as just toggled
+    status = rig.status.get()
+    assert (status["burner_stage1_on"], status["burner_stage2_on"]) == (False, False)
+    assert not status["running"]
+    assert (worker.last_s1_toggle, worker.last_s2_toggle) == (0.0, 0.0)
+    assert not any(" ON" in message for message in caplog.messages)
+    assert rig.recorder.stages == [(2, False, False)]
+    assert rig.stage1_stats()["starts"] == 0
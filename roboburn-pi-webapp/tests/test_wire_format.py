@@ -0,0 +1,98 @@
+import gzip
+import math
+import random
+
+import pytest
+
+from wire_format import (
+    FORMAT_BINARY,
+    FORMAT_JSON,
+    MIME_TYPE,
+    column_decimals,
+    compress,
+    decode_history,
+    encode_history,
+    negotiate,
+)
+
+COLUMNS = ("oil_temp", "turkey_temp", "oil_voltage", "oil_resistance")
+
+
+def _entries(n, start_ms=1.7e12):
+    rng = random.Random(0)
+    return [
+        {
+            "time": start_ms + i * 1000.0 + rng.uniform(-3, 3),
+            "oil_temp": 176 + rng.gauss(0, 0.3),
+            "turkey_temp": None if i % 11 == 5 else 4 + i * 0.01,
+            "oil_voltage": rng.uniform(0.5, 2.5),
+            "oil_resistance": rng.uniform(1e3, 2e5),
+        }
+        for i in range(n)
+    ]
+
+
+def _assert_round_trip(entries, decoded):
+    assert len(decoded) == len(entries)
+    for entry, back in zip(entries, decoded):
+        # Times are kept to the millisecond, from the exact last one
+        assert abs(back["time"] - entry["time"]) <= 0.5
+        for name in COLUMNS:
+            value = entry.get(name)
+            if value is None or value != value:
+                assert back[name] is None
+            else:
+                assert back[name] == pytest.approx(
+                    value, abs=0.5 * 10 ** -column_decimals(name) + 1e-9
+                )
+    assert decoded[-1]["time"] == entries[-1]["time"]
+
+
+def test_round_trip():
+    entries = _entries(500)
+    _assert_round_trip(entries, decode_history(encode_history(entries, COLUMNS)))
+
+
+def test_round_trip_of_missing_nan_and_wide_values():
+    entries = _entries(20)
+    entries[0]["oil_temp"] = None  # no first value to start from
+    entries[3]["oil_temp"] = math.nan
+    entries[4]["oil_temp"] = -40.0
+    entries[5]["oil_temp"] = 900.0  # a jump too wide for 2-byte deltas
+    del entries[6]["oil_voltage"]
+    for entry in entries:
+        entry["turkey_temp"] = None
+    _assert_round_trip(entries, decode_history(encode_history(entries, COLUMNS)))
+
+
+def test_empty_history():
+    assert decode_history(encode_history([], COLUMNS)) == []
+
+
+def test_out_of_range_and_bad_magic():
+    with pytest.raises(ValueError):
+        encode_history(
+            [{"time": 0.0, "oil_temp": 0.0}, {"time": 1.0, "oil_temp": 3e7}],
+            ("oil_temp",),
+        )
+    with pytest.raises(ValueError):
+        decode_history(b"JSON" + encode_history(_entries(2), COLUMNS)[4:])
+
+
+def test_column_decimals():
+    assert column_decimals("oil_temp") == 2
+    assert column_decimals("oil_temp_max") == 2
+    assert column_decimals("oil_voltage") == 4
+    assert column_decimals("oil_resistance") == 0
+    assert column_decimals("duty") == 3
+
+
+def test_negotiate_and_compress():
+    assert negotiate(None, None) == FORMAT_JSON
+    assert negotiate(None, f"{MIME_TYPE}, application/json") == FORMAT_BINARY
+    assert negotiate(FORMAT_JSON, MIME_TYPE) == FORMAT_JSON
+    with pytest.raises(ValueError):
+        negotiate("csv", None)
+    data = encode_history(_entries(100), COLUMNS)
+    assert compress(data) == compress(data)  # no timestamp in the gzip header
+    assert gzip.decompress(compress(data)) == data
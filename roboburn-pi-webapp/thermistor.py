@@ -0,0 +1,381 @@
+"""Thermistor calibration: Steinhart-Hart fit plus a precomputed voltage lookup."""
+
+import hashlib
+import json
+import math
+import os
+from array import array
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class TemperatureReading:
+    """A class to hold temperature and resistance readings from a thermistor."""
+    temperature_celsius: Optional[float]
+    resistance_ohms: Optional[float]
+    
+    @property
+    def is_valid(self) -> bool:
+        """Check if the reading is valid (temperature and resistance are not None)."""
+        return self.temperature_celsius is not None and self.resistance_ohms is not None
+
+# measured points from weber igrill ambient probe (these are cheap and plentiful)
+# resistance in ohms, temp in F
+CALIBRATION_DATA = [
+    (303950, 32.9),
+    (324700, 33.1),
+    (89000, 67.5),
+    (27810, 134.2),
+    (13260, 170.6),
+]
+
+def derive_coefficients(data):
+    """
+    Fits Steinhart-Hart A, B, C coefficients to N data points using
+    Least Squares Regression. (Pure Python, no numpy).
+
+    Model: 1/T = A + B*ln(R) + C*(ln(R)^3)
+    """
+    N = len(data)
+    if N < 3:
+        raise ValueError("Need at least 3 data points for Steinhart-Hart regression.")
+
+    # 1. Prepare the Sums for the Normal Equation Matrix (X.T * X)
+    # We are solving Ax = b where x is [A, B, C]
+    sum_1 = N
+    sum_L = 0.0    # Sum of ln(R)
+    sum_L2 = 0.0   # Sum of ln(R)^2
+    sum_L3 = 0.0   # Sum of ln(R)^3
+    sum_L4 = 0.0
+    sum_L6 = 0.0
+
+    sum_Y = 0.0    # Sum of 1/T
+    sum_YL = 0.0   # Sum of (1/T) * ln(R)
+    sum_YL3 = 0.0  # Sum of (1/T) * ln(R)^3
+
+    for r, t_f in data:
+        # Convert T to Kelvin
+        t_k = (t_f - 32.0) * 5.0 / 9.0 + 273.15
+        y = 1.0 / t_k
+        L = math.log(r)
+
+        # Accumulate powers of L
+        L2 = L * L
+        L3 = L2 * L
+        L4 = L2 * L2
+        L6 = L3 * L3
+
+        sum_L += L
+        sum_L2 += L2
+        sum_L3 += L3
+        sum_L4 += L4
+        sum_L6 += L6
+
+        # Accumulate cross terms with Y
+        sum_Y += y
+        sum_YL += y * L
+        sum_YL3 += y * L3
+
+    # 2. Construct the Matrix (Symmetric) and Vector
+    # Matrix M = [[sum_1, sum_L, sum_L3],
+    #             [sum_L, sum_L2, sum_L4],
+    #             [sum_L3, sum_L4, sum_L6]]
+    M = [
+        [sum_1, sum_L,  sum_L3],
+        [sum_L, sum_L2, sum_L4],
+        [sum_L3, sum_L4, sum_L6]
+    ]
+
+    # Vector V = [sum_Y, sum_YL, sum_YL3]
+    V = [sum_Y, sum_YL, sum_YL3]
+
+    # 3. Solve M * [A,B,C] = V using Gaussian Elimination (Standard Linear Algebra)
+    # We pivot to solve for unknowns.
+
+    n_vars = 3
+    # Forward Elimination
+    for i in range(n_vars):
+        # Pivot
+        pivot = M[i][i]
+        for j in range(i + 1, n_vars):
+            factor = M[j][i] / pivot
+            V[j] -= factor * V[i]
+            for k in range(i, n_vars):
+                M[j][k] -= factor * M[i][k]
+
+    # Back Substitution
+    solution = [0.0] * n_vars
+    for i in range(n_vars - 1, -1, -1):
+        sum_ax = sum(M[i][j] * solution[j] for j in range(i + 1, n_vars))
+        solution[i] = (V[i] - sum_ax) / M[i][i]
+
+    # Unpack coefficients
+    A, B, C = solution
+    return A, B, C
+
+# Calculate defaults based on probe
+DEF_A, DEF_B, DEF_C = derive_coefficients(CALIBRATION_DATA)
+
+
+def _divider_resistance(voltage, r_fixed, system_voltage):
+    """Thermistor resistance for a divider voltage, or None if out of range.
+
+    A voltage of 0 means infinite resistance and ``system_voltage`` a short;
+    NaN (a failed read) fails the comparison too.
+    """
+    if not 0 < voltage < system_voltage:
+        return None
+    # V_out = V_in * (R_therm / (R_fixed + R_therm))
+    # => R_therm = R_fixed * (V_out / (V_in - V_out))
+    return r_fixed * (voltage / (system_voltage - voltage))
+
+
+def _steinhart_hart(voltage, r_fixed, system_voltage, coefficients):
+    """Exact temperature in Celsius for a divider voltage, or None if out of range."""
+    r_thermistor = _divider_resistance(voltage, r_fixed, system_voltage)
+    if r_thermistor is None:
+        return None
+    sh_a, sh_b, sh_c = coefficients
+    try:
+        ln_r = math.log(r_thermistor)
+        return (1.0 / (sh_a + (sh_b * ln_r) + (sh_c * (ln_r ** 3)))) - 273.15
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def get_temp_celsius(
+    voltage: float,
+    r_fixed: float = 10000,
+    system_voltage: float = 3.3,
+    sh_a: float = DEF_A,
+    sh_b: float = DEF_B,
+    sh_c: float = DEF_C,
+) -> TemperatureReading:
+    """
+    Converts measured Voltage to Celsius using Steinhart-Hart equation.
+
+    Args:
+        voltage: The actual voltage measured at the pin (e.g., 2.15).
+        r_fixed: The fixed resistor value in Ohms (default 10k).
+        system_voltage: The voltage powering the divider (default 3.3V).
+        sh_a, sh_b, sh_c: Thermistor Steinhart-Hart coefficients.
+
+    Returns:
+        TemperatureReading: An object containing temperature in Celsius and
+        resistance in ohms.
+    """
+    temp_celsius = _steinhart_hart(voltage, r_fixed, system_voltage, (sh_a, sh_b, sh_c))
+    if temp_celsius is None:
+        return TemperatureReading(temperature_celsius=None, resistance_ohms=None)
+    return TemperatureReading(
+        temperature_celsius=temp_celsius,
+        resistance_ohms=_divider_resistance(voltage, r_fixed, system_voltage),
+    )
+
+
+# Span covered by the lookup table; voltages outside it use the exact formula.
+# Table size 4096 keeps the interpolation error well under 0.01 C for the
+# default probe and divider.
+LUT_MIN_TEMP_C = -10.0
+LUT_MAX_TEMP_C = 300.0
+LUT_SIZE = 4096
+# Bump when the table layout or build procedure changes to invalidate caches
+LUT_CACHE_VERSION = 1
+
+
+def _voltage_for_temp(temp_c, r_fixed, system_voltage, coefficients):
+    """Divider voltage at which the probe reads ``temp_c``, found by bisection.
+
+    The thermistor is on the low side of the divider, so temperature falls
+    monotonically as the voltage rises.
+    """
+    lo, hi = 0.0, system_voltage
+    for _ in range(64):
+        mid = (lo + hi) / 2
+        temp = _steinhart_hart(mid, r_fixed, system_voltage, coefficients)
+        if temp is not None and temp > temp_c:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+class ThermistorCalibration:
+    """Voltage to temperature conversion through a dense, interpolated lookup table.
+
+    The table holds the exact Steinhart-Hart temperature at ``size`` voltages
+    evenly spaced over the span between ``max_temp`` and ``min_temp``, so a
+    conversion is one multiply, one truncation and a linear interpolation
+    instead of a log and a cubic. ``max_error`` is the worst deviation from
+    the exact formula found at the interval midpoints when the table was
+    built. If ``cache_dir`` is given the table is stored there under a hash
+    of the calibration points and divider parameters and read back on the
+    next start instead of being rebuilt.
+    """
+
+    def __init__(
+        self,
+        calibration_data=CALIBRATION_DATA,
+        r_fixed=10000,
+        system_voltage=3.3,
+        size=LUT_SIZE,
+        min_temp=LUT_MIN_TEMP_C,
+        max_temp=LUT_MAX_TEMP_C,
+        cache_dir=None,
+    ):
+        if size < 2:
+            raise ValueError("Lookup table needs at least 2 points.")
+        self.calibration_data = [tuple(point) for point in calibration_data]
+        self.r_fixed = r_fixed
+        self.system_voltage = system_voltage
+        self.size = size
+        self.min_temp = min_temp
+        self.max_temp = max_temp
+        self.coefficients = derive_coefficients(self.calibration_data)
+        self.v_min = _voltage_for_temp(
+            max_temp, r_fixed, system_voltage, self.coefficients
+        )
+        self.v_max = _voltage_for_temp(
+            min_temp, r_fixed, system_voltage, self.coefficients
+        )
+        step = (self.v_max - self.v_min) / (size - 1)
+        self._inv_step = 1.0 / step
+        self._last_index = size - 1
+        self.table = None
+        self.max_error = None
+        self.from_cache = False
+
+        cache_path = None
+        if cache_dir is not None:
+            cache_path = os.path.join(cache_dir, f"thermistor-{self.cache_key()}.lut")
+            self.from_cache = self._load(cache_path)
+        if not self.from_cache:
+            self._build(step)
+            if cache_path is not None:
+                self._save(cache_path)
+
+    def cache_key(self):
+        payload = json.dumps(
+            {
+                "version": LUT_CACHE_VERSION,
+                "calibration": self.calibration_data,
+                "r_fixed": self.r_fixed,
+                "system_voltage": self.system_voltage,
+                "size": self.size,
+                "min_temp": self.min_temp,
+                "max_temp": self.max_temp,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def exact(self, voltage):
+        """Temperature from the Steinhart-Hart formula, bypassing the table."""
+        return _steinhart_hart(
+            voltage, self.r_fixed, self.system_voltage, self.coefficients
+        )
+
+    def _build(self, step):
+        v_min = self.v_min
+        self.table = array(
+            "d", (self.exact(v_min + i * step) for i in range(self.size))
+        )
+        table = self.table
+        self.max_error = max(
+            abs((table[i] + table[i + 1]) / 2 - self.exact(v_min + (i + 0.5) * step))
+            for i in range(self.size - 1)
+        )
+
+    def _load(self, path):
+        # Layout: max_error followed by the table, native doubles
+        data = array("d")
+        try:
+            with open(path, "rb") as f:
+                data.fromfile(f, self.size + 1)
+        except (OSError, EOFError):
+            return False
+        self.max_error = data[0]
+        self.table = data[1:]
+        return True
+
+    def _save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            array("d", [self.max_error]).tofile(f)
+            self.table.tofile(f)
+        os.replace(tmp_path, path)
+
+    def temperature(self, voltage):
+        """Temperature in Celsius for one divider voltage, or None if out of range."""
+        offset = (voltage - self.v_min) * self._inv_step
+        if 0.0 <= offset < self._last_index:
+            i = int(offset)
+            low = self.table[i]
+            return low + (self.table[i + 1] - low) * (offset - i)
+        return self.exact(voltage)
+
+    def convert_many(self, voltages):
+        """Temperatures for a whole sequence of voltages (None where out of range)."""
+        table = self.table
+        v_min = self.v_min
+        inv_step = self._inv_step
+        last_index = self._last_index
+        exact = self.exact
+        temps = []
+        append = temps.append
+        for voltage in voltages:
+            offset = (voltage - v_min) * inv_step
+            if 0.0 <= offset < last_index:
+                i = int(offset)
+                low = table[i]
+                append(low + (table[i + 1] - low) * (offset - i))
+            else:
+                append(exact(voltage))
+        return temps
+
+    def resistance(self, voltage):
+        return _divider_resistance(voltage, self.r_fixed, self.system_voltage)
+
+    def readings(self, voltages):
+        """``(temperature, resistance)`` for each voltage, converted as one batch.
+
+        Plain tuples, ``(None, None)`` where a voltage is out of range, so
+        the per-sample path allocates no reading objects.
+        """
+        voltages = list(voltages)
+        r_fixed = self.r_fixed
+        system_voltage = self.system_voltage
+        return [
+            (None, None) if temp is None
+            else (temp, r_fixed * (voltage / (system_voltage - voltage)))
+            for voltage, temp in zip(voltages, self.convert_many(voltages))
+        ]
+
+
+if __name__ == "__main__":
+    # Per-sample cost of the table against the exact formula
+    import random
+    import timeit
+
+    calibration = ThermistorCalibration()
+    rng = random.Random(0)
+    voltages = [rng.uniform(calibration.v_min, calibration.v_max) for _ in range(10000)]
+    n = len(voltages)
+    print(f"Coeffs -> A: {calibration.coefficients[0]:.9f}, "
+          f"B: {calibration.coefficients[1]:.9f}, C: {calibration.coefficients[2]:.9f}")
+    print(
+        f"Table {calibration.size} points,"
+        f" {calibration.v_min:.4f}-{calibration.v_max:.4f} V, "
+        f"max interpolation error {calibration.max_error:.6f} C"
+    )
+    runs = {
+        "get_temp_celsius": lambda: [get_temp_celsius(v) for v in voltages],
+        "exact": lambda: [calibration.exact(v) for v in voltages],
+        "temperature": lambda: [calibration.temperature(v) for v in voltages],
+        "convert_many": lambda: calibration.convert_many(voltages),
+        "readings": lambda: calibration.readings(voltages),
+    }
+    for name, run in runs.items():
+        best = min(timeit.repeat(run, number=5, repeat=3)) / (5 * n)
+        print(f"{name:>17}: {best * 1e9:8.1f} ns/sample")
@@ -0,0 +1,388 @@
+"""Safety watchdog that can switch every burner off from its own thread.
+
+The control task only acts as often, and only as long, as the scheduler
+thread it runs on keeps running, and the temperature worker only stops the
+zones after 60 s of ADC failures. The watchdog is a separate thread that
+checks every ``interval_s`` and trips on:
+
+- ``over_temp``: a zone's probe above ``max_temp_c``
+- ``rate_of_rise``: a zone's probe rising faster than
+  ``max_rise_c_per_min`` over ``rise_window_s`` (a probe out of the oil and
+  in the flame, or a runaway)
+- ``stale_samples``: no new sample for ``stale_s`` (the sampler or the
+  scheduler thread is stuck)
+- ``sensor``: a zone's ADC failing for ``sensor_timeout_s``
+- ``heartbeat``: a zone's control task not stepping for
+  ``heartbeat_timeout_s``
+- ``error``: the checks themselves failing
+
+All but ``over_temp`` only trip while the zone is heating, i.e. running or
+with a relay on. Relays wrapped by :meth:`Watchdog.guard` switch on only
+under the watchdog's lock and only while it is not tripped, so a trip
+switches every one of them off with nothing able to switch back on after
+it. It then stops every zone and stays latched until :meth:`Watchdog.reset`,
+which refuses while the cause is still there.
+
+The checks read the latest sample from the snapshot the temperature worker
+publishes, never from the history ring: a seqlock reader retries until the
+writer is done, and a ``SCHED_FIFO`` thread spinning on one would keep the
+writer off a single-core Pi Zero's only CPU.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import NULL_REGISTRY
+from notifier import TOPIC_STATUS
+
+CHECK_OVER_TEMP = "over_temp"
+CHECK_RATE_OF_RISE = "rate_of_rise"
+CHECK_STALE_SAMPLES = "stale_samples"
+CHECK_SENSOR = "sensor"
+CHECK_HEARTBEAT = "heartbeat"
+CHECK_ERROR = "error"
+
+INTERVAL_S = 0.1
+# 425°F: above any frying target, below the smoke point of peanut oil
+MAX_TEMP_C = 218.0
+# A full burner heats a pot a few degrees a minute; a bare probe in the
+# flame climbs far faster
+MAX_RISE_C_PER_MIN = 60.0
+RISE_WINDOW_S = 10.0
+STALE_S = 5.0
+SENSOR_TIMEOUT_S = 10.0
+HEARTBEAT_TIMEOUT_S = 5.0
+# SCHED_FIFO priority tried for the watchdog thread (needs CAP_SYS_NICE)
+REALTIME_PRIORITY = 1
+
+
+class InterlockedRelay:
+    """A relay that only switches on while its watchdog is not tripped.
+
+    It is the outermost wrapper, so a refused start never reaches the
+    relay's accounting and a forced off is accounted like any other.
+    """
+
+    def __init__(self, relay, watchdog):
+        self.relay = relay
+        self.watchdog = watchdog
+        self.is_on = False
+
+    def on(self):
+        with self.watchdog._lock:
+            if self.watchdog.tripped is None:
+                self.relay.on()
+                self.is_on = True
+
+    def off(self):
+        with self.watchdog._lock:
+            self._off()
+
+    def _off(self):
+        self.relay.off()
+        self.is_on = False
+
+
+class Watchdog:
+    """Runs the safety checks of every zone on a thread of its own.
+
+    ``temperature_data`` is the :class:`snapshot.SnapshotCell` holding the
+    newest sample. ``zone_status`` maps zone names to
+    :class:`snapshot.SnapshotCell` statuses, which a trip stops (recorded
+    through ``recorder`` and announced through ``notifier``). Heartbeats and
+    timeouts use ``clock`` (monotonic seconds), so a wall-clock step cannot
+    trip or mask them; the trip record is stamped with ``wall_clock``. Check
+    pass times and trips go to ``metrics``.
+    """
+
+    def __init__(
+        self,
+        channels,
+        temperature_data,
+        zone_status,
+        notifier,
+        recorder,
+        logger,
+        max_temp_c=MAX_TEMP_C,
+        max_rise_c_per_min=MAX_RISE_C_PER_MIN,
+        rise_window_s=RISE_WINDOW_S,
+        stale_s=STALE_S,
+        sensor_timeout_s=SENSOR_TIMEOUT_S,
+        heartbeat_timeout_s=HEARTBEAT_TIMEOUT_S,
+        interval_s=INTERVAL_S,
+        time_key="time",
+        clock=time.monotonic,
+        wall_clock=time.time,
+        metrics=NULL_REGISTRY,
+    ):
+        self.channels = channels
+        self.temperature_data = temperature_data
+        self.zone_status = zone_status
+        self.notifier = notifier
+        self.recorder = recorder
+        self.logger = logger
+        self.max_temp_c = max_temp_c
+        self.max_rise_c_per_min = max_rise_c_per_min
+        self.rise_window_s = rise_window_s
+        self.stale_s = stale_s
+        self.sensor_timeout_s = sensor_timeout_s
+        self.heartbeat_timeout_s = heartbeat_timeout_s
+        self.interval_s = interval_s
+        self.time_key = time_key
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.tripped = None
+        self.relays = {name: [] for name in channels.zones}
+        self._zone_by_pin = {
+            pin: zone.name
+            for zone in channels.zones.values()
+            for pin in (zone.stage1_pin, zone.stage2_pin)
+        }
+        self._beats = {}
+        self._disconnected_since = {}
+        self._recent = {
+            name: deque() for name in channels.zones
+        }  # (time ms, temp) per zone
+        self._last_sample_time = None
+        self._last_sample_at = clock()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.check_time = metrics.histogram(
+            "roboburn_watchdog_check_seconds", "One pass of the safety checks"
+        )
+        self.trips = {
+            check: metrics.counter(
+                "roboburn_watchdog_trips_total", "Safety watchdog trips", check=check
+            )
+            for check in (
+                CHECK_OVER_TEMP,
+                CHECK_RATE_OF_RISE,
+                CHECK_STALE_SAMPLES,
+                CHECK_SENSOR,
+                CHECK_HEARTBEAT,
+                CHECK_ERROR,
+            )
+        }
+
+    def guard(self, relay, pin):
+        """Interlock ``relay`` (``on()``/``off()``), the stage relay on ``pin``."""
+        interlocked = InterlockedRelay(relay, self)
+        self.relays[self._zone_by_pin[pin]].append(interlocked)
+        return interlocked
+
+    def heartbeat(self, zone):
+        """Callable for ``zone``'s control worker to call on every step."""
+        def beat():
+            self._beats[zone] = self.clock()
+        return beat
+
+    def start(self):
+        self._last_sample_at = self.clock()
+        self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(REALTIME_PRIORITY))
+        except (AttributeError, OSError) as e:
+            self.logger.info("Watchdog thread runs at normal priority (%s).", e)
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.check()
+            except Exception as e:
+                self.trip(CHECK_ERROR, None, f"check failed: {e!r}", self.clock())
+
+    def check(self):
+        """One pass over every check, tripping on the first that fails.
+
+        Returns the trip or None.
+        """
+        with self.check_time.time():
+            now = self.clock()
+            sample = self.temperature_data.get()
+            with self._lock:
+                self._observe(now, sample)
+                problem = self._problem(now, sample, heating_only=True)
+            if problem is not None and self.tripped is None:
+                self.trip(*problem, now)
+        return self.tripped
+
+    def _observe(self, now, sample):
+        sample_time = sample.get(self.time_key)
+        if sample_time is None or sample_time == self._last_sample_time:
+            return
+        self._last_sample_time = sample_time
+        self._last_sample_at = now
+        horizon = sample_time - self.rise_window_s * 1000
+        for zone in self.channels.zones.values():
+            recent = self._recent[zone.name]
+            temp = sample.get(zone.probe.temp_key)
+            if temp is not None:
+                recent.append((sample_time, temp))
+            while recent and recent[0][0] < horizon:
+                recent.popleft()
+
+    def _rise_c_per_min(self, zone):
+        recent = self._recent[zone]
+        if len(recent) < 2:
+            return None
+        (first_time, first_temp), (last_time, last_temp) = recent[0], recent[-1]
+        span_s = (last_time - first_time) / 1000
+        # Over less than half the window, noise counts for too much
+        if span_s < self.rise_window_s / 2:
+            return None
+        return (last_temp - first_temp) / span_s * 60
+
+    def _heating(self, zone, status):
+        return status["running"] or any(relay.is_on for relay in self.relays[zone])
+
+    def _problem(self, now, sample, heating_only):
+        """``(check, zone, detail)`` of the first failing check, or None.
+
+        With ``heating_only`` the checks other than ``over_temp`` are skipped
+        for zones that are not heating.
+        """
+        for zone in self.channels.zones.values():
+            name = zone.name
+            status = self.zone_status[name].get()
+            if status["connected"]:
+                self._disconnected_since.pop(name, None)
+            else:
+                self._disconnected_since.setdefault(name, now)
+            temp = sample.get(zone.probe.temp_key)
+            if temp is not None and temp > self.max_temp_c:
+                return (
+                    CHECK_OVER_TEMP,
+                    name,
+                    f"{zone.probe.name} at {temp:.1f} C"
+                    f" (limit {self.max_temp_c:.1f} C)",
+                )
+            if heating_only and not self._heating(name, status):
+                continue
+            rise = self._rise_c_per_min(name)
+            if rise is not None and rise > self.max_rise_c_per_min:
+                return (
+                    CHECK_RATE_OF_RISE,
+                    name,
+                    f"{zone.probe.name} rising {rise:.0f} C/min"
+                    f" (limit {self.max_rise_c_per_min:.0f} C/min)",
+                )
+            if now - self._last_sample_at > self.stale_s:
+                return (
+                    CHECK_STALE_SAMPLES,
+                    name,
+                    f"no new sample for {now - self._last_sample_at:.1f}s",
+                )
+            since = self._disconnected_since.get(name)
+            if since is not None and now - since > self.sensor_timeout_s:
+                return CHECK_SENSOR, name, f"ADC failing for {now - since:.1f}s"
+            beat = self._beats.get(name)
+            if beat is not None and now - beat > self.heartbeat_timeout_s:
+                return (
+                    CHECK_HEARTBEAT,
+                    name,
+                    f"control task silent for {now - beat:.1f}s",
+                )
+        return None
+
+    def trip(self, check, zone, detail, detected_at=None):
+        """Switch every relay off, stop every zone and latch.
+
+        Returns False if already tripped.
+        """
+        with self._lock:
+            if self.tripped is not None:
+                return False
+            for relays in self.relays.values():
+                for relay in relays:
+                    relay._off()
+            cutoff = self.clock()
+            self.tripped = {
+                "check": check,
+                "zone": zone,
+                "detail": detail,
+                "at": self.wall_clock(),
+                "cutoff_s": None if detected_at is None else cutoff - detected_at,
+            }
+        self.trips[check].inc()
+        self.logger.error(
+            "Safety watchdog tripped (%s): %s. Burners off, every zone stopped.",
+            f"{check}, {zone}" if zone else check,
+            detail,
+        )
+        now_ms = self.wall_clock() * 1000
+        for name, cell in self.zone_status.items():
+            with cell.edit() as status:
+                was_running = status["running"]
+                status["running"] = False
+            if was_running:
+                self.recorder.record_running(
+                    now_ms, False, self.channels.zones[name].index
+                )
+        self.notifier.notify(TOPIC_STATUS)
+        return True
+
+    def reset(self):
+        """Clear a trip; returns False if there was none.
+
+        Every check is run for every zone, heating or not, and ``ValueError``
+        is raised while one still fails.
+        """
+        with self._lock:
+            if self.tripped is None:
+                return False
+            now = self.clock()
+            sample = self.temperature_data.get()
+            self._observe(now, sample)
+            problem = self._problem(now, sample, heating_only=False)
+            if problem is not None:
+                check, zone, detail = problem
+                raise ValueError(
+                    f"Still failing {check}{f' ({zone})' if zone else ''}: {detail}"
+                )
+            self.tripped = None
+        self.logger.info("Safety watchdog reset.")
+        self.notifier.notify(TOPIC_STATUS)
+        return True
+
+    def state(self):
+        """The trip (or None), the limits and what each check currently sees."""
+        with self._lock:
+            now = self.clock()
+            sample = self.temperature_data.get()
+            zones = {}
+            for zone in self.channels.zones.values():
+                name = zone.name
+                beat = self._beats.get(name)
+                since = self._disconnected_since.get(name)
+                zones[name] = {
+                    "heating": self._heating(name, self.zone_status[name].get()),
+                    "temp": sample.get(zone.probe.temp_key),
+                    "rise_c_per_min": self._rise_c_per_min(name),
+                    "heartbeat_age_s": None if beat is None else now - beat,
+                    "sensor_failing_s": None if since is None else now - since,
+                    "relays_on": sum(relay.is_on for relay in self.relays[name]),
+                }
+            return {
+                "tripped": self.tripped,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "sample_age_s": now - self._last_sample_at,
+                "limits": {
+                    "max_temp_c": self.max_temp_c,
+                    "max_rise_c_per_min": self.max_rise_c_per_min,
+                    "rise_window_s": self.rise_window_s,
+                    "stale_s": self.stale_s,
+                    "sensor_timeout_s": self.sensor_timeout_s,
+                    "heartbeat_timeout_s": self.heartbeat_timeout_s,
+                    "interval_s": self.interval_s,
+                },
+                "zones": zones,
+            }
@@ -0,0 +1,274 @@
+"""Compact binary encoding of history entries for slow links.
+
+``/temperature_history`` (and the session history) normally answer with a
+JSON list of entry objects, which repeats every key name and prints every
+float in full. With ``?format=binary`` or ``Accept: application/x-roboburn-history``
+the same entries go out columnar instead:
+
+- header: magic ``RBH1``, row count (u32), column count (u16) and the
+  last timestamp (f64, ms), which the others are whole-millisecond offsets
+  from
+- timestamps: the change in offset from the previous row (from 0 for the
+  first), as i32
+- then per column: its name (u8 length + UTF-8), the decimal places it was
+  rounded to (u8), the value width (u8, 2 or 4 bytes), the first value as
+  a fixed-point i32 and one fixed-point delta from the previous non-missing
+  value per row, with the width's most negative value marking a missing
+  one
+
+Everything is little-endian. Temperatures go to 0.01 C, so a 1 Hz oil
+trace is mostly 2-byte deltas of a few units, which gzip (on by default for
+clients that accept it) shrinks a good deal further. The decoder lives in
+``templates/index.html``.
+"""
+
+import gzip
+import struct
+import sys
+from array import array
+
+MIME_TYPE = "application/x-roboburn-history"
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+FORMATS = (FORMAT_JSON, FORMAT_BINARY)
+MAGIC = b"RBH1"
+GZIP_LEVEL = 5
+
+_HEADER = struct.Struct("<4sIHd")
+_COLUMN = struct.Struct("<BBi")
+# Decimal places kept per column kind: 0.01 C, 0.1 mV (the ADS1115 LSB at
+# gain 1 is 0.125 mV) and 1 ohm
+_DECIMALS = (("_temp", 2), ("_voltage", 4), ("_resistance", 0))
+_DEFAULT_DECIMALS = 3
+# Typecode, missing-value marker and range of each value width
+_WIDTHS = ((2, "h", -(2 ** 15)), (4, "i", -(2 ** 31)))
+
+
+def column_decimals(name):
+    if name.endswith(("_min", "_max")):
+        name = name[:-4]  # a pyramid bucket's extremes
+    for suffix, decimals in _DECIMALS:
+        if name.endswith(suffix):
+            return decimals
+    return _DEFAULT_DECIMALS
+
+
+def _fixed_point_deltas(values, decimals):
+    """First fixed-point value and per-row deltas from the previous present value.
+
+    Missing values are None.
+    """
+    scale = 10 ** decimals
+    base = None
+    previous = 0
+    deltas = []
+    append = deltas.append
+    for value in values:
+        if value is None or value != value:  # None or NaN
+            append(None)
+            continue
+        fixed = round(value * scale)
+        if base is None:
+            base = previous = fixed
+        append(fixed - previous)
+        previous = fixed
+    return (0 if base is None else base), deltas
+
+
+def _pack(deltas):
+    """``(width, bytes)`` of the deltas in the narrowest width that holds them."""
+    present = [d for d in deltas if d is not None]
+    largest = max((abs(d) for d in present), default=0)
+    for width, typecode, missing in _WIDTHS:
+        if largest < -missing:
+            packed = array(typecode, [missing if d is None else d for d in deltas])
+            break
+    else:
+        raise ValueError("History value out of range for the binary format")
+    if packed.itemsize != width:
+        raise RuntimeError(f"array {typecode!r} is not {width} bytes on this platform")
+    return width, _little_endian(packed)
+
+
+def _little_endian(packed):
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(typecode, raw):
+    values = array(typecode)
+    values.frombytes(raw)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def encode_history(entries, columns, time_key="time"):
+    """Binary history of ``entries`` (time-sorted dicts).
+
+    ``columns`` (besides time) are encoded in order; columns missing from an
+    entry are encoded as missing values.
+    """
+    rows = len(entries)
+    times = [entry[time_key] for entry in entries]
+    last = times[-1] if rows else 0.0
+    # Offsets are rounded from the last timestamp, so rounding never
+    # accumulates and the newest time (a client's next ?since=) is exact
+    offsets = [round(t - last) for t in times]
+    time_deltas = array("i", [b - a for a, b in zip([0] + offsets, offsets)])
+    parts = [_HEADER.pack(MAGIC, rows, len(columns), last), _little_endian(time_deltas)]
+    for name in columns:
+        decimals = column_decimals(name)
+        base, deltas = _fixed_point_deltas(
+            [entry.get(name) for entry in entries], decimals
+        )
+        width, packed = _pack(deltas)
+        encoded = name.encode("utf-8")
+        parts.append(
+            bytes((len(encoded),)) + encoded + _COLUMN.pack(decimals, width, base)
+        )
+        parts.append(packed)
+    return b"".join(parts)
+
+
+def decode_history(data, time_key="time"):
+    """Entries from :func:`encode_history` output.
+
+    This is the Python twin of the page's decoder.
+    """
+    magic, rows, n_columns, last = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary history")
+    offset = _HEADER.size
+    time_deltas = _unpack("i", data[offset:offset + 4 * rows])
+    offset += 4 * rows
+    entries = []
+    elapsed = 0
+    for delta in time_deltas:
+        elapsed += delta
+        entries.append({time_key: last + elapsed})
+    for _ in range(n_columns):
+        length = data[offset]
+        name = data[offset + 1:offset + 1 + length].decode("utf-8")
+        offset += 1 + length
+        decimals, width, value = _COLUMN.unpack_from(data, offset)
+        offset += _COLUMN.size
+        _, typecode, missing = next(w for w in _WIDTHS if w[0] == width)
+        deltas = _unpack(typecode, data[offset:offset + width * rows])
+        offset += width * rows
+        scale = 10 ** decimals
+        for entry, delta in zip(entries, deltas):
+            if delta == missing:
+                entry[name] = None
+            else:
+                value += delta
+                entry[name] = value / scale
+    return entries
+
+
+def negotiate(format_arg, accept):
+    """Requested format: ``format_arg`` (``?format=``) wins, then the ``Accept`` header.
+
+    Raises ``ValueError`` for an unknown ``format_arg``.
+    """
+    if format_arg is not None:
+        if format_arg not in FORMATS:
+            raise ValueError(f"Unknown format '{format_arg}'")
+        return format_arg
+    return FORMAT_BINARY if MIME_TYPE in (accept or "") else FORMAT_JSON
+
+
+def compress(data):
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _benchmark(repeats=20):
+    """Bytes and encode time of a full history in each format.
+
+    Compared against ``app.json.dumps``.
+    """
+    import random
+    import time
+
+    import app as webapp
+    from channels import default_registry
+
+    registry = default_registry()
+    columns = [c for c in registry.history_columns() if c != "time"]
+    rng = random.Random(0)
+    now = time.time() * 1000
+
+    def sample(t, temp_keys_only=False):
+        entry = {"time": t}
+        for probe in registry.probes:
+            temp = (
+                176.7 + rng.gauss(0, 0.3)
+                if probe.name == "oil"
+                else 60 + rng.gauss(0, 0.05)
+            )
+            entry[probe.temp_key] = temp
+            if not temp_keys_only:
+                entry[probe.voltage_key] = 1.2 + rng.gauss(0, 0.001)
+                entry[probe.resistance_key] = 1500 + rng.gauss(0, 5)
+        return entry
+
+    # What /temperature_history merges: 5 min of raw 1 Hz samples plus the
+    # decimated 30 min, 2 h and 8 h windows (temperatures only)
+    cases = {
+        "full (8h)": sorted(
+            [sample(now - i * 1000.37) for i in range(300)]
+            + [sample(now - 300000 - i * 3000, True) for i in range(600)]
+            + [sample(now - i * 10000, True) for i in range(720)]
+            + [sample(now - i * 40000, True) for i in range(720)],
+            key=lambda e: e["time"],
+        ),
+        "count=800 (page)": [],
+        "since (5 samples)": [sample(now + i * 1000) for i in range(5)],
+    }
+    cases["count=800 (page)"] = webapp._downsample_history(
+        cases["full (8h)"], 800, "lttb"
+    )
+
+    def timed(fn):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            out = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return out, best
+
+    print(f"{'history':<20}{'format':<14}{'bytes':>9}{'ratio':>8}{'encode':>10}")
+    for name, entries in cases.items():
+        json_out, json_time = timed(lambda: webapp.app.json.dumps(entries).encode())
+        binary, binary_time = timed(lambda: encode_history(entries, columns))
+        json_gz, json_gz_time = timed(
+            lambda: compress(webapp.app.json.dumps(entries).encode())
+        )
+        binary_gz, binary_gz_time = timed(
+            lambda: compress(encode_history(entries, columns))
+        )
+        decoded = decode_history(binary)
+        worst = max(
+            (
+                abs(d[k] - e[k])
+                for d, e in zip(decoded, entries)
+                for k in e
+                if e[k] is not None
+            ),
+            default=0.0,
+        )
+        for label, out, spent in (
+            ("json", json_out, json_time),
+            ("json+gzip", json_gz, json_gz_time),
+            ("binary", binary, binary_time),
+            ("binary+gzip", binary_gz, binary_gz_time),
+        ):
+            print(f"{name:<20}{label:<14}{len(out):>9}{len(json_out) / len(out):>7.1f}x"
+                  f"{spent * 1e3:>8.2f}ms")
+        print(f"{'':<20}{len(entries)} rows, largest round-trip error {worst:.4g}")
+
+
+if __name__ == "__main__":
+    _benchmark()